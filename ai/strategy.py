@@ -1,19 +1,44 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING
+import inspect
+from typing import TYPE_CHECKING, Callable
+
+from ai.team_context import TeamContext
 
 if TYPE_CHECKING:
+    import numpy as np
     from arena import Arena
     from player import Player  # type: ignore
 
 
+# per strategy class, whether its get_action takes the team context
+_takes_context: dict[type, bool] = {}
+
+
+def takes_context(strategy: Strategy) -> bool:
+    """Whether get_action of the strategy accepts context, strategies written
+    against get_action(player, arena) are called without it"""
+    kind = type(strategy)
+    result = _takes_context.get(kind)
+    if result is None:
+        parameters = inspect.signature(strategy.get_action).parameters.values()
+        result = _takes_context[kind] = any(
+            parameter.name == "context" or parameter.kind is parameter.VAR_KEYWORD
+            for parameter in parameters
+        )
+    return result
+
+
 class Strategy:
     """Base Strategy class"""
 
     def __init__(self):
         pass
 
-    def get_action(self, player: Player, arena: Arena):
-        """Override this method in subclasses to define specific strategies"""
+    def get_action(
+        self, player: Player, arena: Arena, context: TeamContext | None = None
+    ):
+        """Override this method in subclasses to define specific strategies,
+        context holds what the player's team already worked out this tick"""
         raise NotImplementedError("Subclasses must implement get_actions method")
 
 
@@ -24,10 +49,14 @@ class StrategyStraightOrb(Strategy):
     def __init__(self):
         super().__init__()
 
-    def get_action(self, player: Player, arena: Arena):
+    def get_action(
+        self, player: Player, arena: Arena, context: TeamContext | None = None
+    ):
         action = {}
-        meta_orb = arena.get_meta_orb_object()
-        meta_orb_position = arena.get_meta_orb_position()
+        if context is None:
+            context = TeamContext(arena, player.team)
+        meta_orb = context.meta_orb
+        meta_orb_position = context.meta_orb_position
         player_position = arena.get_position_of_player(player)
 
         if meta_orb is None:
@@ -39,23 +68,17 @@ class StrategyStraightOrb(Strategy):
             # The opponent has the orb
             if meta_orb.carried_by.team != player.team:
                 # move towards the player who has the orb
-                action = move_towards_meta_orb(arena, player)
+                action = move_towards_meta_orb(arena, player, context)
                 return action
 
             # We have the orb
             else:
-                # move towards our spawn point
-                spawn_tile_name = "RED_SPAWN" if player.team == "RED" else "BLUE_SPAWN"
-                spawn_positions = arena.get_positions_by_tile_name(spawn_tile_name)
-                if spawn_positions:
-                    target_position = spawn_positions[0]
-                    if player_position is not None:
-                        next_move = arena.find_next_move_to_target(
-                            player_position, target_position
-                        )
-                        if next_move is not None:
-                            action = {"move": next_move}
-                            return action
+                # move towards the nearest cell of our spawn
+                if player_position is not None:
+                    next_move = context.next_move_home(player_position)
+                    if next_move is not None:
+                        action = {"move": next_move}
+                        return action
 
         """ Meta Orb is on the ground """
         """ You can pick it up """
@@ -64,20 +87,56 @@ class StrategyStraightOrb(Strategy):
             return action
         else:
             """move towards the meta orb"""
-            action = move_towards_meta_orb(arena, player)
+            action = move_towards_meta_orb(arena, player, context)
             return action
 
 
-def move_towards_meta_orb(arena: Arena, player: Player):
+def move_towards_meta_orb(
+    arena: Arena, player: Player, context: TeamContext | None = None
+):
     # get current position
     player_position = arena.get_position_of_player(player)
 
-    # define target position
-    target_position = arena.get_meta_orb_position()
-
     # create move action towards target
-    if target_position is not None and player_position is not None:
-        next_move = arena.find_next_move_to_target(player_position, target_position)
+    if player_position is not None:
+        if context is not None:
+            next_move = context.next_move_towards_orb(player_position)
+        else:
+            target_position = arena.get_meta_orb_position()
+            if target_position is None:
+                return None
+            next_move = arena.find_next_move_to_target(player_position, target_position)
         if next_move is not None:
             action = {"move": next_move}
             return action
+
+
+class PolicyStrategy(Strategy):
+    """Strategy: Play a trained policy.
+
+    The policy gets the team's read-only observation grids (see
+    observations.Observations) and the player's position and returns an
+    action code of vector_game.ACTIONS, like an agent of environment.OrbEnv."""
+
+    def __init__(self, policy: Callable[[np.ndarray, tuple[int, int]], int]):
+        super().__init__()
+        self.policy = policy
+
+    def get_action(
+        self, player: Player, arena: Arena, context: TeamContext | None = None
+    ):
+        from observations import get_observations
+        from vector_game import decode_action
+
+        if context is None:
+            context = TeamContext(arena, player.team)
+        player_position = arena.get_position_of_player(player)
+        if player_position is None:
+            return {}
+
+        # brought up to date once per tick for both teams
+        observations = context.memoize(
+            "observations", lambda: get_observations(arena), shared=True
+        )
+        code = self.policy(observations.for_team(player.team), player_position)
+        return decode_action(player_position, int(code))
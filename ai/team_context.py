@@ -0,0 +1,108 @@
+from __future__ import annotations
+import threading
+from typing import TYPE_CHECKING, Any, Callable
+import numpy as np
+import grid_pathfinder
+
+if TYPE_CHECKING:
+    from arena import Arena
+    from game_objects.meta_orb import MetaOrb
+
+
+class TeamContext:
+    """Queries the strategies of one team share during one tick.
+
+    Each answer is computed on first request and reused by every teammate.
+    Answers that are the same for both teams, like the distance field to the
+    orb, go into the shared dict when the game passes one, together with the
+    lock that guards it. Answers are computed under the lock, so strategies
+    deciding on several threads still compute each of them once."""
+
+    def __init__(
+        self,
+        arena: Arena,
+        team: str,
+        tick: int = 0,
+        shared: dict[str, Any] | None = None,
+        lock: threading.RLock | None = None,
+    ):
+        self.arena = arena
+        self.team = team
+        self.tick = tick
+        self.cache: dict[Any, Any] = {}
+        self.shared: dict[str, Any] = shared if shared is not None else {}
+        self.lock = lock if lock is not None else threading.RLock()
+
+    def memoize(self, key: Any, compute: Callable[[], Any], shared: bool = False):
+        cache = self.shared if shared else self.cache
+        if key in cache:
+            return cache[key]
+        with self.lock:
+            # another thread may have computed it while this one waited
+            if key not in cache:
+                cache[key] = compute()
+            return cache[key]
+
+    def bind(self, arena: Arena) -> "TeamContext":
+        """The same answers computed on another arena showing the same state,
+        e.g. the clone a worker thread decides on"""
+        context = TeamContext(arena, self.team, self.tick, self.shared, self.lock)
+        context.cache = self.cache
+        return context
+
+    @property
+    def meta_orb(self) -> MetaOrb | None:
+        # the object itself, an answer shared with other arenas would not be
+        return self.arena.get_meta_orb_object()
+
+    @property
+    def meta_orb_position(self) -> tuple[int, int] | None:
+        return self.memoize(
+            "meta_orb_position", self.arena.get_meta_orb_position, shared=True
+        )
+
+    @property
+    def home_spawn_tile_name(self) -> str:
+        return "RED_SPAWN" if self.team == "RED" else "BLUE_SPAWN"
+
+    @property
+    def home_spawn_positions(self) -> list[tuple[int, int]]:
+        return self.memoize(
+            "home_spawn_positions",
+            lambda: self.arena.get_positions_by_tile_name(self.home_spawn_tile_name),
+        )
+
+    def distance_field_to_orb(self) -> np.ndarray | None:
+        """Distances to the orb for this tick, None without an orb on the map"""
+        position = self.meta_orb_position
+        if position is None:
+            return None
+        if self.arena.hot_tile_ids[self.arena.tile_ids[position[1], position[0]]]:
+            # lying on its spawn, the arena keeps that field across ticks
+            compute = lambda: self.arena.get_distance_field((position,))
+        else:
+            compute = lambda: self.arena.compute_distance_field([position])
+        return self.memoize("orb_distances", compute, shared=True)
+
+    def distance_field_to_home(self) -> np.ndarray | None:
+        """Distances to the nearest home spawn cell, kept by the arena"""
+        positions = self.home_spawn_positions
+        if not positions:
+            return None
+        return self.memoize(
+            "home_distances", lambda: self.arena.get_distance_field(tuple(positions))
+        )
+
+    def next_move_towards_orb(
+        self, position: tuple[int, int]
+    ) -> tuple[int, int] | None:
+        distances = self.distance_field_to_orb()
+        if distances is None:
+            return None
+        return grid_pathfinder.next_step(distances, position)
+
+    def next_move_home(self, position: tuple[int, int]) -> tuple[int, int] | None:
+        distances = self.distance_field_to_home()
+        if distances is None:
+            return None
+        return grid_pathfinder.next_step(distances, position)
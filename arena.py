@@ -1,30 +1,103 @@
+from __future__ import annotations
+import copy
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
 import numpy as np
-from PIL import Image
-from PIL.Image import Image as PILImage
 import config
+import grid_pathfinder
+import map_cache
+import spatial_index
+from arena_state import ArenaState, NO_PLAYER, TEAMS
+from events import EventLog
+from instrumentation import NULL_PROFILER, NullProfiler, Profiler
 import game_objects.entities as entities
-from pathfinding.core.grid import Grid
-from pathfinding.finder.a_star import AStarFinder
 from game_objects.meta_orb import MetaOrb
+from game_objects.player import Player, PlayerStats
+
+if TYPE_CHECKING:
+    # PIL is only imported once a map image is read, headless workers on a
+    # compiled map never load it
+    from PIL.Image import Image as PILImage
+
+
+@dataclass
+class MoveRecord:
+    """Everything a single player action can change, see Arena.record_player"""
+
+    player_index: int
+    position: tuple[int, int]
+    orb_position: tuple[int, int]
+    orb_carrier: int
+    stats: tuple[int, ...]
 
 
 class Arena:
-    def __init__(self, map_name: str):
+    def __init__(
+        self,
+        map_name: str,
+        image_data: np.ndarray | None = None,
+        compiled_map: map_cache.CompiledMap | None = None,
+    ):
         self.name: str = map_name
         self.image: PILImage | None = None
         self.image_data: np.ndarray | None = None
         self.image_dimensions: tuple[int, int] | None = None
 
-        self.fields: list[entities.Field] = []
+        # tile ids (indexes into entities.TILES) in map coordinates [y, x]
+        self.tile_ids: np.ndarray | None = None
+        self.tile_positions: dict[str, list[tuple[int, int]]] = {}
+        # positions, occupancy and the orb live in arrays, players by index
+        self.state: ArenaState = ArenaState(0, 0)
+        self.players: list[Player] = []
+        self.player_indexes: dict[Player, int] = {}
+        self.meta_orb: MetaOrb | None = None
+        # replaced by the game's log, silent for a standalone arena
+        self.events: EventLog = EventLog(enabled=False)
+        # counts lookups and times path searches, see Game.enable_profiling
+        self.profiler: Profiler | NullProfiler = NULL_PROFILER
         self.positions_red_spawn: list[tuple[int, int]] = []
         self.positions_blue_spawn: list[tuple[int, int]] = []
         self.pathfinding_matrix: np.ndarray | None = None
-        self.pathfinding_grid: Grid | None = None
+        self._pathfinder: grid_pathfinder.GridPathfinder | None = None
+        # next step towards a target, keyed by (start, end), least recently used first
+        self.path_cache: OrderedDict[
+            tuple[tuple[int, int], tuple[int, int]], tuple[int, int] | None
+        ] = OrderedDict()
+        # BFS distances to frequently requested targets like the spawn tiles
+        self.hot_tile_ids: np.ndarray = np.zeros(len(entities.TILES), dtype=bool)
+        for tile_name in ("RED_SPAWN", "BLUE_SPAWN", "ORB_SPAWN"):
+            self.hot_tile_ids[entities.TILE_IDS[tile_name]] = True
+        self.distance_fields: dict[tuple[int, int], np.ndarray] = {}
+        # buckets of the player positions it was built from, rebuilt when they move
+        self._spatial_index: spatial_index.SpatialIndex | None = None
+        self._spatial_positions: np.ndarray | None = None
 
-        self.load_image()
-        self.extract_image_data()
+        # an already decoded image or compiled map can be passed in to skip the PNG
+        if image_data is not None:
+            self.extract_image_data(image_data)
+            return
+        if compiled_map is None and config.USE_MAP_CACHE:
+            compiled_map = map_cache.load_compiled_map(map_name)
+        if compiled_map is not None:
+            self.load_compiled_map(compiled_map)
+        else:
+            self.load_image()
+            self.extract_image_data()
+
+    @classmethod
+    def from_tile_ids(cls, map_name: str, tile_ids: np.ndarray) -> "Arena":
+        """Arena of tile ids in image order (top row first), e.g. a generated map"""
+        return cls(
+            map_name,
+            compiled_map=map_cache.compile_tile_ids(
+                map_name, tile_ids, with_distance_fields=False
+            ),
+        )
 
     def load_image(self):
+        from PIL import Image
+
         try:
             self.image = Image.open(config.SOURCE_FOLDER + self.name + ".png")
         except FileNotFoundError:
@@ -32,112 +105,503 @@ class Arena:
                 f"Map image for '{self.name}' not found in {config.SOURCE_FOLDER}."
             )
 
-    def extract_image_data(self):
-        self.image_data = np.array(self.image)
-        self.tiles = np.empty(self.image_data.shape[:2], dtype=entities.Tile)
-        self.image_dimensions = (self.image_data.shape[1], self.image_data.shape[0])
-        self.fields = []
+    def extract_image_data(self, image_data: np.ndarray | None = None):
+        self.image_data = np.array(self.image) if image_data is None else image_data
+        self.load_compiled_map(
+            map_cache.compile_image(
+                self.name, self.image_data, with_distance_fields=False
+            )
+        )
 
-        height, width = self.image_data.shape[:2]
+    def load_compiled_map(self, compiled_map: map_cache.CompiledMap):
+        """Take over the (possibly memory-mapped, read-only) arrays of a map"""
+        self.image_dimensions = compiled_map.dimensions
+        # plain array views, indexing through np.memmap is much slower
+        self.tile_ids = np.asarray(compiled_map.tile_ids)
+        self.pathfinding_matrix = np.asarray(compiled_map.passable)
+        self.state = ArenaState(*self.tile_ids.shape)
+        self.players = []
+        self.player_indexes = {}
+        self.meta_orb = None
+        self._pathfinder = None
 
-        for y in range(height):
-            for x in range(width):
-                # adjust y coordinate
-                adjusted_y = height - 1 - y
-                # fill the fields list
-                pixel_rgb: np.ndarray = self.image_data[y, x]
-                tile: entities.Tile = entities.get_tile_by_color(tuple(pixel_rgb))
-                field = entities.Field(x=x, y=adjusted_y, tile=tile)
-                self.fields.append(field)
+        # positions of other tiles are collected on first request
+        self.tile_positions = {
+            tile_name: list(positions)
+            for tile_name, positions in compiled_map.spawn_positions.items()
+        }
+        self.positions_red_spawn = self.get_positions_by_tile_name("RED_SPAWN")
+        self.positions_blue_spawn = self.get_positions_by_tile_name("BLUE_SPAWN")
+        self.invalidate_paths()
+        self.distance_fields.update(compiled_map.distance_fields)
 
-                # fill the pathfinding matrix
-                if self.pathfinding_matrix is None:
-                    self.pathfinding_matrix = np.zeros((height, width), dtype=int)
+    def to_compiled_map(self) -> map_cache.CompiledMap:
+        """Map data of this arena, e.g. to set up an arena in another process"""
+        return map_cache.CompiledMap(
+            self.name,
+            self.tile_ids,  # type: ignore
+            self.pathfinding_matrix,  # type: ignore
+            {
+                tile_name: self.get_positions_by_tile_name(tile_name)
+                for tile_name in map_cache.SPAWN_TILE_NAMES
+            },
+            {
+                target: distances
+                for target, distances in self.distance_fields.items()
+                if isinstance(target[0], int)  # single targets only
+            },
+        )
 
-                self.pathfinding_matrix[adjusted_y, x] = 1 if tile.passable else 0
+    @property
+    def fields(self) -> list[entities.Field]:
+        """All fields of the map in image order, as snapshots of the current state"""
+        if self.tile_ids is None:
+            return []
+        height, width = self.tile_ids.shape
+        return [
+            self.get_field_by_coordinates(x, y)  # type: ignore
+            for y in range(height - 1, -1, -1)
+            for x in range(width)
+        ]
 
-        # create pathfinding grid
-        if self.pathfinding_matrix is not None:
-            self.pathfinding_grid = Grid(matrix=self.pathfinding_matrix)
+    @property
+    def pathfinder(self) -> grid_pathfinder.GridPathfinder | None:
+        """Path search on the passable matrix, only set up once a path is searched"""
+        if self._pathfinder is None and self.pathfinding_matrix is not None:
+            self._pathfinder = grid_pathfinder.GridPathfinder(self.pathfinding_matrix)
+        return self._pathfinder
 
     def get_positions_by_tile_name(self, tile_name: str) -> list[tuple[int, int]]:
         """Get all coordinates of fields with a specific tile name"""
-        positions = []
-        for field in self.fields:
-            if field.tile and field.tile.name == tile_name:
-                positions.append((field.x, field.y))
-        return positions
+        if self.profiler.enabled:
+            self.profiler.count("arena_lookups")
+        positions = self.tile_positions.get(tile_name)
+        if positions is None:
+            tile_id = entities.TILE_IDS.get(tile_name)
+            if tile_id is None or self.tile_ids is None:
+                return []
+            # image order: top row first, left to right
+            height = self.tile_ids.shape[0]
+            rows, xs = np.nonzero(self.tile_ids[::-1] == tile_id)
+            positions = list(zip(xs.tolist(), (height - 1 - rows).tolist()))
+            self.tile_positions[tile_name] = positions
+        return list(positions)
 
     def get_position_of_player(self, player):
         """Get the coordinates of the field where the specified player is located"""
-        for field in self.fields:
-            if field.player == player:
-                return (field.x, field.y)
-        return None
+        if self.profiler.enabled:
+            self.profiler.count("arena_lookups")
+        index = self.player_indexes.get(player)
+        if index is None:
+            return None
+        x, y = self.state.player_positions[index].tolist()
+        return (x, y) if x >= 0 else None
+
+    def get_player_at(self, x: int, y: int) -> Player | None:
+        """Get the player standing at specific coordinates"""
+        if self.profiler.enabled:
+            self.profiler.count("arena_lookups")
+        index = self.state.occupancy[y, x]
+        return self.players[index] if index != NO_PLAYER else None
+
+    def is_inside(self, x: int, y: int) -> bool:
+        height, width = self.state.occupancy.shape
+        return 0 <= x < width and 0 <= y < height
 
     def get_field_by_coordinates(self, x: int, y: int) -> entities.Field | None:
-        """Get the field at specific coordinates"""
-        for field in self.fields:
-            if field.x == x and field.y == y:
-                return field
-        return None
+        """Get the field at specific coordinates, a snapshot of its current state"""
+        if self.profiler.enabled:
+            self.profiler.count("arena_lookups")
+        if self.tile_ids is None or not self.is_inside(x, y):
+            return None
+        return entities.Field(
+            x=x,
+            y=y,
+            tile=entities.TILES[self.tile_ids[y, x]],
+            player=self.get_player_at(x, y),
+            meta_orb=self.meta_orb if self.get_meta_orb_position() == (x, y) else None,
+        )
+
+    def get_player_index(self, player: Player) -> int:
+        """Index of a player in the state arrays, registering unknown players"""
+        index = self.player_indexes.get(player)
+        if index is None:
+            index = self.state.add_player(player.team)
+            self.players.append(player)
+            self.player_indexes[player] = index
+        return index
+
+    def place_player(self, player: Player, position: tuple[int, int]) -> None:
+        """Put a player on the field at the given position"""
+        x, y = position
+        if not self.is_inside(x, y):
+            return
+        index = self.get_player_index(player)
+        self.remove_player(player)
+        self.state.occupancy[y, x] = index
+        self.state.player_positions[index] = position
+
+    def remove_player(self, player: Player) -> None:
+        """Take a player off the map"""
+        index = self.player_indexes.get(player)
+        if index is None:
+            return
+        x, y = self.state.player_positions[index].tolist()
+        if x < 0:
+            return
+        if self.state.occupancy[y, x] == index:
+            self.state.occupancy[y, x] = NO_PLAYER
+        self.state.player_positions[index] = (-1, -1)
+
+    def get_player_stats(self, player: Player) -> PlayerStats:
+        index = self.player_indexes.get(player)
+        if index is None:
+            return PlayerStats()
+        return PlayerStats(*self.state.player_stats[index].tolist())
+
+    def place_meta_orb(self, meta_orb: MetaOrb, position: tuple[int, int]) -> None:
+        """Put the Meta Orb on the field at the given position"""
+        self.meta_orb = meta_orb
+        self.change_meta_orb_position(position)
+
+    def set_meta_orb_carrier(self, player: Player | None) -> None:
+        """Hand the Meta Orb to a player, None drops it"""
+        if self.meta_orb is None:
+            return
+        self.state.orb_carrier = (
+            self.get_player_index(player) if player is not None else NO_PLAYER
+        )
+        self.sync_meta_orb()
+
+    def snapshot(self) -> ArenaState:
+        """Copy of the mutable state, the map data is not part of it"""
+        return self.state.copy()
+
+    def restore(self, snapshot: ArenaState) -> None:
+        """Return to a state taken with snapshot(), which stays reusable"""
+        self.state = snapshot.copy()
+        self.sync_meta_orb()
+
+    def clone(self, share_pathfinding: bool = True) -> "Arena":
+        """Independent arena sharing the immutable map data and path caches.
+
+        Without share_pathfinding the clone gets its own grid and caches, so it
+        can search paths on another thread than this arena."""
+        if (
+            self.pathfinding_matrix is not None
+            and self.pathfinding_matrix.flags.writeable
+        ):
+            # read-only from now on, set_passable copies it before writing
+            shared_matrix = self.pathfinding_matrix.view()
+            shared_matrix.flags.writeable = False
+            self.pathfinding_matrix = shared_matrix
+
+        arena = copy.copy(self)
+        # simulated moves stay out of the match log, Game.clone attaches its own
+        arena.events = EventLog(enabled=False)
+        arena.profiler = NULL_PROFILER
+        arena.state = self.state.copy()
+        arena.players = list(self.players)
+        arena.player_indexes = dict(self.player_indexes)
+        if self.meta_orb is not None:
+            arena.meta_orb = MetaOrb()
+            arena.sync_meta_orb()
+        arena._spatial_index = None
+        arena._spatial_positions = None
+        if not share_pathfinding:
+            arena._pathfinder = None
+            arena.path_cache = OrderedDict()
+            arena.distance_fields = dict(self.distance_fields)
+        return arena
+
+    def sync_meta_orb(self) -> None:
+        """Point MetaOrb.carried_by at the carrier stored in the state"""
+        if self.meta_orb is None:
+            return
+        carrier = self.state.orb_carrier
+        self.meta_orb.carried_by = (
+            self.players[carrier] if carrier != NO_PLAYER else None
+        )
+        self.meta_orb.carried = carrier != NO_PLAYER  # type: ignore
+
+    def record_player(self, player: Player) -> MoveRecord:
+        """Remember what an action of this player can change, see revert()"""
+        index = self.get_player_index(player)
+        x, y = self.state.player_positions[index].tolist()
+        orb_x, orb_y = self.state.orb_position.tolist()
+        return MoveRecord(
+            player_index=index,
+            position=(x, y),
+            orb_position=(orb_x, orb_y),
+            orb_carrier=self.state.orb_carrier,
+            stats=tuple(self.state.player_stats[index].tolist()),
+        )
+
+    def revert(self, record: MoveRecord) -> None:
+        """Undo the action of a single player recorded with record_player()"""
+        index = record.player_index
+        x, y = self.state.player_positions[index].tolist()
+        if x >= 0 and self.state.occupancy[y, x] == index:
+            self.state.occupancy[y, x] = NO_PLAYER
+        x, y = record.position
+        if x >= 0:
+            self.state.occupancy[y, x] = index
+        self.state.player_positions[index] = record.position
+        self.state.orb_position[:] = record.orb_position
+        self.state.orb_carrier = record.orb_carrier
+        self.state.player_stats[index] = record.stats
+        self.sync_meta_orb()
 
     def find_next_move_to_target(
-        self, start: tuple[int, int], end: tuple[int, int]
+        self,
+        start: tuple[int, int],
+        end: tuple[int, int],
+        avoid_players: bool = False,
     ) -> tuple[int, int] | None:
-        """Find the shortest path from start to end using A* algorithm"""
-        if self.pathfinding_grid is None:
+        """Find the next step of the shortest path from start to end.
+
+        With avoid_players the path leads around the cells other players
+        stand on this tick, such paths are not cached."""
+        profiler = self.profiler
+        if not profiler.enabled:
+            return self.search_next_move(start, end, avoid_players)
+        profiler.count("path_queries")
+        pathfinder = self.pathfinder
+        if pathfinder is not None:
+            pathfinder.expansions = 0
+        with profiler.phase("pathfinding"):
+            next_move = self.search_next_move(start, end, avoid_players)
+        if pathfinder is not None:
+            profiler.count("path_expansions", pathfinder.expansions)
+        return next_move
+
+    def search_next_move(
+        self,
+        start: tuple[int, int],
+        end: tuple[int, int],
+        avoid_players: bool = False,
+    ) -> tuple[int, int] | None:
+        if self.pathfinding_matrix is None:
             return None
 
         if start == end:
             return None
 
-        start_node = self.pathfinding_grid.node(start[0], start[1])
-        end_node = self.pathfinding_grid.node(end[0], end[1])
+        if avoid_players:
+            positions = self.state.player_positions.tolist()
+            path = self.pathfinder.find_path(  # type: ignore
+                start,
+                end,
+                obstacles=[
+                    tuple(position) for position in positions if position[0] >= 0
+                ],
+            )
+            return path[1] if len(path) > 1 else None
+
+        if self.hot_tile_ids[self.tile_ids[end[1], end[0]]]:  # type: ignore
+            return self.find_next_move_by_distance_field(start, end)
+
+        key = (start, end)
+        if key in self.path_cache:
+            self.path_cache.move_to_end(key)
+            return self.path_cache[key]
+
+        path = self.pathfinder.find_path(  # type: ignore
+            start, end, config.PATHFINDING_METHOD
+        )
+        if len(path) < 2:
+            self.cache_next_move(key, None)
+            return None
+
+        # every position on the path shares the rest of it towards the same end
+        for position, next_step in zip(path[-2::-1], path[:0:-1]):
+            self.cache_next_move((position, end), next_step)
+        return path[1]
+
+    def cache_next_move(
+        self,
+        key: tuple[tuple[int, int], tuple[int, int]],
+        next_step: tuple[int, int] | None,
+    ) -> None:
+        """Remember the next step for (start, end), dropping the oldest entries"""
+        self.path_cache[key] = next_step
+        self.path_cache.move_to_end(key)
+        while len(self.path_cache) > config.PATH_CACHE_SIZE:
+            self.path_cache.popitem(last=False)
+
+    def find_next_move_by_distance_field(
+        self, start: tuple[int, int], end: tuple[int, int]
+    ) -> tuple[int, int] | None:
+        """Step to the neighbour that is closest to end"""
+        return grid_pathfinder.next_step(self.get_distance_field((end,)), start)
+
+    def get_distance_field(self, targets: tuple[tuple[int, int], ...]) -> np.ndarray:
+        """Distances to the nearest of the targets, kept until passability changes"""
+        key = targets[0] if len(targets) == 1 else targets
+        distances = self.distance_fields.get(key)  # type: ignore
+        if distances is None:
+            distances = self.compute_distance_field(list(targets))
+            self.distance_fields[key] = distances  # type: ignore
+        return distances
 
-        finder = AStarFinder()
-        path, _ = finder.find_path(start_node, end_node, self.pathfinding_grid)
-        next_step = path[1] if len(path) > 1 else None
+    def compute_distance_field(self, targets: list[tuple[int, int]]) -> np.ndarray:
+        """BFS distances from every cell to the nearest of the targets"""
+        if self.pathfinding_matrix is None:
+            return np.empty((0, 0), dtype=np.int32)
+        self.profiler.count("distance_fields")
+        with self.profiler.phase("distance_field"):
+            return grid_pathfinder.compute_distance_field(
+                self.pathfinding_matrix, targets
+            )
+
+    def set_passable(self, position: tuple[int, int], passable: bool) -> None:
+        """Open or block a cell for pathfinding"""
+        x, y = position
+        if self.pathfinding_matrix is None:
+            return
+        if bool(self.pathfinding_matrix[y, x]) == passable:
+            return
+        if not self.pathfinding_matrix.flags.writeable:
+            # shared map data stays untouched, this arena gets its own copy
+            self.pathfinding_matrix = np.array(self.pathfinding_matrix)
+            self._pathfinder = None
+            self.path_cache = OrderedDict()
+            self.distance_fields = {}
+        self.pathfinding_matrix[y, x] = 1 if passable else 0
+        if self._pathfinder is not None:
+            self._pathfinder.set_passable(position, passable)
+        self.invalidate_paths()
+
+    def invalidate_paths(self) -> None:
+        """Forget cached paths and distance fields after passability changed"""
+        self.path_cache.clear()
+        self.distance_fields.clear()
+
+    def get_spatial_index(self) -> spatial_index.SpatialIndex:
+        """Bucket grid of the current player positions, built once per tick"""
+        positions = self.state.player_positions
+        if self._spatial_index is None or not np.array_equal(
+            positions, self._spatial_positions  # type: ignore
+        ):
+            height, width = self.state.occupancy.shape
+            self._spatial_index = spatial_index.SpatialIndex(
+                positions,
+                self.state.player_teams,
+                width,
+                height,
+                config.SPATIAL_BUCKET_SIZE,
+            )
+            self._spatial_positions = positions.copy()
+        return self._spatial_index
+
+    def find_nearest_players(
+        self,
+        position: tuple[int, int],
+        count: int = 1,
+        team: str | None = None,
+        exclude: Player | None = None,
+    ) -> list[tuple[Player, int]]:
+        """Up to count players closest to position by Manhattan distance, with
+        their distances, nearest first. Optionally only players of one team."""
+        nearest = self.get_spatial_index().nearest(
+            position,
+            count,
+            TEAMS.index(team) if team is not None else None,
+            self.player_indexes.get(exclude) if exclude is not None else None,
+        )
+        return [(self.players[index], distance) for index, distance in nearest]
 
-        if not path:
+    def find_nearest_opponent(self, player: Player) -> Player | None:
+        """Closest player of the other team by Manhattan distance"""
+        position = self.get_position_of_player(player)
+        if position is None:
             return None
+        opponent_team = TEAMS[1 - TEAMS.index(player.team)]
+        nearest = self.find_nearest_players(position, team=opponent_team)
+        return nearest[0][0] if nearest else None
 
-        # convert path to list of tuples
-        next_step_position = (next_step.x, next_step.y)  # type: ignore
-        return next_step_position
+    def find_nearest_teammate(self, player: Player) -> Player | None:
+        """Closest other player of the same team by Manhattan distance"""
+        position = self.get_position_of_player(player)
+        if position is None:
+            return None
+        nearest = self.find_nearest_players(position, team=player.team, exclude=player)
+        return nearest[0][0] if nearest else None
+
+    def get_players_within(
+        self,
+        position: tuple[int, int],
+        radius: int,
+        team: str | None = None,
+        exclude: Player | None = None,
+    ) -> list[tuple[Player, int]]:
+        """Players at most radius cells away by Manhattan distance, with their
+        distances, nearest first"""
+        within = self.get_spatial_index().within(
+            position,
+            radius,
+            TEAMS.index(team) if team is not None else None,
+            self.player_indexes.get(exclude) if exclude is not None else None,
+        )
+        return [(self.players[index], distance) for index, distance in within]
+
+    def find_nearest_players_by_path(
+        self,
+        position: tuple[int, int],
+        count: int = 1,
+        team: str | None = None,
+        exclude: Player | None = None,
+    ) -> list[tuple[Player, int]]:
+        """Up to count players closest to position by path length, with their
+        path lengths, nearest first. Players count as passable here, the
+        search stops as soon as the players are found."""
+        if self.pathfinder is None:
+            return []
+        state = self.state
+        candidates = state.player_positions[:, 0] >= 0
+        if team is not None:
+            candidates &= state.player_teams == TEAMS.index(team)
+        if exclude is not None and exclude in self.player_indexes:
+            candidates[self.player_indexes[exclude]] = False
+        targets = [(x, y) for x, y in state.player_positions[candidates].tolist()]
+        return [
+            (self.get_player_at(*cell), distance)  # type: ignore
+            for cell, distance in self.pathfinder.find_nearest(position, targets, count)
+        ]
+
+    def find_closest_reachable_position(
+        self, start: tuple[int, int], target: tuple[int, int]
+    ) -> tuple[int, int] | None:
+        """Target if a path from start leads there, else the reachable cell
+        closest to it by Manhattan distance"""
+        if self.pathfinder is None:
+            return None
+        return self.pathfinder.find_closest_reachable(start, target)
 
     def get_meta_orb_position(self) -> tuple[int, int] | None:
         """Get the current position of the Meta Orb on the map"""
-        for field in self.fields:
-            if field.meta_orb is not None:
-                return (field.x, field.y)
-        return None
+        if self.profiler.enabled:
+            self.profiler.count("arena_lookups")
+        x, y = self.state.orb_position.tolist()
+        return (x, y) if x >= 0 else None
 
     def change_meta_orb_position(self, new_position: tuple[int, int]) -> None:
         """Change the position of the Meta Orb on the map"""
-        meta_orb = self.get_meta_orb_object()
-        # First, remove the orb from its current position
-        for field in self.fields:
-            if field.meta_orb is not None:
-                field.meta_orb = None
-                break
-
-        # Then, place the orb at the new position
-        field = self.get_field_by_coordinates(new_position[0], new_position[1])
-        if field is not None:
-            field.meta_orb = meta_orb
+        if self.is_inside(new_position[0], new_position[1]):
+            self.state.orb_position[:] = new_position
 
     def get_meta_orb_object(self) -> MetaOrb | None:
         """Get the current status of the Meta Orb on the map"""
-        for field in self.fields:
-            if field.meta_orb is not None:
-                return field.meta_orb
-        return None
+        if self.profiler.enabled:
+            self.profiler.count("arena_lookups")
+        return self.meta_orb
 
     def get_passable_adjacent_positions(
         self, position: tuple[int, int]
     ) -> list[tuple[int, int]]:
         """Get all passable adjacent positions (up, down, left, right) from a given position"""
+        if self.profiler.enabled:
+            self.profiler.count("arena_lookups")
         x, y = position
         adjacent_positions = [
             (x, y + 1),  # Up
@@ -147,7 +611,10 @@ class Arena:
         ]
         passable_positions = []
         for pos in adjacent_positions:
-            field = self.get_field_by_coordinates(pos[0], pos[1])
-            if field and field.tile.passable and field.player is None:
+            if (
+                self.is_inside(pos[0], pos[1])
+                and self.pathfinding_matrix[pos[1], pos[0]]  # type: ignore
+                and self.state.occupancy[pos[1], pos[0]] == NO_PLAYER
+            ):
                 passable_positions.append(pos)
         return passable_positions
@@ -0,0 +1,66 @@
+import numpy as np
+
+TEAMS = ("RED", "BLUE")
+NO_PLAYER = -1
+# columns of ArenaState.player_stats, same names as the PlayerStats fields
+PLAYER_STATS = ("moves", "blocked_moves", "pick_ups")
+
+
+class ArenaState:
+    """Mutable part of an arena as flat arrays, players are referred to by index"""
+
+    def __init__(self, height: int, width: int):
+        # index of the player standing on each cell [y, x], NO_PLAYER if empty
+        self.occupancy = np.full((height, width), NO_PLAYER, dtype=np.int16)
+        # (x, y) per player, (-1, -1) while off the map
+        self.player_positions = np.full((0, 2), -1, dtype=np.int32)
+        # index into TEAMS per player
+        self.player_teams = np.zeros(0, dtype=np.int8)
+        # counters per player, one column per entry of PLAYER_STATS
+        self.player_stats = np.zeros((0, len(PLAYER_STATS)), dtype=np.int32)
+        # (x, y) of the orb, (-1, -1) while it is not on the map
+        self.orb_position = np.full(2, -1, dtype=np.int32)
+        self.orb_carrier: int = NO_PLAYER
+
+    def add_player(self, team: str) -> int:
+        """Make room for one more player, returns its index"""
+        self.player_positions = np.vstack(
+            (self.player_positions, np.full((1, 2), -1, dtype=np.int32))
+        )
+        self.player_teams = np.append(
+            self.player_teams, np.int8(TEAMS.index(team))
+        ).astype(np.int8)
+        self.player_stats = np.vstack(
+            (self.player_stats, np.zeros((1, len(PLAYER_STATS)), dtype=np.int32))
+        )
+        return len(self.player_teams) - 1
+
+    def copy(self) -> "ArenaState":
+        state = ArenaState.__new__(ArenaState)
+        state.occupancy = self.occupancy.copy()
+        state.player_positions = self.player_positions.copy()
+        state.player_teams = self.player_teams
+        state.player_stats = self.player_stats.copy()
+        state.orb_position = self.orb_position.copy()
+        state.orb_carrier = self.orb_carrier
+        return state
+
+    def set_writeable(self, writeable: bool) -> None:
+        """Make the arrays read-only, or writeable again"""
+        for array in (
+            self.occupancy,
+            self.player_positions,
+            self.player_stats,
+            self.orb_position,
+        ):
+            array.flags.writeable = writeable
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.occupancy.nbytes
+            + self.player_positions.nbytes
+            + self.player_teams.nbytes
+            + self.player_stats.nbytes
+            + self.orb_position.nbytes
+        )
@@ -0,0 +1,131 @@
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+import numpy as np
+
+import config
+import map_cache
+from events import EventLog
+from ai.strategy import Strategy, StrategyStraightOrb
+from game import Game, MatchResult
+from game_objects.player import Player
+
+
+@dataclass
+class MatchJob:
+    map_name: str
+    players_red: list[str]
+    strategy_red: type[Strategy]
+    players_blue: list[str]
+    strategy_blue: type[Strategy]
+    seed: int = 0
+    max_ticks: int = config.MAX_TICKS
+
+
+@dataclass
+class BatchStats:
+    matches: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def matches_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.matches / elapsed if elapsed > 0 else 0.0
+
+
+# compiled maps opened by the current worker process, filled on first use
+_maps: dict[str, map_cache.CompiledMap] = {}
+
+
+def load_map(map_name: str) -> map_cache.CompiledMap:
+    """Open a compiled map once per process and reuse it for every match"""
+    compiled_map = _maps.get(map_name)
+    if compiled_map is None:
+        compiled_map = map_cache.load_compiled_map(map_name)
+        _maps[map_name] = compiled_map
+    return compiled_map
+
+
+def run_match(job: MatchJob) -> MatchResult:
+    """Play a single match headless"""
+    random.seed(job.seed)
+    np.random.seed(job.seed)
+
+    players_red = [Player(name, "RED", job.strategy_red()) for name in job.players_red]
+    players_blue = [
+        Player(name, "BLUE", job.strategy_blue()) for name in job.players_blue
+    ]
+    game = Game(
+        job.map_name,
+        players_red,
+        players_blue,
+        load_map(job.map_name),
+        event_log=EventLog(enabled=False),
+    )
+    game.spawn_players()
+    game.spawn_meta_orb()
+    return game.run_headless(job.max_ticks)
+
+
+def run_batch(
+    jobs: Iterable[MatchJob],
+    max_workers: int | None = None,
+    stats: BatchStats | None = None,
+) -> Iterator[tuple[int, MatchResult]]:
+    """Run matches on all cores and yield (job index, result) as they finish"""
+    stats = stats if stats is not None else BatchStats()
+    jobs = list(jobs)
+
+    # compile every map up front so the workers only have to memory-map it
+    for map_name in {job.map_name for job in jobs}:
+        map_cache.load_compiled_map(map_name)
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = {
+            executor.submit(run_match, job): index for index, job in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            stats.matches += 1
+            yield futures[future], future.result()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a batch of headless matches")
+    parser.add_argument("--map", default="the_petting_zoo", help="map name")
+    parser.add_argument("--matches", type=int, default=100, help="number of matches")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--max-ticks", type=int, default=config.MAX_TICKS)
+    args = parser.parse_args()
+
+    jobs = [
+        MatchJob(
+            args.map,
+            config.PLAYERS_RED,
+            StrategyStraightOrb,
+            config.PLAYERS_BLUE,
+            StrategyStraightOrb,
+            seed=seed,
+            max_ticks=args.max_ticks,
+        )
+        for seed in range(args.matches)
+    ]
+
+    stats = BatchStats()
+    for index, result in run_batch(jobs, args.workers, stats):
+        print(
+            f"match {index}: RED {result.score_red} : {result.score_blue} BLUE, "
+            f"{result.ticks} ticks, orb held by {result.orb_holder}"
+        )
+    print(
+        f"{stats.matches} matches in {stats.elapsed:.2f}s "
+        f"({stats.matches_per_second:.1f} matches/s)"
+    )
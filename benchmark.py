@@ -0,0 +1,317 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable
+
+import numpy as np
+
+import config
+import map_generator
+from ai.strategy import StrategyStraightOrb
+from arena import Arena
+from events import EventLog
+from game import Game
+from game_objects.player import Player
+from vector_game import ACTIONS, VectorGame
+
+DEFAULT_LAYOUTS = map_generator.LAYOUTS
+DEFAULT_SIZES = (64, 256, 1024, 2048)
+DEFAULT_PLAYER_COUNTS = (2, 6, 12, 24)
+VECTOR_MATCHES = 1024
+SPAWN_SIZE = 4  # spawn squares of 16 cells, enough for the largest teams
+
+
+def percentile(samples: list[float], percent: float) -> float:
+    return float(np.percentile(samples, percent)) if samples else 0.0
+
+
+def repeat(function: Callable[[], None], count: int, time_budget: float) -> list[float]:
+    """Seconds per call, stops early once the time budget is used up"""
+    samples = []
+    started = time.perf_counter()
+    for _ in range(count):
+        call_started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - call_started)
+        if time.perf_counter() - started > time_budget:
+            break
+    return samples
+
+
+def benchmark_load(map_name: str, time_budget: float) -> dict:
+    """Arena(map_name) from the PNG, compiling the cache, and from the cache"""
+    cache_path = os.path.join(
+        config.SOURCE_FOLDER, map_name + config.MAP_CACHE_EXTENSION
+    )
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+
+    config.USE_MAP_CACHE = False
+    png = repeat(lambda: Arena(map_name), 3, time_budget)
+    config.USE_MAP_CACHE = True
+    started = time.perf_counter()
+    Arena(map_name)
+    compile_seconds = time.perf_counter() - started
+    cached = repeat(lambda: Arena(map_name), 10, time_budget)
+    return {
+        "png_s": min(png),
+        "compile_s": compile_seconds,
+        "cached_s": min(cached),
+    }
+
+
+def benchmark_pathfinding(
+    map_name: str, queries: int, time_budget: float, seed: int
+) -> dict:
+    """find_next_move_to_target between random floor cells, path cache cleared"""
+    arena = Arena(map_name)
+    floor = np.argwhere(arena.pathfinding_matrix)  # [y, x]
+    rng = np.random.default_rng(seed)
+    pairs = floor[rng.integers(0, len(floor), size=(queries, 2))][:, :, ::-1].tolist()
+    pairs_iter = iter(pairs)
+
+    def query():
+        start, end = next(pairs_iter)
+        arena.path_cache.clear()
+        arena.find_next_move_to_target(tuple(start), tuple(end))
+
+    # the first search also builds the grid
+    started = time.perf_counter()
+    query()
+    first_seconds = time.perf_counter() - started
+    samples = repeat(query, queries - 1, time_budget)
+    return {
+        "first_query_s": first_seconds,
+        "queries": len(samples),
+        "mean_us": float(np.mean(samples)) * 1e6 if samples else 0.0,
+        "p50_us": percentile(samples, 50) * 1e6,
+        "p95_us": percentile(samples, 95) * 1e6,
+    }
+
+
+def create_game(map_name: str, player_count: int) -> Game:
+    players_red = [
+        Player(f"Red {i}", "RED", StrategyStraightOrb())
+        for i in range((player_count + 1) // 2)
+    ]
+    players_blue = [
+        Player(f"Blue {i}", "BLUE", StrategyStraightOrb())
+        for i in range(player_count // 2)
+    ]
+    game = Game(map_name, players_red, players_blue, event_log=EventLog(enabled=False))
+    game.spawn_players()
+    game.spawn_meta_orb()
+    game.max_ticks = sys.maxsize
+    game.running = True
+    return game
+
+
+def benchmark_ticks(
+    map_name: str, player_count: int, ticks: int, time_budget: float
+) -> dict:
+    """Game.process_tick throughput"""
+    game = create_game(map_name, player_count)
+    samples = repeat(game.process_tick, ticks, time_budget)
+    return {
+        "ticks": len(samples),
+        "ticks_per_s": len(samples) / sum(samples) if samples else 0.0,
+        "p50_ms": percentile(samples, 50) * 1e3,
+        "p95_ms": percentile(samples, 95) * 1e3,
+    }
+
+
+def benchmark_vector_ticks(
+    map_name: str, player_count: int, ticks: int, time_budget: float, seed: int
+) -> dict:
+    """VectorGame.step throughput with random actions"""
+    game = VectorGame(
+        map_name, (player_count + 1) // 2, player_count // 2, VECTOR_MATCHES
+    )
+    rng = np.random.default_rng(seed)
+    actions = rng.integers(0, len(ACTIONS), size=(ticks, VECTOR_MATCHES, player_count))
+    actions_iter = iter(actions)
+    samples = repeat(lambda: game.step(next(actions_iter)), ticks, time_budget)
+    return {
+        "matches": VECTOR_MATCHES,
+        "ticks": len(samples),
+        "match_ticks_per_s": (
+            len(samples) * VECTOR_MATCHES / sum(samples) if samples else 0.0
+        ),
+        "p50_ms": percentile(samples, 50) * 1e3,
+    }
+
+
+def benchmark_memory(map_name: str, player_count: int, ticks: int) -> dict:
+    """Peak Python and NumPy allocations of creating and playing a match"""
+    tracemalloc.start()
+    try:
+        game = create_game(map_name, player_count)
+        for _ in range(ticks):
+            game.process_tick()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_kib": peak / 1024,
+        "state_kib": game.map.state.nbytes / 1024,
+    }
+
+
+def get_metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run_benchmarks(args: argparse.Namespace) -> dict:
+    results = []
+
+    def report(benchmark: str, map_name: str, cells: int, values: dict, **keys):
+        result = {"benchmark": benchmark, "map": map_name, "cells": cells}
+        result.update(keys)
+        result.update(values)
+        results.append(result)
+        print(json.dumps(result), file=sys.stderr)
+
+    source_folder = config.SOURCE_FOLDER
+    use_map_cache = config.USE_MAP_CACHE
+    with tempfile.TemporaryDirectory() as folder:
+        config.SOURCE_FOLDER = folder + os.sep
+        try:
+            for layout in args.layouts:
+                for size in args.sizes:
+                    map_name = f"{layout}_{size}"
+                    map_generator.save_map(
+                        map_generator.generate_map(
+                            size, size, layout, spawn_size=SPAWN_SIZE, seed=args.seed
+                        ),
+                        os.path.join(folder, map_name + ".png"),
+                    )
+                    cells = size * size
+
+                    report(
+                        "load",
+                        map_name,
+                        cells,
+                        benchmark_load(map_name, args.time_budget),
+                    )
+                    report(
+                        "pathfinding",
+                        map_name,
+                        cells,
+                        benchmark_pathfinding(
+                            map_name, args.queries, args.time_budget, args.seed
+                        ),
+                    )
+                    for player_count in args.players:
+                        report(
+                            "ticks",
+                            map_name,
+                            cells,
+                            benchmark_ticks(
+                                map_name, player_count, args.ticks, args.time_budget
+                            ),
+                            players=player_count,
+                        )
+                        report(
+                            "vector_ticks",
+                            map_name,
+                            cells,
+                            benchmark_vector_ticks(
+                                map_name,
+                                player_count,
+                                args.ticks,
+                                args.time_budget,
+                                args.seed,
+                            ),
+                            players=player_count,
+                        )
+                    report(
+                        "memory",
+                        map_name,
+                        cells,
+                        benchmark_memory(map_name, 6, args.memory_ticks),
+                        players=6,
+                    )
+        finally:
+            config.SOURCE_FOLDER = source_folder
+            config.USE_MAP_CACHE = use_map_cache
+
+    return {"metadata": get_metadata(), "results": results}
+
+
+def result_key(result: dict) -> tuple:
+    return (result["benchmark"], result["map"], result.get("players"))
+
+
+def compare(baseline: dict, current: dict) -> None:
+    """Print current / baseline for every shared number"""
+    baseline_results = {result_key(result): result for result in baseline["results"]}
+    for result in current["results"]:
+        old = baseline_results.get(result_key(result))
+        if old is None:
+            continue
+        ratios = [
+            f"{name} x{value / old[name]:.2f}"
+            for name, value in result.items()
+            if name not in ("cells", "players", "queries", "ticks", "matches")
+            and isinstance(value, (int, float))
+            and old.get(name)
+        ]
+        label = " ".join(str(part) for part in result_key(result) if part is not None)
+        print(f"{label}: {', '.join(ratios)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark map loading, pathfinding and ticks on generated maps"
+    )
+    parser.add_argument(
+        "--layouts", nargs="+", choices=map_generator.LAYOUTS, default=DEFAULT_LAYOUTS
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--players", nargs="+", type=int, default=DEFAULT_PLAYER_COUNTS)
+    parser.add_argument("--ticks", type=int, default=100, help="ticks per match")
+    parser.add_argument("--memory-ticks", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="path searches")
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        default=10.0,
+        help="seconds after which a measurement stops taking samples",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="results of an earlier run to compare to")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as file:
+            compare(json.load(file), results)
@@ -6,8 +6,57 @@ MAX_TICKS = 50
 PLAYERS_RED = ["Alice", "Bob", "Eve"]
 PLAYERS_BLUE = ["Charlie", "Diana", "Frank"]
 
+# SIMULATION SETTINGS
+# ticks run back to back when the simulation fell behind, the rest is skipped
+SIMULATION_MAX_CATCH_UP = 5
+
+# STRATEGY SETTINGS
+# where Strategy.get_action runs: "inline", "thread" or "process"
+STRATEGY_EXECUTOR = "inline"
+STRATEGY_WORKERS = 4
+# seconds per tick the strategies get in a thread or process pool
+STRATEGY_DEADLINE = 0.1
+
+# ENVIRONMENT SETTINGS
+# rewards of environment.OrbEnv per team, the other team gets the negative
+REWARD_PICK_UP = 1.0
+REWARD_SCORE = 10.0
+
+# SPECTATOR SETTINGS
+SPECTATOR_HOST = "127.0.0.1"
+# ticks queued for a client before they are dropped for a fresh snapshot
+SPECTATOR_QUEUE_SIZE = 8
+# bytes buffered per client before the server waits for it
+SPECTATOR_WRITE_BUFFER = 64 * 1024
+
+# PROFILER SETTINGS
+# samples kept per measurement for the percentiles
+PROFILER_WINDOW = 1024
+# phases listed in the viewer overlay while profiling, slowest first
+PROFILER_OVERLAY_LINES = 8
+
+# EVENT LOG SETTINGS
+EVENT_BUFFER_SIZE = 1024
+# lowest level shown in the viewer's message box: "debug", "info" or "warning"
+VIEWER_EVENT_LEVEL = "info"
+
+# REPLAY SETTINGS
+# ticks between full keyframes, seeking replays at most this many ticks of deltas
+REPLAY_KEYFRAME_INTERVAL = 64
+
 # MAP SETTINGS
 SOURCE_FOLDER: str = "assets/maps/"
+USE_MAP_CACHE = True
+MAP_CACHE_EXTENSION = ".orbmap"
+# distance fields to spawn tiles are only stored for maps up to this size
+MAP_CACHE_DISTANCE_FIELD_CELLS = 256 * 256
+
+# PATHFINDING SETTINGS
+PATH_CACHE_SIZE = 4096
+# cells per side of the buckets Arena sorts players into for spatial queries
+SPATIAL_BUCKET_SIZE = 8
+# "jps" (jump point search) or "astar", both find a shortest path
+PATHFINDING_METHOD = "jps"
 
 # UI SETTINGS
 TILE_SIZE = 25
@@ -15,4 +64,10 @@ MESSAGE_BOX_HEIGHT = 120
 MESSAGE_BOX_MARGIN = 10
 MAX_MESSAGES = 6
 PLAYER_TAG_SIZE = 10
+# largest side in pixels of the map textures, larger maps get a pixel per tile
+TILE_TEXTURE_MAX_SIZE = 4096
+# the map is drawn as textures of at most this many pixels per side
+TILE_TEXTURE_CHUNK_SIZE = 1024
 SCORING_BOARD_HEIGHT = 40
+# glide players and the orb between cells instead of jumping once per tick
+VIEWER_INTERPOLATION = True
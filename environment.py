@@ -0,0 +1,105 @@
+import random
+import numpy as np
+import config
+from arena_state import NO_PLAYER, TEAMS
+from events import EventLog
+from game import Game
+from game_objects.player import Player
+from map_cache import CompiledMap
+from observations import CHANNELS, Observations
+from vector_game import ACTIONS, decode_action
+
+
+class OrbEnv:
+    """A match to train strategies in, stepped with reset() and step().
+
+    Players without a strategy are the agents: step() takes one action code
+    of vector_game.ACTIONS per agent, in the order of `agents` (red players
+    first, like the arena). Players with a strategy play along as usual.
+    Observations are the read-only (teams, channels, height, width) views of
+    an Observations buffer, updated in place by every step."""
+
+    channels = CHANNELS
+    actions = ACTIONS
+
+    def __init__(
+        self,
+        map_name: str,
+        players_red: list[Player],
+        players_blue: list[Player],
+        max_ticks: int = config.MAX_TICKS,
+        compiled_map: CompiledMap | None = None,
+    ):
+        self.game = Game(
+            map_name,
+            players_red,
+            players_blue,
+            compiled_map,
+            event_log=EventLog(enabled=False),
+        )
+        self.game.max_ticks = max_ticks
+        self.game.spawn_players()
+        self.game.spawn_meta_orb()
+        self.game.running = True
+        self.start = self.game.snapshot()
+
+        arena = self.game.map
+        self.players: list[Player] = list(arena.players)
+        self.agents: list[Player] = [
+            player for player in self.players if player.strategy is None
+        ]
+        self.agent_teams = np.array(
+            [TEAMS.index(player.team) for player in self.agents], dtype=np.int8
+        )
+        self.observations = Observations(arena)
+
+    @property
+    def observation_shape(self) -> tuple[int, ...]:
+        return self.observations.views.shape
+
+    def reset(self, seed: int | None = None) -> np.ndarray:
+        """Start the match over, returns the observations"""
+        if seed is not None:
+            # scripted strategies draw from the global generators
+            random.seed(seed)
+            np.random.seed(seed)
+        self.game.restore(self.start)
+        return self.observations.update(self.game.map)
+
+    def step(self, actions) -> tuple[np.ndarray, np.ndarray, bool, dict]:
+        """One tick with an action code per agent.
+
+        Returns the observations, the reward per team (in TEAMS order), whether
+        the match is over and some details about the tick."""
+        game = self.game
+        arena = game.map
+        state = arena.state
+        carrier_before = state.orb_carrier
+        scores_before = (game.score_red, game.score_blue)
+
+        game.process_tick(
+            {
+                player: decode_action(arena.get_position_of_player(player), int(code))
+                for player, code in zip(self.agents, actions)
+            }
+        )
+
+        rewards = np.zeros(len(TEAMS))
+        state = arena.state
+        if state.orb_carrier != carrier_before and state.orb_carrier != NO_PLAYER:
+            team = state.player_teams[state.orb_carrier]
+            rewards[team] += config.REWARD_PICK_UP
+            rewards[1 - team] -= config.REWARD_PICK_UP
+        score_gain = (
+            game.score_red - scores_before[0] - (game.score_blue - scores_before[1])
+        )
+        rewards += config.REWARD_SCORE * score_gain * np.array([1, -1])
+
+        done = not game.running or game.tick >= game.max_ticks
+        info = {
+            "tick": game.tick,
+            "orb_carrier": state.orb_carrier,
+            "score_red": game.score_red,
+            "score_blue": game.score_blue,
+        }
+        return self.observations.update(arena), rewards, done, info
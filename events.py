@@ -0,0 +1,146 @@
+import json
+import logging
+import sys
+from collections import deque
+from typing import Callable, NamedTuple, TextIO
+import config
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+DISABLED = sys.maxsize
+
+LEVEL_NAMES = {"debug": DEBUG, "info": INFO, "warning": WARNING, "off": DISABLED}
+
+
+class GameEvent(NamedTuple):
+    sequence: int
+    tick: int
+    kind: str
+    level: int
+    player: str | None = None
+    x: int = -1
+    y: int = -1
+    detail: str = ""
+
+    def format(self) -> str:
+        """Human readable text of the event"""
+        position = (self.x, self.y)
+        if self.kind == "action":
+            return f"Player {self.player} actions: {self.detail}"
+        if self.kind == "move":
+            return f"Player {self.player} moved to {position}"
+        if self.kind == "blocked":
+            return f"Player {self.player} cannot move to {position}: {self.detail}"
+        if self.kind == "pick_up":
+            return f"Player {self.player} picked up the Meta Orb"
+        if self.kind == "pick_up_failed":
+            return f"Player {self.player} cannot pick up orb: {self.detail}"
+        if self.kind == "late":
+            return f"Player {self.player} missed the deadline and forfeits the action"
+        if self.kind == "tick_end":
+            return f"Tick {self.tick} finished"
+        return self.detail
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+class EventLog:
+    """Leveled game events kept in a ring buffer and passed on to subscribers.
+
+    Events below the lowest level anyone listens to are dropped right at the
+    start of emit(), a disabled log drops everything."""
+
+    def __init__(
+        self,
+        capacity: int | None = None,
+        buffer_level: int = INFO,
+        enabled: bool = True,
+    ):
+        self.events: deque[GameEvent] = deque(
+            maxlen=capacity or config.EVENT_BUFFER_SIZE
+        )
+        self.buffer_level = buffer_level
+        self.subscribers: list[tuple[int, Callable[[GameEvent], None]]] = []
+        self.enabled = enabled
+        self.tick = 0
+        self.count = 0  # number of events emitted so far
+        self.min_level = DISABLED
+        self.update_min_level()
+
+    def update_min_level(self):
+        levels = [self.buffer_level] + [level for level, _ in self.subscribers]
+        self.min_level = min(levels) if self.enabled else DISABLED
+
+    def subscribe(self, callback: Callable[[GameEvent], None], level: int = INFO):
+        """Call callback for every event at or above level"""
+        self.subscribers.append((level, callback))
+        self.update_min_level()
+
+    def unsubscribe(self, callback: Callable[[GameEvent], None]):
+        self.subscribers = [
+            (level, subscriber)
+            for level, subscriber in self.subscribers
+            if subscriber != callback
+        ]
+        self.update_min_level()
+
+    def emit(
+        self,
+        kind: str,
+        level: int,
+        player: str | None = None,
+        position: tuple[int, int] | None = None,
+        detail: str = "",
+    ):
+        if level < self.min_level:
+            return
+        x, y = position if position is not None else (-1, -1)
+        event = GameEvent(self.count, self.tick, kind, level, player, x, y, detail)
+        self.count += 1
+        if level >= self.buffer_level:
+            self.events.append(event)
+        for subscriber_level, callback in self.subscribers:
+            if level >= subscriber_level:
+                callback(event)
+
+    def events_since(self, sequence: int) -> list[GameEvent]:
+        """Buffered events emitted after the given count"""
+        new_events = []
+        for event in reversed(self.events):
+            if event.sequence < sequence:
+                break
+            new_events.append(event)
+        new_events.reverse()
+        return new_events
+
+    def truncate(self, count: int):
+        """Forget buffered events emitted after the given count, used for undo"""
+        while self.events and self.events[-1].sequence >= count:
+            self.events.pop()
+        self.count = min(self.count, count)
+
+    def messages(self, level: int = INFO) -> list[str]:
+        return [event.format() for event in self.events if event.level >= level]
+
+
+class StdoutSink:
+    def __init__(self, stream: TextIO | None = None):
+        self.stream = stream or sys.stdout
+
+    def __call__(self, event: GameEvent):
+        print(event.format(), file=self.stream)
+
+
+class JsonlFileSink:
+    """Writes one JSON object per event, buffered by the file object"""
+
+    def __init__(self, path: str):
+        self.file = open(path, "a", buffering=1 << 16)
+
+    def __call__(self, event: GameEvent):
+        self.file.write(json.dumps(event.to_dict(), separators=(",", ":")) + "\n")
+
+    def close(self):
+        self.file.close()
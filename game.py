@@ -1,8 +1,91 @@
-from arena import Arena
-from game_objects.player import Player
-from viewer import MapViewer
+import copy
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+from arena import Arena, MoveRecord
+from ai.team_context import TeamContext
+from arena_state import ArenaState, TEAMS
+from instrumentation import NULL_PROFILER, NullProfiler, Profiler
+from events import EventLog, DEBUG, INFO, WARNING
+from game_objects.player import Player, PlayerStats
 from game_objects.meta_orb import MetaOrb
+from map_cache import CompiledMap
 import config
+import rules
+
+if TYPE_CHECKING:
+    from strategy_pool import StrategyPool
+
+
+@dataclass
+class MatchResult:
+    map_name: str
+    ticks: int
+    score_red: int
+    score_blue: int
+    orb_holder: str | None = None
+    orb_holder_team: str | None = None
+    orb_pickups: int = 0
+    player_stats: dict[str, PlayerStats] = field(default_factory=dict)
+
+
+@dataclass
+class GameSnapshot:
+    arena_state: ArenaState
+    tick: int
+    running: bool
+    score_red: int
+    score_blue: int
+    event_count: int
+
+
+@dataclass
+class TickChanges:
+    """What the last tick changed, so viewers only update the affected parts"""
+
+    tick: int
+    # cells whose occupant or orb changed
+    cells: set[tuple[int, int]] = field(default_factory=set)
+    moved_players: list[Player] = field(default_factory=list)
+    orb_changed: bool = False
+    score_changed: bool = False
+    new_messages: list[str] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (
+            self.cells or self.orb_changed or self.score_changed or self.new_messages
+        )
+
+
+@dataclass
+class StrategyLatency:
+    """Time one player's strategy spent in get_action"""
+
+    calls: int = 0
+    late: int = 0  # actions forfeited because the tick deadline passed
+    total: float = 0.0
+    max: float = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.calls += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+
+@dataclass
+class ActionRecord:
+    """Undo information for Game.apply_action"""
+
+    move: MoveRecord
+    score_red: int
+    score_blue: int
+    event_count: int
 
 
 class Game:
@@ -11,17 +94,31 @@ class Game:
         map_name: str,
         players_red: list[Player] | None = None,
         players_blue: list[Player] | None = None,
+        compiled_map: CompiledMap | None = None,
+        event_log: EventLog | None = None,
+        strategy_pool: "StrategyPool | None" = None,
     ):
-        self.map = Arena(map_name)
+        self.map = Arena(map_name, compiled_map=compiled_map)
+        self.events = event_log if event_log is not None else EventLog()
+        self.map.events = self.events
         self.players_red = players_red or []
         self.players_blue = players_blue or []
         self.player_list = []
         self.running = False
         self.tick = 0
+        self.max_ticks = config.MAX_TICKS
         self.score_red = 0
         self.score_blue = 0
 
-        self.game_messages: list[str] = []
+        self.changes = TickChanges(tick=self.tick)
+        self.replay_writer = None
+        # broadcasts every tick to remote viewers, see start_spectator_server()
+        self.spectator_server = None
+        # runs strategies off the game thread with a deadline, inline if None
+        self.strategy_pool = strategy_pool
+        self.strategy_latency: dict[str, StrategyLatency] = {}
+        # per-phase timings and counters, see enable_profiling()
+        self.profiler: Profiler | NullProfiler = NULL_PROFILER
 
         # Interleave red and blue players
         max_players = max(len(self.players_red), len(self.players_blue))
@@ -31,24 +128,21 @@ class Game:
             if i < len(self.players_blue):
                 self.player_list.append(self.players_blue[i])
 
+    @property
+    def game_messages(self) -> list[str]:
+        """Recent messages, taken from the buffered events"""
+        return self.events.messages(INFO)
+
     def spawn_players(self):
         """Spawn all players on the map"""
         red_spawn_points = self.map.get_positions_by_tile_name("RED_SPAWN")
         blue_spawn_points = self.map.get_positions_by_tile_name("BLUE_SPAWN")
 
         for i, player in enumerate(self.players_red):
-            field = self.map.get_field_by_coordinates(
-                red_spawn_points[i][0], red_spawn_points[i][1]
-            )
-            if field is not None:
-                field.player = player
+            self.map.place_player(player, red_spawn_points[i])
 
         for i, player in enumerate(self.players_blue):
-            field = self.map.get_field_by_coordinates(
-                blue_spawn_points[i][0], blue_spawn_points[i][1]
-            )
-            if field is not None:
-                field.player = player
+            self.map.place_player(player, blue_spawn_points[i])
 
     def spawn_meta_orb(self):
         """Spawn the Meta Orb on the map"""
@@ -56,33 +150,310 @@ class Game:
         if not orb_spawn_points:
             return  # No spawn points available
 
-        orb_position = orb_spawn_points[0]
-        field = self.map.get_field_by_coordinates(orb_position[0], orb_position[1])
-        if field is not None:
-            field.meta_orb = MetaOrb()
+        self.map.place_meta_orb(MetaOrb(), orb_spawn_points[0])
 
     def run_game_loop(self):
+        # imported here so headless runs never load arcade
+        from viewer import MapViewer
+        from simulation import Simulation
+
         self.running = True
-        # Create viewer and pass self - viewer will call process_tick()
-        self.viewer = MapViewer(self)
-        self.viewer.start()
+        # ticks run on their own thread, the viewer draws what they publish
+        simulation = Simulation(self)
+        self.viewer = MapViewer(self, simulation)
+        simulation.start()
+        try:
+            self.viewer.start()
+        finally:
+            simulation.stop()
+
+    def record_replay(self, path: str):
+        """Record every following tick into a replay file, see replay.py"""
+        from replay import ReplayWriter
+
+        self.stop_recording()
+        self.replay_writer = ReplayWriter(path, self)
+
+    def stop_recording(self):
+        if self.replay_writer is not None:
+            self.replay_writer.close()
+
+            self.replay_writer = None
+
+    def start_spectator_server(
+        self, port: int | None = 0, websocket_port: int | None = None
+    ):
+        """Let TCP and WebSocket clients watch the match, port 0 picks a free
+        port and None leaves that kind of client out"""
+        from spectator import SpectatorServer
+
+        self.stop_spectator_server()
+        self.spectator_server = SpectatorServer(
+            self, port=port, websocket_port=websocket_port
+        ).start()
+        return self.spectator_server
+
+    def stop_spectator_server(self):
+        if self.spectator_server is not None:
+            self.spectator_server.stop()
+            self.spectator_server = None
+
+    def enable_profiling(self, profiler: Profiler | None = None) -> Profiler:
+        """Time the phases of every tick and count arena queries"""
+        self.disable_profiling()
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.map.profiler = self.profiler
+        return self.profiler
 
-    def process_tick(self):
-        """Called by viewer every tick - handles all game logic"""
+    def disable_profiling(self):
+        self.profiler = NULL_PROFILER
+        self.map.profiler = NULL_PROFILER
+
+    def run_headless(self, max_ticks: int | None = None) -> MatchResult:
+        """Run the match without a window and without delay between ticks"""
+        if max_ticks is not None:
+            self.max_ticks = max_ticks
+
+        self.running = True
+        while self.running:
+            self.process_tick()
+        return self.get_result()
+
+    def get_result(self) -> MatchResult:
+        """Summarize the current state of the match"""
+        meta_orb = self.map.get_meta_orb_object()
+        holder = meta_orb.carried_by if meta_orb is not None else None
+        player_stats = {
+            player.name: self.map.get_player_stats(player)
+            for player in self.player_list
+        }
+        return MatchResult(
+            map_name=self.map.name,
+            ticks=min(self.tick, self.max_ticks),
+            score_red=self.score_red,
+            score_blue=self.score_blue,
+            orb_holder=holder.name if holder is not None else None,
+            orb_holder_team=holder.team if holder is not None else None,
+            orb_pickups=sum(stats.pick_ups for stats in player_stats.values()),
+            player_stats=player_stats,
+        )
+
+    def snapshot(self) -> GameSnapshot:
+        """Copy of everything a tick can change, the map data is shared"""
+        return GameSnapshot(
+            arena_state=self.map.snapshot(),
+            tick=self.tick,
+            running=self.running,
+            score_red=self.score_red,
+            score_blue=self.score_blue,
+            event_count=self.events.count,
+        )
+
+    def restore(self, snapshot: GameSnapshot) -> None:
+        """Return to a snapshot, which can be restored again later"""
+        self.map.restore(snapshot.arena_state)
+        self.tick = snapshot.tick
+        self.running = snapshot.running
+        self.score_red = snapshot.score_red
+        self.score_blue = snapshot.score_blue
+        self.events.truncate(snapshot.event_count)
+
+    def clone(self) -> "Game":
+        """Independent game for simulations, without a viewer"""
+        game = copy.copy(self)
+        game.map = self.map.clone()
+        # simulated ticks do not show up in the log of the real match
+        game.events = EventLog(enabled=False)
+        game.map.events = game.events
+        game.__dict__.pop("viewer", None)
+        game.replay_writer = None
+        game.spectator_server = None
+        game.strategy_pool = None
+        game.strategy_latency = {}
+        game.profiler = NULL_PROFILER
+        return game
+
+    def apply_action(self, player: Player, action: dict | None) -> ActionRecord:
+        """Carry out a single action, the record can be passed to undo_action"""
+        record = ActionRecord(
+            move=self.map.record_player(player),
+            score_red=self.score_red,
+            score_blue=self.score_blue,
+            event_count=self.events.count,
+        )
+        player.perform_action(self.map, self, action)
+        return record
+
+    def undo_action(self, record: ActionRecord) -> None:
+        """Revert actions in the reverse order they were applied"""
+        self.map.revert(record.move)
+        self.score_red = record.score_red
+        self.score_blue = record.score_blue
+        self.events.truncate(record.event_count)
+
+    def decide_actions(
+        self, given: dict[Player, dict | None] | None = None
+    ) -> list[dict | None]:
+        """Actions of every player, decided on a read-only arena. Players in
+        given take the action given there, their strategies are not asked."""
+        given = given or {}
+        contexts = self.create_team_contexts()
+        if self.strategy_pool is not None:
+            return self.decide_actions_in_pool(contexts, given)
+
+        actions = []
+        self.map.state.set_writeable(False)
+        try:
+            for player in self.player_list:
+                if player in given:
+                    actions.append(given[player])
+                    continue
+                started = time.perf_counter()
+                actions.append(player.decide_action(self.map, contexts[player.team]))
+                if player.strategy is not None:
+                    seconds = time.perf_counter() - started
+                    self.get_strategy_latency(player).record(seconds)
+                    self.profiler.record(f"decide:{player.name}", seconds)
+        finally:
+            self.map.state.set_writeable(True)
+        return actions
+
+    def create_team_contexts(self) -> dict[str, TeamContext]:
+        """Fresh per-team caches for the strategies, answers about the orb are
+        shared between the teams"""
+        shared: dict = {}
+        lock = threading.RLock()
+        return {
+            team: TeamContext(self.map, team, self.tick, shared, lock) for team in TEAMS
+        }
+
+    def decide_actions_in_pool(
+        self, contexts: dict[str, TeamContext], given: dict[Player, dict | None]
+    ) -> list[dict | None]:
+        pool = self.strategy_pool
+        for player, seconds in pool.collect_late():  # type: ignore
+            self.get_strategy_latency(player).record(seconds)
+
+        deciding = [player for player in self.player_list if player not in given]
+        decisions = dict(
+            zip(deciding, pool.decide(self.map, deciding, contexts))  # type: ignore
+        )
+        actions = []
+        for player in self.player_list:
+            if player in given:
+                actions.append(given[player])
+                continue
+            action, seconds = decisions[player]
+            actions.append(action)
+            if player.strategy is None:
+                continue
+            latency = self.get_strategy_latency(player)
+            if seconds is None:
+                latency.late += 1
+                self.events.emit("late", WARNING, player.name)
+                continue
+            latency.record(seconds)
+            self.profiler.record(f"decide:{player.name}", seconds)
+            if self.events.min_level <= DEBUG:
+                self.events.emit("action", DEBUG, player.name, detail=str(action))
+        return actions
+
+    def get_strategy_latency(self, player: Player) -> StrategyLatency:
+        latency = self.strategy_latency.get(player.name)
+        if latency is None:
+            latency = self.strategy_latency[player.name] = StrategyLatency()
+        return latency
+
+    def process_tick(self, actions: dict[Player, dict | None] | None = None):
+        """Called by viewer every tick - handles all game logic.
+
+        actions are taken instead of asking the strategies of these players,
+        e.g. for players steered by an environment."""
         self.tick += 1
+        self.events.tick = self.tick
         if not self.running:
+            self.changes = TickChanges(tick=self.tick)
             return
 
-        if self.tick > config.MAX_TICKS and self.running:
+        profiler = self.profiler
+        tick_started = time.perf_counter()
+        state = self.map.state
+        positions_before = state.player_positions.copy()
+        orb_position_before = self.map.get_meta_orb_position()
+        orb_carrier_before = state.orb_carrier
+        scores_before = (self.score_red, self.score_blue)
+        event_count = self.events.count
+
+        if self.tick > self.max_ticks and self.running:
             self.running = False
-            if hasattr(self, "viewer"):
-                self.game_messages.append("Game finished!")
-                return
+            self.events.emit("game_end", INFO, detail="Game finished!")
+        else:
+            # all players decide on the same state, then act together
+            with profiler.phase("decide"):
+                decided = self.decide_actions(actions)
+            with profiler.phase("resolve"):
+                rules.resolve_actions(self.map, self.player_list, decided, self.tick)
 
-        # each player takes an action
-        for player in self.player_list:
-            player.take_action(self.map, self)
+        if scores_before != (self.score_red, self.score_blue):
+            self.events.emit(
+                "score", INFO, detail=f"RED {self.score_red} : {self.score_blue} BLUE"
+            )
+
+        # what the viewer gets handed
+        with profiler.phase("changes"):
+            self.changes = self.collect_changes(
+                positions_before,
+                orb_position_before,
+                orb_carrier_before,
+                scores_before,
+                event_count,
+            )
+        self.events.emit("tick_end", DEBUG)
+
+        if self.replay_writer is not None:
+            self.replay_writer.record_tick(self, self.changes)
+            if not self.running:
+                self.stop_recording()
+        if self.spectator_server is not None:
+            self.spectator_server.publish(self, self.changes)
+
+        if profiler.enabled:
+            profiler.record("tick", time.perf_counter() - tick_started)
+            profiler.end_tick()
+
+    def collect_changes(
+        self,
+        positions_before,
+        orb_position_before: tuple[int, int] | None,
+        orb_carrier_before: int,
+        scores_before: tuple[int, int],
+        event_count: int,
+    ) -> TickChanges:
+        """Compare the state before the tick with the current one"""
+        state = self.map.state
+        changes = TickChanges(tick=self.tick)
+
+        positions = state.player_positions
+        moved = (positions != positions_before).any(axis=1).nonzero()[0]
+        for index in moved.tolist():
+            changes.moved_players.append(self.map.players[index])
+            for x, y in (positions_before[index].tolist(), positions[index].tolist()):
+                if x >= 0:
+                    changes.cells.add((x, y))
+
+        orb_position = self.map.get_meta_orb_position()
+        if orb_position != orb_position_before or (
+            state.orb_carrier != orb_carrier_before
+        ):
+            changes.orb_changed = True
+            for position in (orb_position_before, orb_position):
+                if position is not None:
+                    changes.cells.add(position)
 
-        # set messages for viewer
-        if hasattr(self, "viewer"):
-            self.viewer.messages = self.game_messages.copy()
+        changes.score_changed = scores_before != (self.score_red, self.score_blue)
+        changes.new_messages = [
+            event.format()
+            for event in self.events.events_since(event_count)
+            if event.level >= INFO
+        ]
+        return changes
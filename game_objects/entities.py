@@ -1,6 +1,7 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from typing import TYPE_CHECKING
+import numpy as np
 
 if TYPE_CHECKING:
     from game_objects.meta_orb import MetaOrb
@@ -40,3 +41,38 @@ def get_tile_by_color(color: tuple[int, int, int]) -> Tile:
         if tile.import_color == color:
             return tile
     return TILES[-1]
+
+
+UNKNOWN_TILE_ID = len(TILES) - 1
+TILE_IDS = {tile.name: tile_id for tile_id, tile in enumerate(TILES)}
+TILE_PASSABLE = np.array([tile.passable for tile in TILES], dtype=bool)
+TILE_DISPLAY_COLORS = np.array([tile.display_color for tile in TILES], dtype=np.uint8)
+
+
+def pack_colors(colors: np.ndarray) -> np.ndarray:
+    """Pack the RGB channels of an (..., 3+) array into one integer per pixel"""
+    colors = colors[..., :3].astype(np.uint32)
+    return (colors[..., 0] << 16) | (colors[..., 1] << 8) | colors[..., 2]
+
+
+# packed import colors sorted for lookup, with the matching tile ids
+_color_keys = np.array(
+    [pack_colors(np.array(tile.import_color)) for tile in TILES if tile.import_color],
+    dtype=np.uint32,
+)
+_color_tile_ids = np.array(
+    [tile_id for tile_id, tile in enumerate(TILES) if tile.import_color],
+    dtype=np.uint8,
+)
+_color_order = np.argsort(_color_keys)
+_color_keys = _color_keys[_color_order]
+_color_tile_ids = _color_tile_ids[_color_order]
+
+
+def get_tile_ids_by_colors(colors: np.ndarray) -> np.ndarray:
+    """Vectorized get_tile_by_color, returns an index into TILES for every pixel"""
+    keys = pack_colors(colors)
+    slots = np.searchsorted(_color_keys, keys).clip(max=len(_color_keys) - 1)
+    return np.where(
+        _color_keys[slots] == keys, _color_tile_ids[slots], UNKNOWN_TILE_ID
+    ).astype(np.uint8)
@@ -1,10 +1,22 @@
 from __future__ import annotations
+from dataclasses import dataclass
 from typing import TYPE_CHECKING
+from ai.strategy import takes_context
+from events import DEBUG
+import rules
 
 if TYPE_CHECKING:
     from arena import Arena
     from game import Game
     from ai.strategy import Strategy
+    from ai.team_context import TeamContext
+
+
+@dataclass
+class PlayerStats:
+    moves: int = 0
+    blocked_moves: int = 0
+    pick_ups: int = 0
 
 
 class Player:
@@ -15,96 +27,31 @@ class Player:
         self.strategy = strategy
 
     def take_action(self, arena: Arena, game: Game):
-        """ask strategy for next actions"""
-        if self.strategy:
+        """ask strategy for next actions and carry them out right away"""
+        self.perform_action(arena, game, self.decide_action(arena))
+
+    def decide_action(
+        self, arena: Arena, context: TeamContext | None = None
+    ) -> dict | None:
+        """ask strategy for next actions without changing the arena"""
+        if not self.strategy:
+            return None
+        if context is not None and takes_context(self.strategy):
+            action = self.strategy.get_action(self, arena, context=context)
+        else:
             action = self.strategy.get_action(self, arena)
-            print(f"Player {self.name} actions: {action}")
+        if arena.events.min_level <= DEBUG:
+            arena.events.emit("action", DEBUG, self.name, detail=str(action))
+        return action
 
-            # choose first action for now
-            if action:
-                if "move" in action:
-                    self.move_to(arena, action["move"])
-
-                if "pick_up" in action:
-                    self.pick_up(arena)
-                    game.game_messages.append(
-                        f"Player {self.name} picked up the Meta Orb"
-                    )
+    def perform_action(self, arena: Arena, game: Game, action: dict | None):
+        """Carry out an action as returned by Strategy.get_action"""
+        rules.apply_action(arena, self, action)
 
     def move_to(self, arena: Arena, new_position: tuple[int, int]):
-        """Update player position (to be called by Game)"""
-        # get current position
-        current_position = arena.get_position_of_player(self)
-
-        if current_position is None:
-            return  # Player not on the map
-
-        current_field = arena.get_field_by_coordinates(
-            current_position[0], current_position[1]
-        )
-
-        # update player position
-        new_field = arena.get_field_by_coordinates(new_position[0], new_position[1])
-
-        # out of bounds
-        if new_field is None:
-            print(f"Player {self.name} cannot move to {new_position}: out of bounds")
-            return
-
-        # not passable
-        if not new_field.tile.passable:
-            print(f"Player {self.name} cannot move to {new_position}: not passable")
-            return
-
-        # occupied by another player
-        if new_field.player:
-            print(
-                f"Player {self.name} cannot move to {new_position}: occupied by another player {new_field.player.name}. Try to move elsewhere."
-            )
-            possible_moves = arena.get_passable_adjacent_positions(current_position)
-            if possible_moves:
-                new_field = arena.get_field_by_coordinates(
-                    possible_moves[0][0], possible_moves[0][1]
-                )
-            else:
-                return
-
-        if new_field is None:
-            return  # no valid move found
-
-        # move player to new field
-        new_field.player = self
-
-        # if orb is carried by this player, update its position
-        meta_orb = arena.get_meta_orb_object()
-        if meta_orb and meta_orb.carried_by == self:
-            arena.change_meta_orb_position(new_position)
-
-        # reset current field
-        if current_field is not None:
-            current_field.player = None
+        """Update player position, stays in place if the move is blocked"""
+        rules.apply_action(arena, self, {"move": new_position})
 
     def pick_up(self, map: Arena):
         """Pick up Meta Orb if on the same field and not already carried"""
-        current_position = map.get_position_of_player(self)
-        if current_position is None:
-            print(f"Player {self.name} cannot pick up orb: not on the map")
-            return
-
-        current_field = map.get_field_by_coordinates(
-            current_position[0], current_position[1]
-        )
-
-        if current_field and current_field.meta_orb:
-            meta_orb = current_field.meta_orb
-
-            if meta_orb.carried_by is not None:
-                print(
-                    f"Player {self.name} cannot pick up orb: already carried by {meta_orb.carried_by.name}"
-                )
-                return
-            meta_orb.carried_by = self
-            meta_orb.carried = True  # type:ignore
-            print(f"Player {self.name} picked up the Meta Orb")
-        else:
-            print(f"Player {self.name} cannot pick up orb: no orb on the field")
+        rules.apply_action(map, self, {"pick_up": True})
@@ -0,0 +1,459 @@
+from typing import Iterable
+import numpy as np
+
+PATHFINDING_METHODS = ("astar", "jps")
+# stamp of blocked cells, newer than any search so they are never opened
+BLOCKED = 1 << 62
+
+
+def pad(matrix: np.ndarray) -> np.ndarray:
+    """Passable matrix with a blocked border, so neighbours need no bounds checks"""
+    height, width = matrix.shape
+    padded = np.zeros((height + 2, width + 2), dtype=bool)
+    padded[1:-1, 1:-1] = matrix
+    return padded
+
+
+def compute_distance_field(
+    matrix: np.ndarray, targets: list[tuple[int, int]]
+) -> np.ndarray:
+    """Breadth first search distances from every cell to the nearest target,
+    -1 for cells that cannot reach any target"""
+    height, width = matrix.shape
+    row = width + 2
+    unvisited = pad(matrix).ravel()
+    distances = np.full(unvisited.shape, -1, dtype=np.int32)
+
+    frontier = np.array(
+        [(y + 1) * row + x + 1 for x, y in targets], dtype=np.intp
+    ).reshape(-1)
+    frontier = frontier[unvisited[frontier]]
+    unvisited[frontier] = False
+    distances[frontier] = 0
+
+    # one ring of cells per step, all of it at once
+    offsets = np.array([row, -row, -1, 1], dtype=np.intp)
+    distance = 0
+    while len(frontier):
+        distance += 1
+        neighbours = (frontier[:, None] + offsets).ravel()
+        frontier = neighbours[unvisited[neighbours]]
+        if len(frontier) > 64:
+            frontier = np.unique(frontier)
+        unvisited[frontier] = False
+        distances[frontier] = distance
+    return distances.reshape(height + 2, row)[1:-1, 1:-1]
+
+
+def next_step(distances: np.ndarray, start: tuple[int, int]) -> tuple[int, int] | None:
+    """Step to the neighbour closest to the targets of a distance field,
+    None at a target or where no target can be reached"""
+    height, width = distances.shape
+    best_step = None
+    best_distance = distances[start[1], start[0]]
+    if best_distance < 0:
+        return None  # no target is reachable from start
+
+    x, y = start
+    for nx, ny in ((x, y + 1), (x, y - 1), (x - 1, y), (x + 1, y)):
+        if 0 <= nx < width and 0 <= ny < height:
+            distance = distances[ny, nx]
+            if 0 <= distance < best_distance:
+                best_step = (nx, ny)
+                best_distance = distance
+    return best_step
+
+
+class GridPathfinder:
+    """Shortest 4-neighbour paths on a passable matrix ([y, x], nonzero is
+    passable).
+
+    Cells are flat indexes into the matrix padded with a blocked border. The
+    search state lives in lists reused by every search and told apart by a
+    stamp per search, so a search allocates little more than its open list.
+    Both searches keep the open list as buckets of equal f instead of a heap,
+    f only grows in steps of 2 on a 4-neighbour grid. One pathfinder must not
+    search on two threads at once."""
+
+    def __init__(self, matrix: np.ndarray):
+        height, width = matrix.shape
+        self.width = width
+        self.row = width + 2
+        cells = (height + 2) * self.row
+        self.passable = bytearray(pad(matrix).tobytes())
+        # plain lists, indexing them is faster than arrays of machine ints
+        self.g = [0] * cells
+        self.parent = [0] * cells
+        self.stamp = [0 if passable else BLOCKED for passable in self.passable]
+        self.search = 0
+        self.jump_tables: tuple[memoryview, ...] | None = None
+        # connected area per cell of the unpadded matrix, -1 until flooded
+        self.components = np.full((height, width), -1, dtype=np.int32)
+        self.component_count = 0
+        # (xs, ys) of the cells of every flooded area, by component number
+        self.component_cells: list[tuple[np.ndarray, np.ndarray]] = []
+        self.expansions = 0  # nodes expanded by the last search
+
+    def index(self, position: tuple[int, int]) -> int:
+        return (position[1] + 1) * self.row + position[0] + 1
+
+    def position(self, index: int) -> tuple[int, int]:
+        y, x = divmod(index, self.row)
+        return (x - 1, y - 1)
+
+    def set_passable(self, position: tuple[int, int], passable: bool) -> None:
+        index = self.index(position)
+        self.passable[index] = 1 if passable else 0
+        self.stamp[index] = 0 if passable else BLOCKED
+        self.jump_tables = None
+        self.components[:] = -1
+        self.component_count = 0
+        self.component_cells = []
+
+    def find_nearest(
+        self,
+        start: tuple[int, int],
+        targets: Iterable[tuple[int, int]],
+        count: int = 1,
+    ) -> list[tuple[tuple[int, int], int]]:
+        """Up to count of the targets closest to start by path, with their path
+        lengths, nearest first. The search stops as soon as they are found."""
+        start_index = self.index(start)
+        remaining = {self.index(target) for target in targets}
+        if not self.passable[start_index] or not remaining:
+            return []
+        count = min(count, len(remaining))
+
+        row = self.row
+        passable, stamp = self.passable, self.stamp
+        self.search += 2
+        seen = self.search
+        stamp[start_index] = seen
+        found: list[tuple[tuple[int, int], int]] = []
+        frontier = [start_index]
+        distance = 0
+        while frontier:
+            reached = sorted(index for index in frontier if index in remaining)
+            found += [(self.position(index), distance) for index in reached]
+            if len(found) >= count:
+                return found[:count]
+            distance += 1
+            next_frontier = []
+            for index in frontier:
+                for neighbour in (index + row, index - row, index - 1, index + 1):
+                    if passable[neighbour] and stamp[neighbour] != seen:
+                        stamp[neighbour] = seen
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+        return found
+
+    def get_component(self, position: tuple[int, int]) -> int:
+        """Number of the connected area a cell belongs to, -1 if blocked"""
+        x, y = position
+        if not self.passable[self.index(position)]:
+            return -1
+        if self.components[y, x] < 0:
+            # flood the whole area once, it stays valid until passability changes
+            matrix = np.frombuffer(self.passable, dtype=np.uint8).reshape(-1, self.row)[
+                1:-1, 1:-1
+            ]
+            reached = compute_distance_field(matrix, [position]) >= 0
+            self.components[reached] = self.component_count
+            self.component_count += 1
+            ys, xs = np.nonzero(reached)
+            self.component_cells.append((xs, ys))
+        return int(self.components[y, x])
+
+    def find_closest_reachable(
+        self, start: tuple[int, int], target: tuple[int, int]
+    ) -> tuple[int, int] | None:
+        """Cell reachable from start with the smallest Manhattan distance to
+        target, target itself if it can be reached. None if start is blocked."""
+        component = self.get_component(start)
+        if component < 0:
+            return None
+        xs, ys = self.component_cells[component]
+        target_x, target_y = target
+        distances = np.abs(xs - target_x) + np.abs(ys - target_y)
+        # ties go to the cells not below target first, then left to right
+        keys = (distances * 2 + (ys < target_y)) * self.width + xs
+        closest = int(np.argmin(keys))
+        return (int(xs[closest]), int(ys[closest]))
+
+    def find_path(
+        self,
+        start: tuple[int, int],
+        end: tuple[int, int],
+        method: str = "astar",
+        obstacles: Iterable[tuple[int, int]] = (),
+    ) -> list[tuple[int, int]]:
+        """Positions from start to end, both included, empty without a path.
+
+        Obstacles are cells blocked for this search only, e.g. occupied by
+        players. Jump point search skips the open stretches between turning
+        points, it falls back to A* while there are obstacles."""
+        if method not in PATHFINDING_METHODS:
+            raise ValueError(f"Unknown method '{method}', use {PATHFINDING_METHODS}.")
+        start_index, end_index = self.index(start), self.index(end)
+        if not (self.passable[start_index] and self.passable[end_index]):
+            return []
+
+        self.search += 2
+        closed = self.search + 1
+        blocked = [self.index(position) for position in obstacles]
+        for index in blocked:
+            if index != start_index and index != end_index and self.passable[index]:
+                self.stamp[index] = closed
+
+        if method == "jps" and not blocked:
+            found = self.jump_point_search(start_index, end_index)
+        else:
+            found = self.astar(start_index, end_index)
+        if not found:
+            return []
+
+        # walk back over the parents, filling in the cells between jump points
+        path = [end_index]
+        index = end_index
+        while index != start_index:
+            parent = self.parent[index]
+            step = index - parent
+            step = (
+                (1 if step > 0 else -1)
+                if -self.row < step < self.row
+                else (self.row if step > 0 else -self.row)
+            )
+            while index != parent:
+                index -= step
+                path.append(index)
+        return [self.position(index) for index in reversed(path)]
+
+    def astar(self, start: int, end: int) -> bool:
+        row = self.row
+        g, parent, stamp = self.g, self.parent, self.stamp
+        opened, closed = self.search, self.search + 1
+        end_x = end % row
+        end_row = end - end_x  # first cell of the end's row
+
+        g[start] = 0
+        parent[start] = start
+        stamp[start] = opened
+        # a step towards end keeps f, any other step adds 2. Cells are taken
+        # from the end of the current bucket, which prefers the larger g.
+        current: list[int] = [start]
+        later: list[int] = []
+        expansions = 0
+        while current or later:
+            if not current:
+                current, later = later, current
+            index = current.pop()
+            if stamp[index] == closed:
+                continue
+            if index == end:
+                self.expansions = expansions
+                return True
+            stamp[index] = closed
+            expansions += 1
+
+            # unrolled over the neighbours, blocked cells are never opened
+            next_g = g[index] + 1
+            x = index % row
+            neighbour = index + row
+            if stamp[neighbour] < opened or (
+                stamp[neighbour] == opened and next_g < g[neighbour]
+            ):
+                g[neighbour] = next_g
+                parent[neighbour] = index
+                stamp[neighbour] = opened
+                (current if index < end_row else later).append(neighbour)
+            neighbour = index - row
+            if stamp[neighbour] < opened or (
+                stamp[neighbour] == opened and next_g < g[neighbour]
+            ):
+                g[neighbour] = next_g
+                parent[neighbour] = index
+                stamp[neighbour] = opened
+                (current if index >= end_row + row else later).append(neighbour)
+            neighbour = index - 1
+            if stamp[neighbour] < opened or (
+                stamp[neighbour] == opened and next_g < g[neighbour]
+            ):
+                g[neighbour] = next_g
+                parent[neighbour] = index
+                stamp[neighbour] = opened
+                (current if x > end_x else later).append(neighbour)
+            neighbour = index + 1
+            if stamp[neighbour] < opened or (
+                stamp[neighbour] == opened and next_g < g[neighbour]
+            ):
+                g[neighbour] = next_g
+                parent[neighbour] = index
+                stamp[neighbour] = opened
+                (current if x < end_x else later).append(neighbour)
+        self.expansions = expansions
+        return False
+
+    def build_jump_tables(self) -> tuple[memoryview, ...]:
+        """Where a jump in each direction stops, regardless of the target.
+
+        Moving along a row, a cell is a jump point when a neighbour above or
+        below opens up that was blocked next to the previous cell. Moving
+        along a column, also when a jump sideways would find one. A jump stops
+        on the first jump point or blocked cell, the tables hold that cell
+        for every start cell and direction (right, left, up, down)."""
+        passable = np.frombuffer(self.passable, dtype=np.uint8).astype(bool)
+        cells = len(passable)
+        row = self.row
+        indexes = np.arange(cells)
+
+        def shifted(offset: int) -> np.ndarray:
+            # passable[index + offset], blocked beyond the ends
+            result = np.zeros(cells, dtype=bool)
+            if offset > 0:
+                result[:-offset] = passable[offset:]
+            else:
+                result[-offset:] = passable[:offset]
+            return result
+
+        def first_stop(stops: np.ndarray, step: int) -> np.ndarray:
+            if step > 0:
+                stop_indexes = np.where(stops, indexes, cells)
+                grid = stop_indexes.reshape(-1, row)
+                if step == 1:
+                    grid = np.minimum.accumulate(grid[:, ::-1], axis=1)[:, ::-1]
+                else:
+                    grid = np.minimum.accumulate(grid[::-1], axis=0)[::-1]
+            else:
+                grid = np.where(stops, indexes, -1).reshape(-1, row)
+                grid = np.maximum.accumulate(grid, axis=1 if step == -1 else 0)
+            return grid.ravel()
+
+        up, down = shifted(row), shifted(-row)
+        left, right = shifted(-1), shifted(1)
+        stops_right = first_stop(
+            ~passable | (up & ~shifted(row - 1)) | (down & ~shifted(-row - 1)), 1
+        )
+        stops_left = first_stop(
+            ~passable | (up & ~shifted(row + 1)) | (down & ~shifted(-row + 1)), -1
+        )
+        sideways = np.zeros(cells, dtype=bool)
+        sideways[:-1] |= passable[stops_right[1:]]
+        sideways[1:] |= passable[stops_left[:-1]]
+        stops_up = first_stop(
+            ~passable
+            | (left & ~shifted(-1 - row))
+            | (right & ~shifted(1 - row))
+            | sideways,
+            row,
+        )
+        stops_down = first_stop(
+            ~passable
+            | (left & ~shifted(-1 + row))
+            | (right & ~shifted(1 + row))
+            | sideways,
+            -row,
+        )
+        return tuple(
+            memoryview(table.astype(np.int64))
+            for table in (stops_right, stops_left, stops_up, stops_down)
+        )
+
+    def jump_point_search(self, start: int, end: int) -> bool:
+        if self.jump_tables is None:
+            self.jump_tables = self.build_jump_tables()
+        stops_right, stops_left, stops_up, stops_down = self.jump_tables
+        row = self.row
+        passable, g, parent, stamp = self.passable, self.g, self.parent, self.stamp
+        opened, closed = self.search, self.search + 1
+        end_y, end_x = divmod(end, row)
+        end_row_start = end_y * row
+        end_row_stop = end_row_start + row
+
+        g[start] = 0
+        parent[start] = start
+        stamp[start] = opened
+        # jumps add an even amount to f, buckets[i] holds the cells of f = f0 + 2i
+        start_y, start_x = divmod(start, row)
+        start_f = abs(start_x - end_x) + abs(start_y - end_y)
+        buckets: list[list[int]] = [[start]]
+        bucket_index = 0
+        expansions = 0
+        while bucket_index < len(buckets):
+            bucket = buckets[bucket_index]
+            if not bucket:
+                bucket_index += 1
+                continue
+            index = bucket.pop()
+            if stamp[index] == closed:
+                continue
+            if index == end:
+                self.expansions = expansions
+                return True
+            stamp[index] = closed
+            expansions += 1
+
+            # only the directions a shortest path through index can continue in
+            step = index - parent[index]
+            if step == 0:
+                steps = (row, -row, -1, 1)
+            elif -row < step < row:
+                step = 1 if step > 0 else -1
+                steps = (step, row, -row)
+            else:
+                step = row if step > 0 else -row
+                steps = (step, 1, -1)
+
+            # the jump point reached from index (excluded) in each direction,
+            # the end itself where a jump passes it
+            index_g = g[index]
+            for step in steps:
+                if step == 1:
+                    jump_point = stops_right[index + 1]
+                    if end_row_start <= index < end <= jump_point:
+                        jump_point = end
+                    elif not passable[jump_point]:
+                        continue
+                    next_g = index_g + jump_point - index
+                elif step == -1:
+                    jump_point = stops_left[index - 1]
+                    if jump_point <= end < index < end_row_stop:
+                        jump_point = end
+                    elif not passable[jump_point]:
+                        continue
+                    next_g = index_g + index - jump_point
+                else:
+                    stop = (stops_up if step > 0 else stops_down)[index + step]
+                    # where the jump crosses the end's row, a jump point if
+                    # the end can be reached from there along the row
+                    crossing = end_row_start + index % row
+                    if (index < crossing <= stop or stop <= crossing < index) and (
+                        crossing == end
+                        or passable[crossing]
+                        and (
+                            end <= stops_right[crossing + 1]
+                            if crossing < end
+                            else stops_left[crossing - 1] <= end
+                        )
+                    ):
+                        jump_point = crossing
+                    elif passable[stop]:
+                        jump_point = stop
+                    else:
+                        continue
+                    next_g = index_g + abs(jump_point - index) // row
+
+                jump_stamp = stamp[jump_point]
+                if jump_stamp < opened or (
+                    jump_stamp == opened and next_g < g[jump_point]
+                ):
+                    g[jump_point] = next_g
+                    parent[jump_point] = index
+                    stamp[jump_point] = opened
+                    y, x = divmod(jump_point, row)
+                    f = next_g + abs(x - end_x) + abs(y - end_y)
+                    bucket_f = (f - start_f) >> 1
+                    while len(buckets) <= bucket_f:
+                        buckets.append([])
+                    buckets[bucket_f].append(jump_point)
+        self.expansions = expansions
+        return False
@@ -0,0 +1,169 @@
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+import numpy as np
+import config
+
+PERCENTILES = (50, 95, 99)
+
+
+class RollingHistogram:
+    """The last samples of a measurement in a ring buffer"""
+
+    def __init__(self, size: int):
+        self.samples = np.zeros(size)
+        self.count = 0  # samples added so far, older ones are overwritten
+
+    def add(self, value: float) -> None:
+        self.samples[self.count % len(self.samples)] = value
+        self.count += 1
+
+    def summary(self) -> dict:
+        samples = self.samples[: min(self.count, len(self.samples))]
+        if len(samples) == 0:
+            return {"count": 0}
+        p50, p95, p99 = np.percentile(samples, PERCENTILES).tolist()
+        return {
+            "count": self.count,
+            "mean": float(samples.mean()),
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+            "max": float(samples.max()),
+        }
+
+
+class PhaseTimer:
+    """Context manager adding the seconds spent inside to a histogram"""
+
+    def __init__(self, histogram: RollingHistogram, lock: threading.Lock):
+        self.histogram = histogram
+        self.lock = lock
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.started
+        with self.lock:
+            self.histogram.add(seconds)
+
+
+class NullPhase:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_PHASE = NullPhase()
+
+
+class NullProfiler:
+    """Stands in while profiling is off, every call does nothing"""
+
+    enabled = False
+
+    def phase(self, name: str) -> NullPhase:
+        return NULL_PHASE
+
+    def record(self, name: str, seconds: float) -> None:
+        pass
+
+    def count(self, name: str, amount: int = 1) -> None:
+        pass
+
+    def end_tick(self) -> None:
+        pass
+
+    def summary(self) -> dict:
+        return {}
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class Profiler:
+    """Wall time per phase and counters per tick as rolling histograms.
+
+    Phases are timed with `with profiler.phase(name)` or passed in through
+    record(). Counters are summed per tick, end_tick() turns them into one
+    sample each. Arenas report their lookups and path searches to the
+    profiler set as their `profiler`. Every call takes a lock, so the thread
+    workers of a strategy pool can report to the game's profiler too."""
+
+    enabled = True
+
+    def __init__(self, window: int | None = None):
+        self.window = window or config.PROFILER_WINDOW
+        self.phases: dict[str, RollingHistogram] = {}
+        self.counters: dict[str, RollingHistogram] = {}
+        self.totals: dict[str, int] = defaultdict(int)
+        self.tick_counts: dict[str, int] = defaultdict(int)
+        self.ticks = 0
+        self.allocated_blocks = sys.getallocatedblocks()
+        self.lock = threading.Lock()
+
+    def get_phase(self, name: str) -> RollingHistogram:
+        histogram = self.phases.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.phases.get(name)
+                if histogram is None:
+                    histogram = self.phases[name] = RollingHistogram(self.window)
+        return histogram
+
+    def phase(self, name: str) -> PhaseTimer:
+        # a new timer per use, phases may run on several threads at once
+        return PhaseTimer(self.get_phase(name), self.lock)
+
+    def record(self, name: str, seconds: float) -> None:
+        histogram = self.get_phase(name)
+        with self.lock:
+            histogram.add(seconds)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self.lock:
+            self.tick_counts[name] += amount
+
+    def end_tick(self) -> None:
+        """Close the counters of a tick, including the net allocations"""
+        with self.lock:
+            allocated_blocks = sys.getallocatedblocks()
+            self.tick_counts["allocated_blocks"] += (
+                allocated_blocks - self.allocated_blocks
+            )
+            self.allocated_blocks = allocated_blocks
+
+            for name in set(self.counters) | set(self.tick_counts):
+                histogram = self.counters.get(name)
+                if histogram is None:
+                    histogram = self.counters[name] = RollingHistogram(self.window)
+                value = self.tick_counts.get(name, 0)
+                histogram.add(value)
+                self.totals[name] += value
+            self.tick_counts.clear()
+            self.ticks += 1
+
+    def summary(self) -> dict:
+        """Phases in milliseconds and counters per tick"""
+        phases = {}
+        for name, histogram in sorted(self.phases.items()):
+            summary = histogram.summary()
+            phases[name] = {
+                key: value * 1000 if key != "count" else value
+                for key, value in summary.items()
+            }
+        counters = {
+            name: dict(histogram.summary(), total=self.totals[name])
+            for name, histogram in sorted(self.counters.items())
+        }
+        return {"ticks": self.ticks, "phases_ms": phases, "counters": counters}
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
@@ -1,7 +1,56 @@
+import argparse
 from game import Game
 from game_objects.player import Player
 import config
 from ai.strategy import StrategyStraightOrb
+from events import LEVEL_NAMES, EventLog, JsonlFileSink, StdoutSink
+
+parser = argparse.ArgumentParser(description="GAME OF ORB")
+parser.add_argument(
+    "--headless",
+    action="store_true",
+    help="run the match without a window, as fast as possible",
+)
+parser.add_argument(
+    "--max-ticks",
+    type=int,
+    default=config.MAX_TICKS,
+    help="number of ticks before the match ends",
+)
+parser.add_argument(
+    "--log-level",
+    choices=LEVEL_NAMES,
+    default="info",
+    help="lowest level of game events printed to the console",
+)
+parser.add_argument(
+    "--log-file", help="append every game event as JSON lines to this file"
+)
+parser.add_argument(
+    "--executor",
+    choices=("inline", "thread", "process"),
+    default=config.STRATEGY_EXECUTOR,
+    help="where strategies decide, pools give them a deadline per tick",
+)
+parser.add_argument("--record", help="record the match into this replay file")
+parser.add_argument("--replay", help="play back a recorded replay instead of a match")
+parser.add_argument(
+    "--spectator-port", type=int, help="let TCP clients watch on this port"
+)
+parser.add_argument(
+    "--websocket-port", type=int, help="let WebSocket clients watch on this port"
+)
+parser.add_argument(
+    "--profile", help="time every tick and write the percentiles as JSON to this file"
+)
+args = parser.parse_args()
+
+event_log = EventLog()
+if args.log_level != "off":
+    event_log.subscribe(StdoutSink(), LEVEL_NAMES[args.log_level])
+file_sink = JsonlFileSink(args.log_file) if args.log_file else None
+if file_sink is not None:
+    event_log.subscribe(file_sink, LEVEL_NAMES["debug"])
 
 # specify map name
 test_map_name: str = "the_petting_zoo"
@@ -14,7 +63,51 @@ players_blue: list[Player] = []
 for player in config.PLAYERS_BLUE:
     players_blue.append(Player(player, "BLUE", StrategyStraightOrb()))
 
-game = Game(test_map_name, players_red, players_blue)
+if args.replay:
+    from replay import ReplayGame
+
+    replay_game = ReplayGame(args.replay)
+    if args.headless:
+        replay_game.seek(replay_game.replay.last_tick)
+        print(replay_game.get_result())
+    else:
+        replay_game.run_game_loop()
+    raise SystemExit
+
+strategy_pool = None
+if args.executor != "inline":
+    from strategy_pool import StrategyPool
+
+    strategy_pool = StrategyPool(args.executor)
+
+game = Game(
+    test_map_name,
+    players_red,
+    players_blue,
+    event_log=event_log,
+    strategy_pool=strategy_pool,
+)
+game.max_ticks = args.max_ticks
 game.spawn_players()
 game.spawn_meta_orb()
-game.run_game_loop()
+if args.record:
+    game.record_replay(args.record)
+if args.profile:
+    game.enable_profiling()
+if args.spectator_port is not None or args.websocket_port is not None:
+    game.start_spectator_server(args.spectator_port, args.websocket_port)
+
+if args.headless:
+    result = game.run_headless()
+    print(result)
+else:
+    game.run_game_loop()
+game.stop_recording()
+game.stop_spectator_server()
+if args.profile:
+    game.profiler.dump(args.profile)
+if strategy_pool is not None:
+    strategy_pool.shutdown()
+
+if file_sink is not None:
+    file_sink.close()
@@ -0,0 +1,263 @@
+import hashlib
+import os
+import struct
+from dataclasses import dataclass, field
+import numpy as np
+import config
+import game_objects.entities as entities
+import grid_pathfinder
+
+MAGIC = b"ORBMAP\0\0"
+VERSION = 1
+
+# magic, version, width, height, png mtime (ns), png sha256,
+# number of red/blue/orb spawn positions, number of distance fields
+HEADER = struct.Struct("<8sIIIq32sIIII")
+ALIGNMENT = 8
+
+SPAWN_TILE_NAMES = ("RED_SPAWN", "BLUE_SPAWN", "ORB_SPAWN")
+
+
+@dataclass
+class CompiledMap:
+    name: str
+    tile_ids: np.ndarray  # tile ids in map coordinates [y, x]
+    passable: np.ndarray  # 1 for passable cells, 0 otherwise
+    spawn_positions: dict[str, list[tuple[int, int]]]
+    distance_fields: dict[tuple[int, int], np.ndarray] = field(default_factory=dict)
+
+    @property
+    def dimensions(self) -> tuple[int, int]:
+        return (self.tile_ids.shape[1], self.tile_ids.shape[0])
+
+
+def get_png_path(map_name: str, source_folder: str | None = None) -> str:
+    return (source_folder or config.SOURCE_FOLDER) + map_name + ".png"
+
+
+def get_cache_path(map_name: str, source_folder: str | None = None) -> str:
+    return (
+        (source_folder or config.SOURCE_FOLDER) + map_name + config.MAP_CACHE_EXTENSION
+    )
+
+
+def hash_file(path: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def compile_image(
+    map_name: str, image_data: np.ndarray, with_distance_fields: bool = True
+) -> CompiledMap:
+    """Classify a decoded map image into the arrays of a compiled map"""
+    return compile_tile_ids(
+        map_name, entities.get_tile_ids_by_colors(image_data), with_distance_fields
+    )
+
+
+def compile_tile_ids(
+    map_name: str, image_tile_ids: np.ndarray, with_distance_fields: bool = True
+) -> CompiledMap:
+    """Compiled map of tile ids given in image order (top row first)"""
+    height = image_tile_ids.shape[0]
+
+    spawn_positions = {}
+    for tile_name in SPAWN_TILE_NAMES:
+        # image order: top row first, left to right
+        rows, xs = np.nonzero(image_tile_ids == entities.TILE_IDS[tile_name])
+        spawn_positions[tile_name] = list(
+            zip(xs.tolist(), (height - 1 - rows).tolist())
+        )
+
+    tile_ids = np.ascontiguousarray(image_tile_ids[::-1])
+    passable = entities.TILE_PASSABLE[tile_ids].astype(np.uint8)
+
+    distance_fields = {}
+    if with_distance_fields and tile_ids.size <= config.MAP_CACHE_DISTANCE_FIELD_CELLS:
+        for positions in spawn_positions.values():
+            for position in positions:
+                distance_fields[position] = grid_pathfinder.compute_distance_field(
+                    passable, [position]
+                )
+
+    return CompiledMap(map_name, tile_ids, passable, spawn_positions, distance_fields)
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _sections(width: int, height: int, counts: tuple[int, int, int, int]):
+    """Byte offsets of the data sections following the header"""
+    cells = width * height
+    spawn_count = sum(counts[:3])
+    distance_field_count = counts[3]
+
+    offset = _aligned(HEADER.size)
+    tile_ids_offset = offset
+    offset = _aligned(offset + cells)
+    passable_offset = offset
+    offset = _aligned(offset + cells)
+    spawns_offset = offset
+    offset = _aligned(offset + spawn_count * 2 * 4)
+    targets_offset = offset
+    offset = _aligned(offset + distance_field_count * 2 * 4)
+    distance_fields_offset = offset
+    offset += distance_field_count * cells * 4
+    return (
+        tile_ids_offset,
+        passable_offset,
+        spawns_offset,
+        targets_offset,
+        distance_fields_offset,
+        offset,
+    )
+
+
+def write_compiled_map(
+    path: str, compiled: CompiledMap, png_mtime_ns: int, png_hash: bytes
+) -> None:
+    """Write a compiled map, replacing any existing file atomically"""
+    width, height = compiled.dimensions
+    spawns = [compiled.spawn_positions[name] for name in SPAWN_TILE_NAMES]
+    targets = list(compiled.distance_fields)
+    counts = (len(spawns[0]), len(spawns[1]), len(spawns[2]), len(targets))
+    sections = _sections(width, height, counts)
+
+    data = bytearray(sections[-1])
+    HEADER.pack_into(
+        data, 0, MAGIC, VERSION, width, height, png_mtime_ns, png_hash, *counts
+    )
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    cells = width * height
+    buffer[sections[0] : sections[0] + cells] = compiled.tile_ids.ravel()
+    buffer[sections[1] : sections[1] + cells] = compiled.passable.ravel()
+
+    spawn_array = np.array(
+        [position for positions in spawns for position in positions], dtype=np.int32
+    ).reshape(-1, 2)
+    buffer[sections[2] : sections[2] + spawn_array.nbytes] = spawn_array.view(
+        np.uint8
+    ).ravel()
+    target_array = np.array(targets, dtype=np.int32).reshape(-1, 2)
+    buffer[sections[3] : sections[3] + target_array.nbytes] = target_array.view(
+        np.uint8
+    ).ravel()
+    for index, target in enumerate(targets):
+        start = sections[4] + index * cells * 4
+        distances = np.ascontiguousarray(compiled.distance_fields[target], np.int32)
+        buffer[start : start + cells * 4] = distances.view(np.uint8).ravel()
+
+    import tempfile  # only needed when a cache is written
+
+    directory = os.path.dirname(path) or "."
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as file:
+            file.write(data)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def read_header(path: str) -> tuple | None:
+    """Header fields of a compiled map, None if the file is unusable"""
+    try:
+        with open(path, "rb") as file:
+            header = file.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+    fields = HEADER.unpack(header)
+    if fields[0] != MAGIC or fields[1] != VERSION:
+        return None
+    return fields
+
+
+def read_compiled_map(map_name: str, path: str) -> CompiledMap:
+    """Memory-map a compiled map file, all arrays are read-only views"""
+    header = read_header(path)
+    if header is None:
+        raise ValueError(f"'{path}' is not a compiled map of version {VERSION}.")
+    _, _, width, height, _, _, *counts = header
+    sections = _sections(width, height, tuple(counts))
+    cells = width * height
+
+    if os.path.getsize(path) < sections[-1]:
+        raise ValueError(f"'{path}' is truncated.")
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    tile_ids = data[sections[0] : sections[0] + cells].reshape(height, width)
+    passable = data[sections[1] : sections[1] + cells].reshape(height, width)
+
+    spawn_count = sum(counts[:3])
+    spawn_array = data[sections[2] : sections[2] + spawn_count * 8].view(np.int32)
+    spawn_list = [tuple(position) for position in spawn_array.reshape(-1, 2).tolist()]
+    spawn_positions = {}
+    start = 0
+    for tile_name, count in zip(SPAWN_TILE_NAMES, counts[:3]):
+        spawn_positions[tile_name] = spawn_list[start : start + count]
+        start += count
+
+    target_array = data[sections[3] : sections[3] + counts[3] * 8].view(np.int32)
+    distance_fields = {}
+    for index, target in enumerate(target_array.reshape(-1, 2).tolist()):
+        start = sections[4] + index * cells * 4
+        distance_fields[tuple(target)] = (
+            data[start : start + cells * 4].view(np.int32).reshape(height, width)
+        )
+
+    return CompiledMap(map_name, tile_ids, passable, spawn_positions, distance_fields)
+
+
+def load_compiled_map(map_name: str, source_folder: str | None = None) -> CompiledMap:
+    """Open the compiled map next to the PNG, rebuilding it if the PNG changed"""
+    png_path = get_png_path(map_name, source_folder)
+    cache_path = get_cache_path(map_name, source_folder)
+    header = read_header(cache_path)
+    cached = None
+    if header is not None:
+        try:
+            cached = read_compiled_map(map_name, cache_path)
+        except ValueError:
+            pass  # truncated, compiled again from the PNG
+
+    try:
+        png_mtime_ns = os.stat(png_path).st_mtime_ns
+    except FileNotFoundError:
+        # a compiled map can be shipped without its source image
+        if cached is not None:
+            return cached
+        raise FileNotFoundError(
+            f"Map image for '{map_name}' not found in "
+            f"{source_folder or config.SOURCE_FOLDER}."
+        )
+
+    if cached is not None and header[4] == png_mtime_ns:  # type: ignore
+        return cached
+
+    png_hash = hash_file(png_path)
+    if cached is not None and header[5] == png_hash:  # type: ignore
+        # only touched, remember the new mtime so the hash is not needed next
+        # time. Rewritten as a new file, others may have the old one mapped.
+        compiled = cached
+        try:
+            write_compiled_map(cache_path, compiled, png_mtime_ns, png_hash)
+        except OSError:
+            return compiled  # read-only map folder, hashed again next time
+        return read_compiled_map(map_name, cache_path)
+
+    from PIL import Image
+
+    image_data = np.array(Image.open(png_path))
+    compiled = compile_image(map_name, image_data)
+    try:
+        write_compiled_map(cache_path, compiled, png_mtime_ns, png_hash)
+    except OSError:
+        return compiled  # read-only map folder, use the arrays in memory
+    return read_compiled_map(map_name, cache_path)
@@ -0,0 +1,276 @@
+import argparse
+import numpy as np
+import game_objects.entities as entities
+import grid_pathfinder
+
+LAYOUTS = ("open", "maze", "rooms")
+# wall density per layout when none is given, see generate_map()
+DEFAULT_WALL_DENSITY = {"open": 0.2, "maze": 1.0, "rooms": 0.1}
+ROOM_SIZE = 8  # distance between room walls
+
+WALL = entities.TILE_IDS["WALL"]
+FLOOR = entities.TILE_IDS["FLOOR"]
+RED_SPAWN = entities.TILE_IDS["RED_SPAWN"]
+BLUE_SPAWN = entities.TILE_IDS["BLUE_SPAWN"]
+ORB_SPAWN = entities.TILE_IDS["ORB_SPAWN"]
+
+# import color per tile id, UNKNOWN is never generated
+TILE_COLORS = np.array(
+    [tile.import_color or (0, 0, 0) for tile in entities.TILES], dtype=np.uint8
+)
+
+
+def generate_open(
+    width: int, height: int, wall_density: float, rng: np.random.Generator
+) -> np.ndarray:
+    """Floor with walls scattered at random"""
+    return np.where(rng.random((height, width)) < wall_density, WALL, FLOOR).astype(
+        np.uint8
+    )
+
+
+def generate_maze(
+    width: int, height: int, wall_density: float, rng: np.random.Generator
+) -> np.ndarray:
+    """Binary tree maze on the odd cells, lower densities knock out walls"""
+    tiles = np.full((height, width), WALL, dtype=np.uint8)
+    cells_y = slice(1, 2 * ((height - 1) // 2), 2)
+    cells_x = slice(1, 2 * ((width - 1) // 2), 2)
+    tiles[cells_y, cells_x] = FLOOR
+
+    # every cell opens to the north or to the east, which connects all of them
+    ys, xs = np.mgrid[cells_y, cells_x]
+    east = rng.random(ys.shape) < 0.5
+    east[0, :] = True
+    east[:, -1] = False
+    north = ~east
+    north[0, :] = False
+    tiles[ys[east], xs[east] + 1] = FLOOR
+    tiles[ys[north] - 1, xs[north]] = FLOOR
+
+    # walls between two cells, removing some of them adds loops
+    between = np.zeros((height, width), dtype=bool)
+    between[cells_y, 2 : cells_x.stop - 1 : 2] = True
+    between[2 : cells_y.stop - 1 : 2, cells_x] = True
+    knocked_out = between & (rng.random((height, width)) >= wall_density)
+    tiles[knocked_out] = FLOOR
+    return tiles
+
+
+def generate_rooms(
+    width: int, height: int, wall_density: float, rng: np.random.Generator
+) -> np.ndarray:
+    """Grid of rooms joined by doors, pillars inside the rooms"""
+    tiles = np.full((height, width), FLOOR, dtype=np.uint8)
+    tiles[::ROOM_SIZE, :] = WALL
+    tiles[:, ::ROOM_SIZE] = WALL
+
+    # pillars on even coordinates never cut a room apart
+    ys, xs = np.mgrid[0:height, 0:width]
+    pillars = (
+        (ys % 2 == 0) & (xs % 2 == 0) & (rng.random((height, width)) < wall_density)
+    )
+    tiles[pillars] = WALL
+
+    # a door to the north or east room of every room, like the maze cells,
+    # the cells next to a door are never pillars
+    rooms_y = (height - 3) // ROOM_SIZE + 1
+    rooms_x = (width - 3) // ROOM_SIZE + 1
+    room_ys, room_xs = np.mgrid[0:rooms_y, 0:rooms_x] * ROOM_SIZE
+    east = rng.random(room_ys.shape) < 0.5
+    east[0, :] = True
+    east[:, -1] = False
+    north = ~east
+    north[0, :] = False
+    inner_height = np.minimum(ROOM_SIZE, height - 1 - room_ys) - 1
+    inner_width = np.minimum(ROOM_SIZE, width - 1 - room_xs) - 1
+    door_ys = room_ys + 1 + (rng.random(room_ys.shape) * inner_height).astype(int)
+    door_xs = room_xs + 1 + (rng.random(room_xs.shape) * inner_width).astype(int)
+    tiles[door_ys[east], room_xs[east] + ROOM_SIZE] = FLOOR
+    tiles[room_ys[north], door_xs[north]] = FLOOR
+    return tiles
+
+
+LAYOUT_GENERATORS = {
+    "open": generate_open,
+    "maze": generate_maze,
+    "rooms": generate_rooms,
+}
+
+
+def carve_path(tiles: np.ndarray, start: tuple[int, int], end: tuple[int, int]):
+    """Floor along the row of start, then along the column of end ([row, col])"""
+    (row, col), (end_row, end_col) = start, end
+    passable = entities.TILE_PASSABLE[tiles]
+    cols = slice(min(col, end_col), max(col, end_col) + 1)
+    rows = slice(min(row, end_row), max(row, end_row) + 1)
+    tiles[row, cols] = np.where(passable[row, cols], tiles[row, cols], FLOOR)
+    tiles[rows, end_col] = np.where(
+        passable[rows, end_col], tiles[rows, end_col], FLOOR
+    )
+
+
+def generate_map(
+    width: int,
+    height: int,
+    layout: str = "open",
+    wall_density: float | None = None,
+    spawn_size: int = 3,
+    orb_spawns: int = 1,
+    symmetric: bool = True,
+    seed: int = 0,
+) -> np.ndarray:
+    """Tile ids of a random map in image order (top row first).
+
+    wall_density is the chance of a wall on a cell for "open", the share of
+    maze walls left standing for "maze" (1.0 is a perfect maze) and the chance
+    of a pillar for "rooms". RED_SPAWN is a spawn_size square in the bottom
+    left corner and BLUE_SPAWN its mirror image in the top right, a symmetric
+    map looks the same from both sides. Only odd sizes have a middle cell to
+    turn a symmetric map around, even sizes get a second wall row at the
+    bottom or column at the right. The first ORB_SPAWN is the cell nearest
+    the middle that both spawns reach in the same number of steps, that is the
+    middle cell itself on a symmetric map. Every passable cell can be reached
+    from every other one."""
+    if layout not in LAYOUT_GENERATORS:
+        raise ValueError(f"Unknown layout '{layout}', choose from {LAYOUTS}.")
+    if min(width, height) < 2 * spawn_size + 3:
+        raise ValueError(f"A map with spawn size {spawn_size} is too small.")
+    rng = np.random.default_rng(seed)
+    if wall_density is None:
+        wall_density = DEFAULT_WALL_DENSITY[layout]
+    if symmetric and (width % 2 == 0 or height % 2 == 0):
+        tiles = generate_map(
+            width - 1 + width % 2,
+            height - 1 + height % 2,
+            layout,
+            wall_density,
+            spawn_size,
+            orb_spawns,
+            symmetric,
+            seed,
+        )
+        return np.pad(
+            tiles, ((0, 1 - height % 2), (0, 1 - width % 2)), constant_values=WALL
+        )
+
+    tiles = LAYOUT_GENERATORS[layout](width, height, wall_density, rng)
+    if symmetric:
+        # the bottom half is the top half turned by 180 degrees
+        half = height // 2
+        tiles[height - half :] = tiles[:half][::-1, ::-1]
+        if height % 2:
+            row = tiles[half]
+            row[width - width // 2 :] = row[: width // 2][::-1]
+
+    def mirrored(cell: tuple[int, int]) -> tuple[int, int]:
+        return (height - 1 - cell[0], width - 1 - cell[1])
+
+    # spawns, each with a path to the middle
+    red_rows = slice(height - 1 - spawn_size, height - 1)
+    blue_rows = slice(1, 1 + spawn_size)
+    middle = (height // 2, width // 2)
+    tiles[red_rows, 1 : 1 + spawn_size] = RED_SPAWN
+    tiles[blue_rows, width - 1 - spawn_size : width - 1] = BLUE_SPAWN
+    red_start = (height - 1 - spawn_size, spawn_size)
+    carve_path(tiles, red_start, middle)
+    carve_path(tiles, mirrored(red_start), mirrored(middle))
+    carve_path(tiles, middle, mirrored(middle))
+
+    tiles[[0, -1], :] = WALL
+    tiles[:, [0, -1]] = WALL
+
+    # wall up everything that cannot be reached from the red spawn
+    passable = entities.TILE_PASSABLE[tiles].astype(np.uint8)
+    distances = grid_pathfinder.compute_distance_field(
+        passable, [(1, height - 2)]  # (x, y) of the matrix as given
+    )
+    tiles[(distances < 0) & (passable == 1)] = WALL
+
+    tiles[find_fair_cell(tiles)] = ORB_SPAWN
+    add_orb_spawns(tiles, orb_spawns - 1, symmetric, rng)
+    return tiles
+
+
+def find_fair_cell(tiles: np.ndarray) -> tuple[int, int]:
+    """[row, col] of the passable cell nearest the middle whose distances from
+    the red and the blue spawn differ the least"""
+    height, width = tiles.shape
+    passable = entities.TILE_PASSABLE[tiles].astype(np.uint8)
+    distances = []
+    for spawn in (RED_SPAWN, BLUE_SPAWN):
+        rows, cols = np.nonzero(tiles == spawn)
+        distances.append(
+            grid_pathfinder.compute_distance_field(
+                passable, list(zip(cols.tolist(), rows.tolist()))
+            )
+        )
+    red, blue = distances
+    reachable = (red >= 0) & (blue >= 0)
+    unfairness = np.where(reachable, np.abs(red - blue), height * width)
+    rows, cols = np.mgrid[0:height, 0:width]
+    off_middle = (2 * rows - height + 1) ** 2 + (2 * cols - width + 1) ** 2
+    # lowest unfairness first, then nearest the middle, then image order
+    cell = np.lexsort((off_middle.ravel(), unfairness.ravel()))[0]
+    row, col = divmod(int(cell), width)
+    return (row, col)
+
+
+def add_orb_spawns(
+    tiles: np.ndarray, count: int, symmetric: bool, rng: np.random.Generator
+):
+    """Turn random floor cells into ORB_SPAWN, in mirrored pairs if symmetric"""
+    height, width = tiles.shape
+    while count > 0:
+        rows, cols = np.nonzero(tiles == FLOOR)
+        if len(rows) == 0:
+            return
+        choice = rng.integers(len(rows))
+        row, col = rows[choice], cols[choice]
+        tiles[row, col] = ORB_SPAWN
+        count -= 1
+        mirrored = (height - 1 - row, width - 1 - col)
+        if symmetric and count > 0 and tiles[mirrored] == FLOOR:
+            tiles[mirrored] = ORB_SPAWN
+            count -= 1
+
+
+def to_image(tiles: np.ndarray) -> np.ndarray:
+    """RGB image of tile ids, in the colors maps are read with"""
+    return TILE_COLORS[tiles]
+
+
+def save_map(tiles: np.ndarray, path: str):
+    from PIL import Image
+
+    Image.fromarray(to_image(tiles)).save(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a random ORB map")
+    parser.add_argument("output", help="PNG file to write")
+    parser.add_argument("--width", type=int, default=64)
+    parser.add_argument("--height", type=int, default=64)
+    parser.add_argument("--layout", choices=LAYOUTS, default="open")
+    parser.add_argument("--wall-density", type=float, default=None)
+    parser.add_argument("--spawn-size", type=int, default=3)
+    parser.add_argument("--orb-spawns", type=int, default=1)
+    parser.add_argument(
+        "--asymmetric", action="store_true", help="do not mirror the map"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    save_map(
+        generate_map(
+            args.width,
+            args.height,
+            args.layout,
+            args.wall_density,
+            args.spawn_size,
+            args.orb_spawns,
+            not args.asymmetric,
+            args.seed,
+        ),
+        args.output,
+    )
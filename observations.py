@@ -0,0 +1,81 @@
+from __future__ import annotations
+import weakref
+from typing import TYPE_CHECKING
+import numpy as np
+import game_objects.entities as entities
+from arena_state import TEAMS
+
+if TYPE_CHECKING:
+    from arena import Arena
+
+CHANNELS = ("walls", "teammates", "opponents", "orb", "own_spawn")
+WALLS, TEAMMATES, OPPONENTS, ORB, OWN_SPAWN = range(len(CHANNELS))
+SPAWN_TILE_NAMES = {"RED": "RED_SPAWN", "BLUE": "BLUE_SPAWN"}
+
+
+class Observations:
+    """What each team sees of an arena, as one grid per entry of CHANNELS.
+
+    The grids live in one preallocated uint8 buffer of shape (teams, channels,
+    height, width) in map coordinates [y, x], 1 where the channel applies.
+    update() only rewrites the cells players and the orb left or entered,
+    callers get read-only views that stay valid across updates."""
+
+    def __init__(self, arena: Arena):
+        tile_ids = arena.tile_ids
+        if tile_ids is None:
+            raise ValueError("The arena has no map loaded.")
+        height, width = tile_ids.shape
+        self.buffer = np.zeros((len(TEAMS), len(CHANNELS), height, width), np.uint8)
+        self.buffer[:, WALLS] = ~entities.TILE_PASSABLE[tile_ids]
+        for team_index, team in enumerate(TEAMS):
+            spawn_id = entities.TILE_IDS[SPAWN_TILE_NAMES[team]]
+            self.buffer[team_index, OWN_SPAWN] = tile_ids == spawn_id
+
+        self.views = self.buffer.view()
+        self.views.flags.writeable = False
+        # cells marked by the last update, cleared by the next one
+        self.player_cells = (np.zeros(0, np.intp), np.zeros(0, np.intp))
+        self.orb_cell: tuple[int, int] | None = None
+        self.update(arena)
+
+    def update(self, arena: Arena) -> np.ndarray:
+        """Show the current state of the arena, returns the views"""
+        state = arena.state
+        buffer = self.buffer
+        y, x = self.player_cells
+        buffer[:, TEAMMATES : OPPONENTS + 1, y, x] = 0
+        if self.orb_cell is not None:
+            buffer[:, ORB, self.orb_cell[0], self.orb_cell[1]] = 0
+
+        on_map = state.player_positions[:, 0] >= 0
+        x, y = state.player_positions[on_map].T
+        teams = state.player_teams[on_map]
+        buffer[teams, TEAMMATES, y, x] = 1
+        buffer[1 - teams, OPPONENTS, y, x] = 1
+        self.player_cells = (y, x)
+
+        orb_x, orb_y = state.orb_position.tolist()
+        self.orb_cell = None
+        if arena.meta_orb is not None and orb_x >= 0:
+            buffer[:, ORB, orb_y, orb_x] = 1
+            self.orb_cell = (orb_y, orb_x)
+        return self.views
+
+    def for_team(self, team: str) -> np.ndarray:
+        """Read-only (channels, height, width) view of one team's grids"""
+        return self.views[TEAMS.index(team)]
+
+
+# one buffer per arena, for strategies that only get to see the arena
+_observations: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def get_observations(arena: Arena) -> Observations:
+    """Observations of an arena, brought up to date"""
+    observations = _observations.get(arena)
+    if observations is None:
+        observations = _observations[arena] = Observations(arena)
+    else:
+        observations.update(arena)
+    return observations
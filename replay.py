@@ -0,0 +1,399 @@
+from __future__ import annotations
+import struct
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, BinaryIO
+import numpy as np
+import config
+from arena_state import NO_PLAYER, TEAMS
+from game import Game
+from game_objects.player import Player
+
+if TYPE_CHECKING:
+    from game import TickChanges
+
+MAGIC = b"ORBRPLY\0"
+INDEX_MAGIC = b"ORBINDX\0"
+VERSION = 2
+
+# magic, version, keyframe interval, number of players
+HEADER = struct.Struct("<8sHHH")
+# block tags
+TICK_BLOCK = b"T"
+KEYFRAME_BLOCK = b"K"
+INDEX_BLOCK = b"X"
+# tick, number of records
+TICK_HEADER = struct.Struct("<II")
+# player index (or team for scores), action code, x, y
+RECORD = struct.Struct("<HHii")
+# tick, score red, score blue, orb x, orb y, orb carrier
+KEYFRAME_HEADER = struct.Struct("<IiiiiH")
+# x, y per player in keyframes
+POSITION_DTYPE = "<i4"
+# tick, file offset of the keyframe block
+INDEX_ENTRY = struct.Struct("<IQ")
+# file offset of the index block, index magic
+TRAILER = struct.Struct("<Q8s")
+
+NO_INDEX = 0xFFFF  # player index of records that belong to no player
+
+ACTION_MOVE = 1  # player moved to (x, y), (-1, -1) if taken off the map
+ACTION_CARRY = 2  # player picked up the orb at (x, y), NO_INDEX if dropped
+ACTION_ORB = 3  # orb moved to (x, y) on its own
+ACTION_SCORE = 4  # team (index into TEAMS) now has score x
+
+
+def _pack_string(text: str) -> bytes:
+    data = text.encode("utf-8")
+    return struct.pack("<H", len(data)) + data
+
+
+def _unpack_string(data: bytes, offset: int) -> tuple[str, int]:
+    (length,) = struct.unpack_from("<H", data, offset)
+    offset += 2
+    return data[offset : offset + length].decode("utf-8"), offset + length
+
+
+@dataclass
+class ReplayFrame:
+    """State of a recorded match after a tick"""
+
+    tick: int
+    player_positions: np.ndarray  # (players, 2) of x, y, -1 while off the map
+    orb_position: tuple[int, int] | None
+    orb_carrier: int
+    score_red: int
+    score_blue: int
+
+    def copy(self) -> ReplayFrame:
+        return ReplayFrame(
+            self.tick,
+            self.player_positions.copy(),
+            self.orb_position,
+            self.orb_carrier,
+            self.score_red,
+            self.score_blue,
+        )
+
+
+class ReplayWriter:
+    """Records a game tick by tick as state deltas with periodic keyframes"""
+
+    def __init__(self, path: str, game: Game, keyframe_interval: int | None = None):
+        self.players = list(game.map.players)
+        if len(self.players) >= NO_INDEX:
+            raise ValueError(
+                f"Replays hold at most {NO_INDEX - 1} players, "
+                f"the game has {len(self.players)}."
+            )
+        self.file: BinaryIO = open(path, "wb", buffering=1 << 16)
+        self.keyframe_interval = keyframe_interval or config.REPLAY_KEYFRAME_INTERVAL
+        self.index: list[tuple[int, int]] = []
+
+        self.file.write(
+            HEADER.pack(MAGIC, VERSION, self.keyframe_interval, len(self.players))
+        )
+        self.file.write(_pack_string(game.map.name))
+        for player in self.players:
+            self.file.write(bytes([TEAMS.index(player.team)]))
+            self.file.write(_pack_string(player.name))
+
+        self.last_scores = (game.score_red, game.score_blue)
+        self.last_orb_position = game.map.get_meta_orb_position()
+        self.last_orb_carrier = game.map.state.orb_carrier
+        self.write_keyframe(game)
+
+    def write_keyframe(self, game: Game):
+        state = game.map.state
+        orb_x, orb_y = state.orb_position.tolist()
+        carrier = state.orb_carrier if state.orb_carrier != NO_PLAYER else NO_INDEX
+        self.index.append((game.tick, self.file.tell()))
+        self.file.write(KEYFRAME_BLOCK)
+        self.file.write(
+            KEYFRAME_HEADER.pack(
+                game.tick, game.score_red, game.score_blue, orb_x, orb_y, carrier
+            )
+        )
+        positions = state.player_positions[: len(self.players)]
+        self.file.write(positions.astype(POSITION_DTYPE).tobytes())
+
+    def record_tick(self, game: Game, changes: TickChanges):
+        """Write the deltas of the tick that was just processed"""
+        state = game.map.state
+        records = []
+        for player in changes.moved_players:
+            index = game.map.player_indexes[player]
+            x, y = state.player_positions[index].tolist()
+            records.append(RECORD.pack(index, ACTION_MOVE, x, y))
+
+        orb_position = game.map.get_meta_orb_position()
+        orb_x, orb_y = orb_position if orb_position is not None else (-1, -1)
+        if state.orb_carrier != self.last_orb_carrier:
+            carrier = state.orb_carrier if state.orb_carrier != NO_PLAYER else NO_INDEX
+            records.append(RECORD.pack(carrier, ACTION_CARRY, orb_x, orb_y))
+        elif orb_position != self.last_orb_position and state.orb_carrier == NO_PLAYER:
+            records.append(RECORD.pack(NO_INDEX, ACTION_ORB, orb_x, orb_y))
+        self.last_orb_carrier = state.orb_carrier
+        self.last_orb_position = orb_position
+
+        scores = (game.score_red, game.score_blue)
+        for team, (score, last_score) in enumerate(zip(scores, self.last_scores)):
+            if score != last_score:
+                records.append(RECORD.pack(team, ACTION_SCORE, score, 0))
+        self.last_scores = scores
+
+        self.file.write(TICK_BLOCK)
+        self.file.write(TICK_HEADER.pack(game.tick, len(records)))
+        self.file.write(b"".join(records))
+
+        if game.tick % self.keyframe_interval == 0:
+            self.write_keyframe(game)
+
+    def close(self):
+        if self.file.closed:
+            return
+        index_offset = self.file.tell()
+        self.file.write(INDEX_BLOCK)
+        self.file.write(struct.pack("<I", len(self.index)))
+        for tick, offset in self.index:
+            self.file.write(INDEX_ENTRY.pack(tick, offset))
+        self.file.write(TRAILER.pack(index_offset, INDEX_MAGIC))
+        self.file.close()
+
+
+class ReplayReader:
+    """Random access to a recorded match through its keyframe index"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self.data = file.read()
+
+        magic, version, self.keyframe_interval, player_count = HEADER.unpack_from(
+            self.data, 0
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{path}' is not a replay of version {VERSION}.")
+        offset = HEADER.size
+        self.map_name, offset = _unpack_string(self.data, offset)
+        self.players: list[tuple[str, str]] = []  # (name, team)
+        for _ in range(player_count):
+            team = TEAMS[self.data[offset]]
+            name, offset = _unpack_string(self.data, offset + 1)
+            self.players.append((name, team))
+        self.blocks_offset = offset
+
+        self.keyframe_ticks: list[int] = []
+        self.keyframe_offsets: list[int] = []
+        self.end_offset = len(self.data)
+        self.read_index()
+        self.first_tick = self.keyframe_ticks[0]
+        self.last_tick = self.scan_last_tick()
+
+    def read_index(self):
+        """Load the index from the end of the file, or rebuild it by scanning
+        a replay whose recording was not closed"""
+        if len(self.data) >= TRAILER.size:
+            index_offset, magic = TRAILER.unpack_from(
+                self.data, len(self.data) - TRAILER.size
+            )
+            if magic == INDEX_MAGIC:
+                (count,) = struct.unpack_from("<I", self.data, index_offset + 1)
+                for i in range(count):
+                    tick, offset = INDEX_ENTRY.unpack_from(
+                        self.data, index_offset + 5 + i * INDEX_ENTRY.size
+                    )
+                    self.keyframe_ticks.append(tick)
+                    self.keyframe_offsets.append(offset)
+                self.end_offset = index_offset
+                return
+
+        offset = self.blocks_offset
+        for tag, tick, block_offset, offset in self.iter_blocks(offset):
+            if tag == KEYFRAME_BLOCK:
+                self.keyframe_ticks.append(tick)
+                self.keyframe_offsets.append(block_offset)
+
+    def iter_blocks(self, offset: int):
+        """Yield (tag, tick, block offset, offset after the block)"""
+        keyframe_size = KEYFRAME_HEADER.size + len(self.players) * 2 * 4
+        while offset < self.end_offset:
+            tag = self.data[offset : offset + 1]
+            if tag == TICK_BLOCK:
+                if offset + 1 + TICK_HEADER.size > self.end_offset:
+                    return  # cut off recording
+                tick, count = TICK_HEADER.unpack_from(self.data, offset + 1)
+                end = offset + 1 + TICK_HEADER.size + count * RECORD.size
+            elif tag == KEYFRAME_BLOCK:
+                if offset + 1 + keyframe_size > self.end_offset:
+                    return
+                (tick,) = struct.unpack_from("<I", self.data, offset + 1)
+                end = offset + 1 + keyframe_size
+            else:
+                return
+            if end > self.end_offset:
+                return
+            yield tag, tick, offset, end
+            offset = end
+
+    def scan_last_tick(self) -> int:
+        last_tick = self.keyframe_ticks[-1]
+        for _, tick, _, _ in self.iter_blocks(self.keyframe_offsets[-1]):
+            last_tick = tick
+        return last_tick
+
+    def read_keyframe(self, offset: int) -> ReplayFrame:
+        tick, score_red, score_blue, orb_x, orb_y, carrier = (
+            KEYFRAME_HEADER.unpack_from(self.data, offset + 1)
+        )
+        start = offset + 1 + KEYFRAME_HEADER.size
+        positions = np.frombuffer(
+            self.data, dtype=POSITION_DTYPE, count=len(self.players) * 2, offset=start
+        )
+        return ReplayFrame(
+            tick=tick,
+            player_positions=positions.reshape(-1, 2).astype(np.int32),
+            orb_position=(orb_x, orb_y) if orb_x >= 0 else None,
+            orb_carrier=carrier if carrier != NO_INDEX else NO_PLAYER,
+            score_red=score_red,
+            score_blue=score_blue,
+        )
+
+    def apply_tick(self, frame: ReplayFrame, offset: int) -> list[int]:
+        """Apply the TICK block at offset to frame, returns the players that moved"""
+        tick, count = TICK_HEADER.unpack_from(self.data, offset + 1)
+        frame.tick = tick
+        moved = []
+        start = offset + 1 + TICK_HEADER.size
+        for i in range(count):
+            index, action, x, y = RECORD.unpack_from(self.data, start + i * RECORD.size)
+            if action == ACTION_MOVE:
+                frame.player_positions[index] = (x, y)
+                moved.append(index)
+                if frame.orb_carrier == index:
+                    frame.orb_position = (x, y) if x >= 0 else None
+            elif action == ACTION_CARRY:
+                frame.orb_carrier = index if index != NO_INDEX else NO_PLAYER
+                frame.orb_position = (x, y) if x >= 0 else None
+            elif action == ACTION_ORB:
+                frame.orb_position = (x, y) if x >= 0 else None
+            elif action == ACTION_SCORE:
+                if index == 0:
+                    frame.score_red = x
+                else:
+                    frame.score_blue = x
+        return moved
+
+    def next_tick_block(self, offset: int) -> tuple[int, int] | None:
+        """Offset of the first TICK block from offset on and the offset after it"""
+        for tag, _, block_offset, end in self.iter_blocks(offset):
+            if tag == TICK_BLOCK:
+                return block_offset, end
+        return None
+
+    def frame_at(self, tick: int) -> ReplayFrame:
+        return self.read_frame(tick)[0]
+
+    def read_frame(self, tick: int) -> tuple[ReplayFrame, int]:
+        """State after the given tick: the closest keyframe at or before it,
+        plus at most one keyframe interval of deltas. Also returns the offset
+        the following ticks are read from."""
+        tick = max(self.first_tick, min(tick, self.last_tick))
+        # after the starting keyframe, one is written on every multiple of the
+        # interval, so its position in the index follows from the tick
+        interval = self.keyframe_interval
+        keyframe = tick // interval - self.first_tick // interval
+        keyframe = min(keyframe, len(self.keyframe_ticks) - 1)
+        while keyframe > 0 and self.keyframe_ticks[keyframe] > tick:
+            keyframe -= 1
+
+        offset = self.keyframe_offsets[keyframe]
+        frame = self.read_keyframe(offset)
+        for tag, block_tick, block_offset, end in self.iter_blocks(offset):
+            if block_tick > tick:
+                return frame, block_offset
+            if tag == TICK_BLOCK and block_tick > frame.tick:
+                self.apply_tick(frame, block_offset)
+            offset = end
+        return frame, offset
+
+
+class ReplayGame(Game):
+    """Plays a recorded match back through the normal Game interface,
+    so MapViewer can show it. process_tick() steps one tick forward."""
+
+    def __init__(self, path: str):
+        self.replay = ReplayReader(path)
+        players_red = []
+        players_blue = []
+        for name, team in self.replay.players:
+            player = Player(name, team)
+            (players_red if team == "RED" else players_blue).append(player)
+        super().__init__(self.replay.map_name, players_red, players_blue)
+
+        # register the players in the recorded order
+        self.recorded_players = []
+        players_by_team = {"RED": iter(players_red), "BLUE": iter(players_blue)}
+        for _, team in self.replay.players:
+            player = next(players_by_team[team])
+            self.map.get_player_index(player)
+            self.recorded_players.append(player)
+        self.spawn_meta_orb()
+        self.max_ticks = self.replay.last_tick
+        # the frame shown and where the tick after it starts in the replay
+        self.frame: ReplayFrame
+        self.cursor = 0
+        self.seek(self.replay.first_tick)
+
+    def seek(self, tick: int):
+        """Jump to the state after the given tick"""
+        self.frame, self.cursor = self.replay.read_frame(tick)
+        self.show_frame(self.frame)
+
+    def step(self):
+        """Show the next tick, applying only its deltas"""
+        block = self.replay.next_tick_block(self.cursor)
+        if block is None:
+            return
+        block_offset, self.cursor = block
+        moved = self.replay.apply_tick(self.frame, block_offset)
+        self.show_frame(self.frame, moved)
+
+    def show_frame(self, frame: ReplayFrame, moved: list[int] | None = None):
+        """Put the map into the state of frame, only moving the given players
+        (all if None)"""
+        positions = frame.player_positions
+        for index in range(len(positions)) if moved is None else moved:
+            x, y = positions[index].tolist()
+            player = self.recorded_players[index]
+            if x >= 0:
+                self.map.place_player(player, (x, y))
+            else:
+                self.map.remove_player(player)
+        self.map.state.orb_position[:] = frame.orb_position or (-1, -1)
+        carrier = frame.orb_carrier
+        self.map.set_meta_orb_carrier(
+            self.recorded_players[carrier] if carrier != NO_PLAYER else None
+        )
+        self.tick = frame.tick
+        self.score_red = frame.score_red
+        self.score_blue = frame.score_blue
+        self.running = frame.tick < self.replay.last_tick
+
+    def process_tick(self):
+        """Advance the replay by one tick"""
+        state = self.map.state
+        positions_before = state.player_positions.copy()
+        orb_position_before = self.map.get_meta_orb_position()
+        orb_carrier_before = state.orb_carrier
+        scores_before = (self.score_red, self.score_blue)
+        event_count = self.events.count
+
+        if self.tick < self.replay.last_tick:
+            self.step()
+        self.events.tick = self.tick
+        self.changes = self.collect_changes(
+            positions_before,
+            orb_position_before,
+            orb_carrier_before,
+            scores_before,
+            event_count,
+        )
@@ -0,0 +1,314 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+import numpy as np
+from arena_state import NO_PLAYER, PLAYER_STATS
+from events import DEBUG, INFO
+from game_objects.entities import TILE_PASSABLE
+
+if TYPE_CHECKING:
+    from arena import Arena
+    from game_objects.player import Player
+
+# results of resolve_moves, everything but MOVED leaves the player where it is
+MOVED = 0
+OUT_OF_BOUNDS = 1
+NOT_PASSABLE = 2
+CONTESTED = 3
+OCCUPIED = 4
+
+MOVES = PLAYER_STATS.index("moves")
+BLOCKED_MOVES = PLAYER_STATS.index("blocked_moves")
+PICK_UPS = PLAYER_STATS.index("pick_ups")
+
+
+def resolve_moves(
+    occupancy: np.ndarray,
+    tile_ids: np.ndarray,
+    positions: np.ndarray,
+    targets: np.ndarray,
+    moving: np.ndarray,
+    priorities: np.ndarray | None = None,
+) -> np.ndarray:
+    """Decide which of the requested moves happen, independent of player order.
+
+    positions and targets are (x, y) per player, moving marks the players that
+    want to move. Returns one of the result codes above per player:
+    a target that several players want goes to the one with the lowest
+    priority value, players cannot swap places, and a move into an occupied
+    cell only goes through if the player standing there moves away."""
+    height, width = occupancy.shape
+    player_count = len(positions)
+    results = np.full(player_count, MOVED, dtype=np.int8)
+
+    x, y = targets[:, 0], targets[:, 1]
+    inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    results[moving & ~inside] = OUT_OF_BOUNDS
+    x = np.clip(x, 0, width - 1)
+    y = np.clip(y, 0, height - 1)
+
+    passable = TILE_PASSABLE[tile_ids[y, x]]
+    results[moving & inside & ~passable] = NOT_PASSABLE
+    pending = moving & inside & passable
+
+    # several players want the same cell
+    if priorities is None:
+        priorities = np.arange(player_count)
+    contenders = pending.nonzero()[0]
+    cells = y[contenders] * width + x[contenders]
+    order = np.lexsort((priorities[contenders], cells))
+    ranked_cells = cells[order]
+    losing = np.zeros(len(order), dtype=bool)
+    losing[1:] = ranked_cells[1:] == ranked_cells[:-1]
+    contested = contenders[order[losing]]
+    results[contested] = CONTESTED
+    pending[contested] = False
+
+    # players standing on the targets at the start of the tick
+    occupants = occupancy[y, x].astype(np.intp)
+    occupied = pending & (occupants != NO_PLAYER)
+    occupied &= occupants != np.arange(player_count)
+    occupants[~occupied] = 0
+
+    # head-on swaps
+    swapping = occupied & pending[occupants]
+    swapping &= (targets[occupants] == positions).all(axis=1)
+    results[swapping] = OCCUPIED
+    pending &= ~swapping
+
+    # a blocked player blocks whoever wanted its cell, which can chain
+    while True:
+        blocked = occupied & pending & ~pending[occupants]
+        if not blocked.any():
+            break
+        results[blocked] = OCCUPIED
+        pending &= ~blocked
+    return results
+
+
+def resolve_actions(
+    arena: Arena, players: list[Player], actions: list[dict | None], tick: int = 0
+) -> None:
+    """Carry out the actions decided for one tick in a single pass.
+
+    All actions refer to the state before any of them is applied: moves are
+    resolved together by resolve_moves(), then players standing on the
+    uncarried orb may pick it up, and the orb follows its carrier.
+    Contested cells go to the players in turn, the first pick rotates with
+    the tick."""
+    if arena.tile_ids is None:
+        return
+
+    indexes = [arena.get_player_index(player) for player in players]
+    state = arena.state
+    positions = state.player_positions
+    on_map = positions[:, 0] >= 0
+    targets = positions.copy()
+    moving = np.zeros(len(positions), dtype=bool)
+    picking = np.zeros(len(positions), dtype=bool)
+    for index, action in zip(indexes, actions):
+        if not action:
+            continue
+        if "move" in action:
+            targets[index] = action["move"]
+            moving[index] = on_map[index]
+        if "pick_up" in action:
+            picking[index] = True
+
+    occupancy_before = state.occupancy.copy() if moving.any() else state.occupancy
+    priorities = (np.arange(len(positions)) - tick) % len(positions)
+    results = resolve_moves(
+        state.occupancy, arena.tile_ids, positions, targets, moving, priorities
+    )
+    moved = moving & (results == MOVED)
+    blocked = moving & ~moved
+
+    # apply the moves, cells are left before they are entered
+    moved_indexes = moved.nonzero()[0]
+    old_x, old_y = positions[moved_indexes].T
+    state.occupancy[old_y, old_x] = NO_PLAYER
+    new_x, new_y = targets[moved_indexes].T
+    state.occupancy[new_y, new_x] = moved_indexes
+    positions[moved_indexes] = targets[moved_indexes]
+    state.player_stats[moved, MOVES] += 1
+    state.player_stats[blocked, BLOCKED_MOVES] += 1
+
+    carrier = state.orb_carrier
+    if carrier != NO_PLAYER and moved[carrier]:
+        state.orb_position[:] = positions[carrier]
+
+    # pick ups, only one player can stand on the orb
+    picked_up = NO_PLAYER
+    if picking.any() and carrier == NO_PLAYER and arena.meta_orb is not None:
+        on_orb = picking & (positions == state.orb_position).all(axis=1)
+        on_orb &= positions[:, 0] >= 0
+        if on_orb.any():
+            picked_up = int(on_orb.nonzero()[0][0])
+            state.player_stats[picked_up, PICK_UPS] += 1
+            arena.set_meta_orb_carrier(arena.players[picked_up])
+
+    if arena.events.min_level <= INFO:
+        emit_action_events(
+            arena,
+            players,
+            indexes,
+            actions,
+            results,
+            targets,
+            occupancy_before,
+            picked_up,
+            carrier,
+        )
+
+
+def apply_action(arena: Arena, player: Player, action: dict | None) -> None:
+    """Carry out the action of a single player right away.
+
+    The same rules as resolve_actions() for one actor, without the arrays of
+    a whole tick: a move into a wall, off the map or into another player's
+    cell is blocked, then a player standing on the uncarried orb may pick it
+    up. Used to explore moves one player at a time, see Game.apply_action."""
+    if not action or arena.tile_ids is None:
+        return
+    state = arena.state
+    index = arena.get_player_index(player)
+    events = arena.events
+    x, y = state.player_positions[index].tolist()
+    on_map = x >= 0
+
+    if "move" in action and on_map:
+        target_x, target_y = action["move"]
+        height, width = state.occupancy.shape
+        occupant = NO_PLAYER
+        if not (0 <= target_x < width and 0 <= target_y < height):
+            result = OUT_OF_BOUNDS
+        elif not TILE_PASSABLE[arena.tile_ids[target_y, target_x]]:
+            result = NOT_PASSABLE
+        else:
+            occupant = int(state.occupancy[target_y, target_x])
+            result = OCCUPIED if occupant not in (NO_PLAYER, index) else MOVED
+
+        if result == MOVED:
+            state.occupancy[y, x] = NO_PLAYER
+            state.occupancy[target_y, target_x] = index
+            state.player_positions[index] = (target_x, target_y)
+            state.player_stats[index, MOVES] += 1
+            if state.orb_carrier == index:
+                state.orb_position[:] = (target_x, target_y)
+            x, y = target_x, target_y
+        else:
+            state.player_stats[index, BLOCKED_MOVES] += 1
+
+        if events.min_level <= DEBUG:
+            target = (target_x, target_y)
+            if result == MOVED:
+                events.emit("move", DEBUG, player.name, target)
+            elif result == OUT_OF_BOUNDS:
+                events.emit("blocked", DEBUG, player.name, target, "out of bounds")
+            elif result == NOT_PASSABLE:
+                events.emit("blocked", DEBUG, player.name, target, "not passable")
+            else:
+                events.emit(
+                    "blocked",
+                    DEBUG,
+                    player.name,
+                    target,
+                    f"occupied by another player {arena.players[occupant].name}",
+                )
+
+    if "pick_up" in action:
+        carrier = state.orb_carrier
+        orb_x, orb_y = state.orb_position.tolist()
+        if not on_map:
+            if events.min_level <= DEBUG:
+                events.emit(
+                    "pick_up_failed", DEBUG, player.name, detail="not on the map"
+                )
+        elif arena.meta_orb is None or (orb_x, orb_y) != (x, y):
+            if events.min_level <= DEBUG:
+                events.emit(
+                    "pick_up_failed",
+                    DEBUG,
+                    player.name,
+                    (x, y),
+                    "no orb on the field",
+                )
+        elif carrier == NO_PLAYER:
+            state.player_stats[index, PICK_UPS] += 1
+            arena.set_meta_orb_carrier(player)
+            if events.min_level <= INFO:
+                events.emit("pick_up", INFO, player.name, (x, y))
+        elif events.min_level <= DEBUG:
+            events.emit(
+                "pick_up_failed",
+                DEBUG,
+                player.name,
+                (x, y),
+                f"already carried by {arena.players[carrier].name}",
+            )
+
+
+def emit_action_events(
+    arena: Arena,
+    players: list[Player],
+    indexes: list[int],
+    actions: list[dict | None],
+    results: np.ndarray,
+    targets: np.ndarray,
+    occupancy_before: np.ndarray,
+    picked_up: int,
+    carrier: int,
+) -> None:
+    """Events of a resolved tick, in player order"""
+    events = arena.events
+    for player, index, action in zip(players, indexes, actions):
+        if not action:
+            continue
+        position = arena.get_position_of_player(player)
+
+        if "move" in action and position is not None:
+            x, y = targets[index].tolist()
+            result = results[index]
+            if result == MOVED:
+                events.emit("move", DEBUG, player.name, (x, y))
+            elif result == OUT_OF_BOUNDS:
+                events.emit("blocked", DEBUG, player.name, (x, y), "out of bounds")
+            elif result == NOT_PASSABLE:
+                events.emit("blocked", DEBUG, player.name, (x, y), "not passable")
+            elif result == CONTESTED:
+                events.emit(
+                    "blocked", DEBUG, player.name, (x, y), "contested by another player"
+                )
+            else:
+                occupant = arena.players[occupancy_before[y, x]]
+                events.emit(
+                    "blocked",
+                    DEBUG,
+                    player.name,
+                    (x, y),
+                    f"occupied by another player {occupant.name}",
+                )
+
+        if "pick_up" in action:
+            if position is None:
+                events.emit(
+                    "pick_up_failed", DEBUG, player.name, detail="not on the map"
+                )
+            elif index == picked_up:
+                events.emit("pick_up", INFO, player.name, position)
+            elif arena.get_meta_orb_position() != position or arena.meta_orb is None:
+                events.emit(
+                    "pick_up_failed",
+                    DEBUG,
+                    player.name,
+                    position,
+                    "no orb on the field",
+                )
+            else:
+                holder = arena.players[picked_up if carrier == NO_PLAYER else carrier]
+                events.emit(
+                    "pick_up_failed",
+                    DEBUG,
+                    player.name,
+                    position,
+                    f"already carried by {holder.name}",
+                )
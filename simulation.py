@@ -0,0 +1,124 @@
+from __future__ import annotations
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+import numpy as np
+import config
+
+if TYPE_CHECKING:
+    from game import Game
+    from game_objects.player import Player
+
+
+@dataclass(frozen=True)
+class Frame:
+    """State of the match after one tick, never changed after publishing"""
+
+    tick: int
+    # arena players in index order and their (x, y), read-only
+    players: tuple[Player, ...]
+    player_positions: np.ndarray
+    orb_position: tuple[int, int] | None
+    score_red: int
+    score_blue: int
+    # time.perf_counter() when the tick was done
+    time: float
+
+
+def capture_frame(game: Game) -> Frame:
+    arena = game.map
+    positions = arena.state.player_positions.copy()
+    positions.flags.writeable = False
+    return Frame(
+        tick=game.tick,
+        players=tuple(arena.players),
+        player_positions=positions,
+        orb_position=arena.get_meta_orb_position(),
+        score_red=game.score_red,
+        score_blue=game.score_blue,
+        time=time.perf_counter(),
+    )
+
+
+def interpolate_positions(
+    start: np.ndarray, end: np.ndarray, progress: float
+) -> np.ndarray:
+    """(x, y) rows on the way from start to end as floats. Only moves to a
+    neighbouring cell are interpolated, anything else jumps to end."""
+    positions = end.astype(float)
+    if start.shape != end.shape:
+        return positions
+    steps = (np.abs(end - start).sum(axis=1) == 1) & (start[:, 0] >= 0)
+    positions[steps] = start[steps] + (end[steps] - start[steps]) * progress
+    return positions
+
+
+class Simulation:
+    """Runs Game.process_tick on a background thread at a fixed rate.
+
+    Ticks are due every tick_delay seconds of accumulated time, no matter
+    how long drawing takes. After every tick the simulation publishes a new
+    Frame, `frames` always holds the last two so a viewer can interpolate
+    between them. When ticks take longer than tick_delay the simulation runs
+    up to max_catch_up of them back to back and skips the rest of the
+    backlog, so the match slows down instead of never catching up."""
+
+    def __init__(
+        self,
+        game: Game,
+        tick_delay: float = config.TICK_DELAY,
+        max_catch_up: int = config.SIMULATION_MAX_CATCH_UP,
+    ):
+        self.game = game
+        self.tick_delay = tick_delay
+        self.max_catch_up = max(max_catch_up, 1)
+        frame = capture_frame(game)
+        # (previous, current), replaced as a whole so readers never see a mix
+        self.frames: tuple[Frame, Frame] = (frame, frame)
+        self.skipped_ticks = 0
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self) -> "Simulation":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.stopping.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def run(self) -> None:
+        game = self.game
+        accumulator = 0.0
+        last_time = time.perf_counter()
+        while game.running and not self.stopping.is_set():
+            now = time.perf_counter()
+            accumulator += now - last_time
+            last_time = now
+
+            ticks = 0
+            while accumulator >= self.tick_delay and ticks < self.max_catch_up:
+                game.process_tick()
+                self.frames = (self.frames[1], capture_frame(game))
+                accumulator -= self.tick_delay
+                ticks += 1
+                if not game.running:
+                    return
+            if accumulator >= self.tick_delay:
+                # too far behind, drop the backlog instead of spiralling
+                skipped = int(accumulator // self.tick_delay)
+                self.skipped_ticks += skipped
+                accumulator -= skipped * self.tick_delay
+                game.profiler.count("skipped_ticks", skipped)
+
+            self.stopping.wait(self.tick_delay - accumulator)
+
+    def get_progress(self, frame: Frame | None = None) -> float:
+        """Share of a tick passed since frame (the current one if None) was
+        published, from 0 to 1"""
+        if frame is None:
+            frame = self.frames[1]
+        progress = (time.perf_counter() - frame.time) / self.tick_delay
+        return min(max(progress, 0.0), 1.0)
@@ -0,0 +1,120 @@
+import numpy as np
+
+
+class SpatialIndex:
+    """Players of one tick sorted into square buckets of the map.
+
+    Players are referred to by their arena index. The players of a bucket
+    are stored next to each other and the buckets of a bucket row follow
+    each other, so every row of a query box is a single slice. Players off
+    the map are left out."""
+
+    def __init__(
+        self,
+        positions: np.ndarray,
+        teams: np.ndarray,
+        width: int,
+        height: int,
+        bucket_size: int,
+    ):
+        self.bucket_size = bucket_size
+        self.columns = -(-width // bucket_size)
+        self.rows = -(-height // bucket_size)
+
+        present = (positions[:, 0] >= 0).nonzero()[0]
+        xs = positions[present, 0]
+        ys = positions[present, 1]
+        buckets = (ys // bucket_size) * self.columns + xs // bucket_size
+        order = np.argsort(buckets, kind="stable")
+        self.players = present[order]
+        self.xs = xs[order]
+        self.ys = ys[order]
+        self.teams = teams[self.players]
+        # players of bucket b are players[starts[b]:starts[b + 1]]
+        self.starts = np.zeros(self.columns * self.rows + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(buckets, minlength=self.columns * self.rows),
+            out=self.starts[1:],
+        )
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def get_box(self, x: int, y: int, reach: int) -> tuple[np.ndarray, bool]:
+        """Slots of the players in the buckets up to reach buckets away from
+        the bucket of (x, y), and whether that box covers the whole map"""
+        column, row = x // self.bucket_size, y // self.bucket_size
+        first_column = max(column - reach, 0)
+        last_column = min(column + reach, self.columns - 1)
+        first_row = max(row - reach, 0)
+        last_row = min(row + reach, self.rows - 1)
+        covers_map = (
+            first_column == 0
+            and first_row == 0
+            and last_column == self.columns - 1
+            and last_row == self.rows - 1
+        )
+        if covers_map:
+            return np.arange(len(self.players)), True
+        rows = np.arange(first_row, last_row + 1) * self.columns
+        lows = self.starts[rows + first_column]
+        highs = self.starts[rows + last_column + 1]
+        slots = [np.arange(low, high) for low, high in zip(lows, highs) if high > low]
+        if not slots:
+            return np.empty(0, dtype=np.int64), False
+        return np.concatenate(slots), False
+
+    def filter(
+        self, slots: np.ndarray, team: int | None, exclude: int | None
+    ) -> np.ndarray:
+        if team is not None:
+            slots = slots[self.teams[slots] == team]
+        if exclude is not None:
+            slots = slots[self.players[slots] != exclude]
+        return slots
+
+    def nearest(
+        self,
+        position: tuple[int, int],
+        count: int = 1,
+        team: int | None = None,
+        exclude: int | None = None,
+    ) -> list[tuple[int, int]]:
+        """Up to count (player index, Manhattan distance) pairs closest to
+        position, nearest first, ties by player index.
+
+        The box around position doubles until it holds count players that
+        are closer than anyone outside of it could be."""
+        if count <= 0:
+            return []
+        x, y = position
+        reach = 0
+        while True:
+            slots, covers_map = self.get_box(x, y, reach)
+            slots = self.filter(slots, team, exclude)
+            if len(slots) >= count or covers_map:
+                distances = np.abs(self.xs[slots] - x) + np.abs(self.ys[slots] - y)
+                players = self.players[slots]
+                order = np.lexsort((players, distances))[:count]
+                # anyone outside the box is at least reach * bucket_size + 1 away
+                if covers_map or distances[order[-1]] <= reach * self.bucket_size:
+                    return list(zip(players[order].tolist(), distances[order].tolist()))
+            reach = reach * 2 + 1
+
+    def within(
+        self,
+        position: tuple[int, int],
+        radius: int,
+        team: int | None = None,
+        exclude: int | None = None,
+    ) -> list[tuple[int, int]]:
+        """(player index, Manhattan distance) of everyone at most radius away,
+        nearest first, ties by player index"""
+        x, y = position
+        slots, _ = self.get_box(x, y, -(-radius // self.bucket_size))
+        slots = self.filter(slots, team, exclude)
+        distances = np.abs(self.xs[slots] - x) + np.abs(self.ys[slots] - y)
+        inside = distances <= radius
+        players, distances = self.players[slots][inside], distances[inside]
+        order = np.lexsort((players, distances))
+        return list(zip(players[order].tolist(), distances[order].tolist()))
@@ -0,0 +1,364 @@
+from __future__ import annotations
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+from collections import deque
+from typing import TYPE_CHECKING
+import config
+
+if TYPE_CHECKING:
+    from game import Game, TickChanges
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def encode(message: dict) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode()
+
+
+def websocket_frame(payload: bytes) -> bytes:
+    """Unmasked text frame, as a server sends them"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x81, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x81, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x81, 127, length)
+    return header + payload
+
+
+def map_message(game: Game) -> dict:
+    """What never changes during a match, sent once on connect"""
+    arena = game.map
+    return {
+        "type": "map",
+        "map": arena.name,
+        # tile ids [y][x] in map coordinates, see game_objects.entities.TILES
+        "tiles": arena.tile_ids.tolist() if arena.tile_ids is not None else [],
+        "players": [
+            {"name": player.name, "team": player.team} for player in arena.players
+        ],
+    }
+
+
+def snapshot_message(game: Game) -> dict:
+    """Full state of a match, players in the order of map_message()"""
+    state = game.map.state
+    orb_position = game.map.get_meta_orb_position()
+    return {
+        "type": "snapshot",
+        "tick": game.tick,
+        "positions": state.player_positions.tolist(),
+        "orb": list(orb_position) if orb_position is not None else None,
+        "carrier": state.orb_carrier,
+        "score": [game.score_red, game.score_blue],
+        "messages": game.game_messages[-config.MAX_MESSAGES :],
+    }
+
+
+def tick_message(game: Game, changes: TickChanges) -> dict:
+    """What a tick changed, only the keys of things that changed are set"""
+    arena = game.map
+    state = arena.state
+    message: dict = {"type": "tick", "tick": changes.tick}
+    if changes.moved_players:
+        message["moved"] = [
+            [index, *state.player_positions[index].tolist()]
+            for index in map(arena.get_player_index, changes.moved_players)
+        ]
+    if changes.orb_changed:
+        orb_position = arena.get_meta_orb_position()
+        message["orb"] = list(orb_position) if orb_position is not None else None
+        message["carrier"] = state.orb_carrier
+    if changes.score_changed:
+        message["score"] = [game.score_red, game.score_blue]
+    if changes.new_messages:
+        message["messages"] = changes.new_messages
+    return message
+
+
+def merge_tick_messages(messages: list[dict]) -> dict:
+    """One tick message with what all the given ones changed, in order"""
+    if len(messages) == 1:
+        return messages[0]
+    merged: dict = {"type": "tick", "tick": messages[-1]["tick"]}
+    moved: dict[int, list[int]] = {}
+    new_messages: list[str] = []
+    for message in messages:
+        for index, x, y in message.get("moved", ()):
+            moved[index] = [index, x, y]
+        if "orb" in message:
+            merged["orb"] = message["orb"]
+            merged["carrier"] = message["carrier"]
+        if "score" in message:
+            merged["score"] = message["score"]
+        new_messages += message.get("messages", ())
+    if moved:
+        merged["moved"] = list(moved.values())
+    if new_messages:
+        merged["messages"] = new_messages
+    return merged
+
+
+class Frame:
+    """One encoded message, the websocket frame is only built when needed"""
+
+    def __init__(self, message: dict):
+        self.line = encode(message) + b"\n"
+        self._websocket: bytes | None = None
+
+    @property
+    def websocket(self) -> bytes:
+        if self._websocket is None:
+            self._websocket = websocket_frame(self.line[:-1])
+        return self._websocket
+
+
+class Spectator:
+    """A connected client and the frames it has not been sent yet"""
+
+    def __init__(self, writer: asyncio.StreamWriter, websocket: bool):
+        self.writer = writer
+        self.websocket = websocket
+        self.frames: deque[Frame] = deque()
+        self.needs_snapshot = True
+        # set by broadcast() while the client waits for new frames
+        self.waiter: asyncio.Future | None = None
+        self.dropped = 0  # frames replaced by a snapshot
+        self.task: asyncio.Task | None = asyncio.current_task()
+
+    def data(self, frame: Frame) -> bytes:
+        return frame.websocket if self.websocket else frame.line
+
+
+class SpectatorServer:
+    """Broadcasts a match to TCP and WebSocket clients.
+
+    The server runs its own asyncio loop on a background thread. Clients
+    first get the map and a snapshot, then one newline-delimited JSON message
+    per tick over TCP, or one text frame per message over WebSocket. A client
+    that falls more than config.SPECTATOR_QUEUE_SIZE frames behind has its
+    queued frames dropped and gets a fresh snapshot instead, so slow clients
+    never hold up the game. publish() is all the game thread does per tick,
+    ticks published faster than the loop wakes up go out as one message."""
+
+    def __init__(
+        self,
+        game: Game,
+        host: str = config.SPECTATOR_HOST,
+        port: int | None = 0,
+        websocket_port: int | None = None,
+    ):
+        self.host = host
+        self.port = port
+        self.websocket_port = websocket_port
+        self.map_frame = Frame(map_message(game))
+        self.snapshot = snapshot_message(game)
+        self.snapshot_frame: Frame | None = None
+        self.spectators: set[Spectator] = set()
+        # tick messages published but not broadcast yet
+        self.pending: list[dict] = []
+        self.pending_lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self.servers: list[asyncio.AbstractServer] = []
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.started = threading.Event()
+        self.error: BaseException | None = None
+
+    def start(self) -> "SpectatorServer":
+        """Open the ports, port 0 picks a free one"""
+        self.thread.start()
+        self.started.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.open_servers())
+        except OSError as error:
+            self.error = error
+            self.started.set()
+            return
+        self.started.set()
+        self.loop.run_forever()
+        self.loop.close()
+
+    async def open_servers(self) -> None:
+        if self.port is not None:
+            server = await asyncio.start_server(self.serve_tcp, self.host, self.port)
+            self.port = server.sockets[0].getsockname()[1]
+            self.servers.append(server)
+        if self.websocket_port is not None:
+            server = await asyncio.start_server(
+                self.serve_websocket, self.host, self.websocket_port
+            )
+            self.websocket_port = server.sockets[0].getsockname()[1]
+            self.servers.append(server)
+
+    def stop(self) -> None:
+        if not self.thread.is_alive():
+            return
+        asyncio.run_coroutine_threadsafe(self.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    async def close(self) -> None:
+        for server in self.servers:
+            server.close()
+        tasks = [spectator.task for spectator in self.spectators if spectator.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0)  # lets the cancelled readers finish
+        for server in self.servers:
+            await server.wait_closed()
+
+    @property
+    def spectator_count(self) -> int:
+        return len(self.spectators)
+
+    def publish(self, game: Game, changes: TickChanges) -> None:
+        """Hand a tick over to the server, called on the game thread"""
+        message = tick_message(game, changes)
+        with self.pending_lock:
+            self.pending.append(message)
+            if len(self.pending) > 1:
+                return  # a flush() is scheduled already
+        self.loop.call_soon_threadsafe(self.flush)
+
+    def flush(self) -> None:
+        """Broadcast the ticks published since the last flush, on the server's
+        loop"""
+        with self.pending_lock:
+            messages, self.pending = self.pending, []
+        self.broadcast(merge_tick_messages(messages))
+
+    def broadcast(self, message: dict) -> None:
+        """Queue a tick for every client, on the server's loop"""
+        self.update_snapshot(message)
+        if not self.spectators:
+            return
+        frame = Frame(message)
+        for spectator in self.spectators:
+            if spectator.needs_snapshot:
+                pass  # the snapshot it gets next already includes this tick
+            elif len(spectator.frames) >= config.SPECTATOR_QUEUE_SIZE:
+                spectator.dropped += len(spectator.frames) + 1
+                spectator.frames.clear()
+                spectator.needs_snapshot = True
+            else:
+                spectator.frames.append(frame)
+            if spectator.waiter is not None and not spectator.waiter.done():
+                spectator.waiter.set_result(None)
+
+    def update_snapshot(self, message: dict) -> None:
+        snapshot = self.snapshot
+        snapshot["tick"] = message["tick"]
+        for index, x, y in message.get("moved", ()):
+            snapshot["positions"][index] = [x, y]
+        if "orb" in message:
+            snapshot["orb"] = message["orb"]
+            snapshot["carrier"] = message["carrier"]
+        if "score" in message:
+            snapshot["score"] = message["score"]
+        if "messages" in message:
+            messages = snapshot["messages"] + message["messages"]
+            snapshot["messages"] = messages[-config.MAX_MESSAGES :]
+        self.snapshot_frame = None
+
+    def get_snapshot_frame(self) -> Frame:
+        if self.snapshot_frame is None:
+            self.snapshot_frame = Frame(self.snapshot)
+        return self.snapshot_frame
+
+    async def serve_tcp(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        await self.serve(Spectator(writer, websocket=False), reader)
+
+    async def serve_websocket(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+        headers = {}
+        for line in request.decode("latin-1").split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if key is None:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            writer.close()
+            return
+        accept = base64.b64encode(
+            hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()
+        ).decode()
+        writer.write(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode()
+        )
+        await self.serve(Spectator(writer, websocket=True), reader)
+
+    async def serve(self, spectator: Spectator, reader: asyncio.StreamReader) -> None:
+        """Send frames until the client goes away"""
+        writer = spectator.writer
+        writer.transport.set_write_buffer_limits(config.SPECTATOR_WRITE_BUFFER)
+        self.spectators.add(spectator)
+        # clients only talk to close the connection, anything else is ignored
+        closed = asyncio.ensure_future(self.wait_for_close(reader, spectator))
+        try:
+            writer.write(spectator.data(self.map_frame))
+            while not closed.done():
+                if spectator.needs_snapshot:
+                    spectator.needs_snapshot = False
+                    writer.write(spectator.data(self.get_snapshot_frame()))
+                while spectator.frames:
+                    writer.write(spectator.data(spectator.frames.popleft()))
+                # a slow client waits here while the next frames queue up
+                await writer.drain()
+                if not (spectator.frames or spectator.needs_snapshot):
+                    spectator.waiter = asyncio.get_running_loop().create_future()
+                    await asyncio.wait(
+                        (closed, spectator.waiter),
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.spectators.discard(spectator)
+            closed.cancel()
+            writer.close()
+
+    async def wait_for_close(
+        self, reader: asyncio.StreamReader, spectator: Spectator
+    ) -> None:
+        while True:
+            if spectator.websocket:
+                try:
+                    header = await reader.readexactly(2)
+                    length = header[1] & 0x7F
+                    if length == 126:
+                        (length,) = struct.unpack("!H", await reader.readexactly(2))
+                    elif length == 127:
+                        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+                    masked = header[1] & 0x80
+                    await reader.readexactly(length + (4 if masked else 0))
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                if header[0] & 0x0F == 0x8:  # close frame
+                    return
+            elif not await reader.read(4096):
+                return
@@ -0,0 +1,284 @@
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+import numpy as np
+import config
+from arena import Arena
+from arena_state import ArenaState, NO_PLAYER, TEAMS
+from ai.team_context import TeamContext
+from events import EventLog
+from game_objects.meta_orb import MetaOrb
+from game_objects.player import Player
+from map_cache import CompiledMap
+
+
+@dataclass
+class ArenaView:
+    """What strategies get to see of the arena during one tick"""
+
+    map_name: str
+    state: ArenaState  # read-only
+    players: list[Player]
+    has_meta_orb: bool
+
+    def apply(self, arena: Arena) -> None:
+        """Show this tick's state on a worker's own arena"""
+        arena.state = self.state
+        arena.players = self.players
+        arena.player_indexes = {player: i for i, player in enumerate(self.players)}
+        if self.has_meta_orb and arena.meta_orb is None:
+            arena.meta_orb = MetaOrb()
+        arena.sync_meta_orb()
+
+
+def timed_action(
+    arena: Arena, player: Player, context: TeamContext | None = None
+) -> tuple[dict | None, float]:
+    """Run the strategy of a player, returns the action and the seconds it took"""
+    started = time.perf_counter()
+    action = player.decide_action(arena, context)
+    return action, time.perf_counter() - started
+
+
+@dataclass
+class StateUpdate:
+    """What changes of the arena from tick to tick, as sent to worker
+    processes. They keep the map and rebuild the occupancy themselves."""
+
+    tick: int
+    player_positions: np.ndarray
+    player_stats: np.ndarray
+    orb_position: np.ndarray
+    orb_carrier: int
+
+    @classmethod
+    def capture(cls, arena: Arena, tick: int) -> "StateUpdate":
+        state = arena.state
+        return cls(
+            tick,
+            state.player_positions.copy(),
+            state.player_stats.copy(),
+            state.orb_position.copy(),
+            state.orb_carrier,
+        )
+
+
+# arena, players and team contexts of the current worker process
+_process_arena: Arena | None = None
+_process_contexts: dict[str, TeamContext] = {}
+
+
+def init_process(
+    compiled_map: CompiledMap, players: list[Player], has_meta_orb: bool
+) -> None:
+    """Set up a worker process once, its players keep their strategies' state"""
+    global _process_arena
+    _process_arena = Arena(compiled_map.name, compiled_map=compiled_map)
+    _process_arena.events = EventLog(enabled=False)
+    for player in players:
+        _process_arena.get_player_index(player)
+    if has_meta_orb:
+        _process_arena.meta_orb = MetaOrb()
+
+
+def update_process(update: StateUpdate) -> None:
+    """Bring the worker's arena to the state of a new tick"""
+    arena = _process_arena
+    state = arena.state  # type: ignore
+    state.set_writeable(True)
+    # only the cells of players that moved change
+    old = state.player_positions[state.player_positions[:, 0] >= 0]
+    state.occupancy[old[:, 1], old[:, 0]] = NO_PLAYER
+    state.player_positions = update.player_positions
+    present = (update.player_positions[:, 0] >= 0).nonzero()[0]
+    new = update.player_positions[present]
+    state.occupancy[new[:, 1], new[:, 0]] = present
+    state.player_stats = update.player_stats
+    state.orb_position = update.orb_position
+    state.orb_carrier = update.orb_carrier
+    state.set_writeable(False)
+    arena.sync_meta_orb()  # type: ignore
+    shared: dict = {}
+    lock = threading.RLock()
+    for team in TEAMS:
+        _process_contexts[team] = TeamContext(arena, team, update.tick, shared, lock)
+
+
+def decide_in_process(player_index: int) -> tuple[dict | None, float]:
+    arena = _process_arena
+    player = arena.players[player_index]  # type: ignore
+    return timed_action(arena, player, _process_contexts.get(player.team))  # type: ignore
+
+
+class StrategyPool:
+    """Evaluates strategies in worker threads or processes with a deadline per tick.
+
+    Every worker decides on its own copy of the arena, all showing the same
+    read-only state. Strategies that miss the deadline forfeit their action and
+    sit out until their call returns; running calls cannot be interrupted.
+
+    A process pool is a lane of one worker process per worker, each player
+    always decides in the same lane. A lane gets the map and its copies of the
+    players once when it starts, so strategies keep their state between ticks
+    there, and after that one StateUpdate per tick. A call that runs late
+    holds up the players behind it in its lane."""
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: int | None = None,
+        deadline: float | None = None,
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown strategy pool '{kind}'.")
+        self.kind = kind
+        self.max_workers = max_workers or config.STRATEGY_WORKERS
+        self.executor = (
+            ThreadPoolExecutor(self.max_workers) if kind == "thread" else None
+        )
+        # process lanes, started for the arena and players of the first tick
+        self.lanes: list[ProcessPoolExecutor] = []
+        self.lanes_key: tuple | None = None
+        self.deadline = deadline if deadline is not None else config.STRATEGY_DEADLINE
+        # calls that missed their deadline and may still be running
+        self.late_calls: dict[Player, Future] = {}
+        self.local = threading.local()
+
+    def decide(
+        self,
+        arena: Arena,
+        players: list[Player],
+        contexts: dict[str, TeamContext] | None = None,
+    ) -> list[tuple[dict | None, float | None]]:
+        """(action, seconds) per player, (None, None) for a forfeited action.
+
+        Thread workers share the answers of the team contexts, computed once
+        under their lock on the arena of whichever worker asks first. Process
+        lanes make their own."""
+        deciding = [
+            player.strategy is not None and player not in self.late_calls
+            for player in players
+        ]
+        if self.kind == "thread":
+            state = arena.snapshot()
+            state.set_writeable(False)
+            view = ArenaView(
+                arena.name, state, list(arena.players), arena.meta_orb is not None
+            )
+            futures: list[Future | None] = [
+                (
+                    self.executor.submit(  # type: ignore
+                        self.decide_in_thread,
+                        arena,
+                        view,
+                        player,
+                        contexts[player.team] if contexts else None,
+                    )
+                    if decides
+                    else None
+                )
+                for player, decides in zip(players, deciding)
+            ]
+        else:
+            futures = self.decide_in_processes(arena, players, deciding, contexts)
+
+        wait([future for future in futures if future is not None], self.deadline)
+
+        decisions: list[tuple[dict | None, float | None]] = []
+        for player, future in zip(players, futures):
+            if future is None:
+                decisions.append((None, None if player.strategy else 0.0))
+            elif future.done():
+                decisions.append(future.result())
+            else:
+                self.late_calls[player] = future
+                decisions.append((None, None))
+        return decisions
+
+    def decide_in_thread(
+        self,
+        arena: Arena,
+        view: ArenaView,
+        player: Player,
+        context: TeamContext | None = None,
+    ) -> tuple[dict | None, float]:
+        # each thread searches paths on its own clone, grids are not thread safe
+        source, worker_arena = getattr(self.local, "arena", (None, None))
+        if source is not arena:
+            worker_arena = arena.clone(share_pathfinding=False)
+            worker_arena.events = EventLog(enabled=False)
+            self.local.arena = (arena, worker_arena)
+        view.apply(worker_arena)
+        # clones start unprofiled, the game's profiler takes a lock per call
+        worker_arena.profiler = arena.profiler
+        if context is not None:
+            context = context.bind(worker_arena)
+        return timed_action(worker_arena, player, context)
+
+    def decide_in_processes(
+        self,
+        arena: Arena,
+        players: list[Player],
+        deciding: list[bool],
+        contexts: dict[str, TeamContext] | None,
+    ) -> list[Future | None]:
+        self.start_lanes(arena)
+        tick = next(iter(contexts.values())).tick if contexts else 0
+        update = StateUpdate.capture(arena, tick)
+        indexes = [arena.player_indexes[player] for player in players]
+        lanes = {
+            index % len(self.lanes)
+            for index, decides in zip(indexes, deciding)
+            if decides
+        }
+        for lane in lanes:
+            # runs before the calls queued after it, lanes have one process
+            self.lanes[lane].submit(update_process, update)
+        return [
+            (
+                self.lanes[index % len(self.lanes)].submit(decide_in_process, index)
+                if decides
+                else None
+            )
+            for index, decides in zip(indexes, deciding)
+        ]
+
+    def start_lanes(self, arena: Arena) -> None:
+        """Start the worker processes, again if the arena or its players changed"""
+        key = (id(arena), arena.name, tuple(arena.players))
+        if key == self.lanes_key:
+            return
+        self.shutdown_lanes()
+        initargs = (
+            arena.to_compiled_map(),
+            list(arena.players),
+            arena.meta_orb is not None,
+        )
+        self.lanes = [
+            ProcessPoolExecutor(1, initializer=init_process, initargs=initargs)
+            for _ in range(self.max_workers)
+        ]
+        self.lanes_key = key
+        self.late_calls.clear()
+
+    def shutdown_lanes(self) -> None:
+        for lane in self.lanes:
+            lane.shutdown(wait=False, cancel_futures=True)
+        self.lanes = []
+        self.lanes_key = None
+
+    def collect_late(self) -> list[tuple[Player, float]]:
+        """Players whose late calls have returned since, with the seconds taken"""
+        finished = []
+        for player, future in list(self.late_calls.items()):
+            if future.done():
+                del self.late_calls[player]
+                if future.exception() is None:
+                    finished.append((player, future.result()[1]))
+        return finished
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.shutdown_lanes()
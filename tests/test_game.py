@@ -0,0 +1,212 @@
+import numpy as np
+import pytest
+import map_cache
+from ai.strategy import Strategy
+from events import EventLog
+from game import Game
+from game_objects.entities import TILE_IDS
+from game_objects.player import Player
+from strategy_pool import StrategyPool
+
+TILE_CHARACTERS = {
+    ".": "FLOOR",
+    "#": "WALL",
+    "o": "ORB_SPAWN",
+    "r": "RED_SPAWN",
+    "b": "BLUE_SPAWN",
+}
+# image order, the first row is the top of the map
+MAP_ROWS = (
+    "rr...b",
+    "..#..b",
+    "..o#..",
+    "......",
+)
+MOVES = ((0, 1), (0, -1), (-1, 0), (1, 0))
+
+
+def make_game() -> Game:
+    tile_ids = np.array(
+        [
+            [TILE_IDS[TILE_CHARACTERS[character]] for character in row]
+            for row in MAP_ROWS
+        ]
+    )
+    game = Game(
+        "test",
+        [Player("R0", "RED"), Player("R1", "RED")],
+        [Player("B0", "BLUE"), Player("B1", "BLUE")],
+        compiled_map=map_cache.compile_tile_ids("test", tile_ids),
+        event_log=EventLog(),
+    )
+    game.spawn_players()
+    game.spawn_meta_orb()
+    game.running = True
+    return game
+
+
+def state_of(game: Game) -> tuple:
+    state = game.map.state
+    meta_orb = game.map.meta_orb
+    return (
+        state.occupancy.tobytes(),
+        state.player_positions.tobytes(),
+        state.player_stats.tobytes(),
+        state.orb_position.tobytes(),
+        state.orb_carrier,
+        meta_orb.carried_by if meta_orb is not None else None,
+        game.score_red,
+        game.score_blue,
+        game.events.count,
+    )
+
+
+def random_action(game: Game, player: Player, rng) -> dict | None:
+    choice = rng.integers(0, len(MOVES) + 2)
+    if choice == len(MOVES):
+        return {"pick_up": True}
+    if choice == len(MOVES) + 1:
+        return None
+    x, y = game.map.get_position_of_player(player)
+    dx, dy = MOVES[choice]
+    return {"move": (x + dx, y + dy)}
+
+
+def test_pick_up_and_carrying_are_undone():
+    game = make_game()
+    player = game.player_list[0]
+    game.map.place_player(player, (1, 1))
+    states = [state_of(game)]
+    records = []
+    for action in (
+        {"move": (2, 1)},  # onto the orb spawn
+        {"pick_up": True},
+        {"move": (2, 0)},  # the orb follows
+        {"move": (1, 0)},
+    ):
+        records.append(game.apply_action(player, action))
+        states.append(state_of(game))
+    assert game.map.state.orb_carrier == game.map.get_player_index(player)
+    assert game.map.get_meta_orb_position() == (1, 0)
+    assert game.map.meta_orb.carried_by is player
+
+    while records:
+        game.undo_action(records.pop())
+        states.pop()
+        assert state_of(game) == states[-1]
+    assert game.map.meta_orb.carried_by is None
+
+
+def test_scores_are_undone():
+    game = make_game()
+    before = state_of(game)
+    record = game.apply_action(game.player_list[0], {"move": (0, 2)})
+    # no action scores yet, whatever changes them is rolled back too
+    game.score_red += 1
+    game.score_blue += 2
+    game.undo_action(record)
+    assert state_of(game) == before
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_actions_undo_bit_for_bit(seed):
+    game = make_game()
+    rng = np.random.default_rng(seed)
+    states = [state_of(game)]
+    records = []
+    for _ in range(200):
+        if records and rng.random() < 0.3:
+            game.undo_action(records.pop())
+            states.pop()
+            assert state_of(game) == states[-1]
+        else:
+            player = game.player_list[rng.integers(0, len(game.player_list))]
+            records.append(game.apply_action(player, random_action(game, player, rng)))
+            states.append(state_of(game))
+    while records:
+        game.undo_action(records.pop())
+        states.pop()
+        assert state_of(game) == states[-1]
+
+
+def test_snapshot_restores_ticks_and_stays_reusable():
+    game = make_game()
+    for _ in range(3):
+        game.process_tick()
+    snapshot = game.snapshot()
+    expected = state_of(game), game.tick, game.running
+
+    rng = np.random.default_rng(0)
+    for _ in range(2):
+        for _ in range(10):
+            game.process_tick(
+                {
+                    player: random_action(game, player, rng)
+                    for player in game.player_list
+                }
+            )
+        assert (state_of(game), game.tick, game.running) != expected
+        game.restore(snapshot)
+        assert (state_of(game), game.tick, game.running) == expected
+
+
+class LegacyStrategy(Strategy):
+    """Written against get_action(player, arena), before team contexts"""
+
+    def get_action(self, player, arena):
+        x, y = arena.get_position_of_player(player)
+        return {"move": (x, y - 1)}
+
+
+class ArenaCheckingStrategy(Strategy):
+    def __init__(self):
+        super().__init__()
+        self.mismatches = 0
+
+    def get_action(self, player, arena, context=None):
+        if context is None or context.arena is not arena:
+            self.mismatches += 1
+        context.distance_field_to_orb()
+        return None
+
+
+def test_strategies_without_context_still_work():
+    game = make_game()
+    for player in game.player_list:
+        player.strategy = LegacyStrategy()
+    start = game.map.get_position_of_player(game.player_list[0])
+    game.process_tick()
+    assert game.map.get_position_of_player(game.player_list[0]) == (
+        start[0],
+        start[1] - 1,
+    )
+
+
+@pytest.mark.parametrize("kind", [None, "thread"])
+def test_context_is_bound_to_the_arena_the_strategy_reads(kind):
+    game = make_game()
+    if kind is not None:
+        game.strategy_pool = StrategyPool(kind, 2, deadline=5.0)
+    strategies = [ArenaCheckingStrategy() for _ in game.player_list]
+    for player, strategy in zip(game.player_list, strategies):
+        player.strategy = strategy
+    try:
+        for _ in range(3):
+            game.process_tick()
+    finally:
+        if game.strategy_pool is not None:
+            game.strategy_pool.shutdown()
+    assert [strategy.mismatches for strategy in strategies] == [0] * 4
+
+
+def test_arena_lookups_are_counted_only_while_profiling():
+    game = make_game()
+    player = game.player_list[0]
+    game.map.get_position_of_player(player)
+    profiler = game.enable_profiling()
+    game.map.get_position_of_player(player)
+    game.map.get_meta_orb_position()
+    assert profiler.tick_counts["arena_lookups"] == 2
+    game.disable_profiling()
+    game.map.get_position_of_player(player)
+    assert profiler.tick_counts["arena_lookups"] == 2
@@ -0,0 +1,227 @@
+from collections import deque
+import numpy as np
+import pytest
+import grid_pathfinder
+from grid_pathfinder import GridPathfinder
+
+SEEDS = range(6)
+
+
+def random_matrix(seed: int, width: int = 24, height: int = 18) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (rng.random((height, width)) >= 0.3).astype(np.uint8)
+
+
+def bfs(matrix: np.ndarray, start: tuple[int, int]) -> dict[tuple[int, int], int]:
+    """Path length from start to every cell it reaches, the slow obvious way"""
+    height, width = matrix.shape
+    distances = {start: 0}
+    queue = deque([start])
+    while queue:
+        x, y = queue.popleft()
+        for nx, ny in ((x, y + 1), (x, y - 1), (x - 1, y), (x + 1, y)):
+            if (
+                0 <= nx < width
+                and 0 <= ny < height
+                and matrix[ny, nx]
+                and (nx, ny) not in distances
+            ):
+                distances[(nx, ny)] = distances[(x, y)] + 1
+                queue.append((nx, ny))
+    return distances
+
+
+def passable_cells(matrix: np.ndarray) -> list[tuple[int, int]]:
+    ys, xs = np.nonzero(matrix)
+    return list(zip(xs.tolist(), ys.tolist()))
+
+
+def assert_valid_path(matrix, path, start, end):
+    assert path[0] == start and path[-1] == end
+    for (x, y), (nx, ny) in zip(path, path[1:]):
+        assert abs(nx - x) + abs(ny - y) == 1
+    assert all(matrix[y, x] for x, y in path)
+
+
+@pytest.mark.parametrize("method", grid_pathfinder.PATHFINDING_METHODS)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_paths_are_as_short_as_breadth_first_search(method, seed):
+    matrix = random_matrix(seed)
+    pathfinder = GridPathfinder(matrix)
+    cells = passable_cells(matrix)
+    rng = np.random.default_rng(seed)
+    for start_choice in rng.choice(len(cells), 8, replace=False):
+        start = cells[start_choice]
+        distances = bfs(matrix, start)
+        for end_choice in rng.choice(len(cells), 20, replace=False):
+            end = cells[end_choice]
+            path = pathfinder.find_path(start, end, method)
+            if end not in distances:
+                assert path == []
+                continue
+            assert_valid_path(matrix, path, start, end)
+            assert len(path) - 1 == distances[end]
+
+
+@pytest.mark.parametrize("method", grid_pathfinder.PATHFINDING_METHODS)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_paths_lead_around_obstacles(method, seed):
+    matrix = random_matrix(seed)
+    pathfinder = GridPathfinder(matrix)
+    cells = passable_cells(matrix)
+    rng = np.random.default_rng(seed)
+    for _ in range(20):
+        start, end, *obstacles = [
+            cells[choice] for choice in rng.choice(len(cells), 12, replace=False)
+        ]
+        blocked = matrix.copy()
+        for x, y in obstacles:
+            blocked[y, x] = 0
+        distances = bfs(blocked, start)
+        path = pathfinder.find_path(start, end, method, obstacles)
+        if end not in distances:
+            assert path == []
+            continue
+        assert_valid_path(blocked, path, start, end)
+        assert len(path) - 1 == distances[end]
+    # obstacles only last for one search
+    for x, y in obstacles:
+        if (x, y) in bfs(matrix, start):
+            assert len(pathfinder.find_path(start, (x, y), method)) > 0
+
+
+@pytest.mark.parametrize("method", grid_pathfinder.PATHFINDING_METHODS)
+def test_unreachable_targets_have_no_path(method):
+    matrix = np.array(
+        [
+            [1, 1, 0, 1],
+            [1, 1, 0, 1],
+            [0, 0, 0, 1],
+        ],
+        dtype=np.uint8,
+    )
+    pathfinder = GridPathfinder(matrix)
+    assert pathfinder.find_path((0, 0), (3, 2), method) == []
+    assert pathfinder.find_path((0, 0), (2, 1), method) == []  # a wall
+    # walled in by obstacles
+    assert pathfinder.find_path((0, 0), (1, 1), method, [(1, 0), (0, 1)]) == []
+
+
+@pytest.mark.parametrize("method", grid_pathfinder.PATHFINDING_METHODS)
+def test_start_is_the_goal(method):
+    pathfinder = GridPathfinder(np.ones((3, 3), dtype=np.uint8))
+    assert pathfinder.find_path((1, 1), (1, 1), method) == [(1, 1)]
+    assert pathfinder.find_path((1, 1), (1, 1), method, [(1, 1)]) == [(1, 1)]
+
+
+@pytest.mark.parametrize("method", grid_pathfinder.PATHFINDING_METHODS)
+def test_blocked_start_has_no_path(method):
+    matrix = np.ones((3, 3), dtype=np.uint8)
+    matrix[1, 1] = 0
+    pathfinder = GridPathfinder(matrix)
+    assert pathfinder.find_path((1, 1), (0, 0), method) == []
+    assert pathfinder.find_path((1, 1), (1, 1), method) == []
+    assert pathfinder.find_nearest((1, 1), [(0, 0)]) == []
+    assert pathfinder.get_component((1, 1)) == -1
+
+
+def test_unknown_method_is_refused():
+    pathfinder = GridPathfinder(np.ones((2, 2), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        pathfinder.find_path((0, 0), (1, 1), "dijkstra")
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_distance_fields_match_breadth_first_search(seed):
+    matrix = random_matrix(seed)
+    cells = passable_cells(matrix)
+    rng = np.random.default_rng(seed)
+    targets = [cells[choice] for choice in rng.choice(len(cells), 3, replace=False)]
+    distances = grid_pathfinder.compute_distance_field(matrix, targets)
+
+    expected = np.full(matrix.shape, -1, dtype=np.int32)
+    for target in targets:
+        for (x, y), distance in bfs(matrix, target).items():
+            if expected[y, x] < 0 or distance < expected[y, x]:
+                expected[y, x] = distance
+    np.testing.assert_array_equal(distances, expected)
+
+    # next_step walks downhill to a target
+    for start in cells:
+        step = grid_pathfinder.next_step(distances, start)
+        x, y = start
+        if distances[y, x] <= 0:
+            assert step is None
+        else:
+            assert distances[step[1], step[0]] == distances[y, x] - 1
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_components_match_reachability(seed):
+    matrix = random_matrix(seed)
+    pathfinder = GridPathfinder(matrix)
+    cells = passable_cells(matrix)
+    start = cells[0]
+    reachable = bfs(matrix, start)
+    component = pathfinder.get_component(start)
+    for cell in cells:
+        assert (pathfinder.get_component(cell) == component) == (cell in reachable)
+
+
+def test_set_passable_updates_paths_and_components():
+    matrix = np.ones((1, 5), dtype=np.uint8)
+    pathfinder = GridPathfinder(matrix)
+    assert pathfinder.get_component((0, 0)) == pathfinder.get_component((4, 0))
+    pathfinder.set_passable((2, 0), False)
+    assert pathfinder.find_path((0, 0), (4, 0)) == []
+    assert pathfinder.find_path((0, 0), (4, 0), "jps") == []
+    assert pathfinder.get_component((0, 0)) != pathfinder.get_component((4, 0))
+    pathfinder.set_passable((2, 0), True)
+    assert len(pathfinder.find_path((0, 0), (4, 0), "jps")) == 5
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_find_nearest_matches_breadth_first_search(seed):
+    matrix = random_matrix(seed)
+    pathfinder = GridPathfinder(matrix)
+    cells = passable_cells(matrix)
+    rng = np.random.default_rng(seed)
+    start = cells[rng.integers(len(cells))]
+    targets = [cells[choice] for choice in rng.choice(len(cells), 10, replace=False)]
+    distances = bfs(matrix, start)
+    reachable = [target for target in targets if target in distances]
+    expected = sorted(distances[target] for target in reachable)
+
+    nearest = pathfinder.find_nearest(start, targets, count=len(targets))
+    assert [distance for _, distance in nearest] == expected
+    assert sorted(target for target, _ in nearest) == sorted(reachable)
+    assert all(distances[target] == distance for target, distance in nearest)
+    for count in (1, 3):
+        found = pathfinder.find_nearest(start, targets, count)
+        assert [distance for _, distance in found] == expected[:count]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_closest_reachable_matches_brute_force(seed):
+    matrix = random_matrix(seed)
+    height, width = matrix.shape
+    pathfinder = GridPathfinder(matrix)
+    cells = passable_cells(matrix)
+    rng = np.random.default_rng(seed)
+    for _ in range(10):
+        start = cells[rng.integers(len(cells))]
+        reachable = list(bfs(matrix, start))
+        for _ in range(10):
+            target = (int(rng.integers(-3, width + 3)), int(rng.integers(height)))
+            closest = pathfinder.find_closest_reachable(start, target)
+            assert closest in reachable
+            distance = abs(closest[0] - target[0]) + abs(closest[1] - target[1])
+            assert distance == min(
+                abs(x - target[0]) + abs(y - target[1]) for x, y in reachable
+            )
+            if target in reachable:
+                assert closest == target
+
+    blocked = np.ones((3, 3), dtype=np.uint8)
+    blocked[1, 1] = 0
+    assert GridPathfinder(blocked).find_closest_reachable((1, 1), (0, 0)) is None
@@ -0,0 +1,128 @@
+import os
+import numpy as np
+import pytest
+import map_cache
+from game_objects.entities import TILES, TILE_IDS
+
+# image order, the first row is the top of the map
+ROWS = (
+    "r..#",
+    "..o.",
+    "#..b",
+)
+TILE_CHARACTERS = {
+    ".": "FLOOR",
+    "#": "WALL",
+    "o": "ORB_SPAWN",
+    "r": "RED_SPAWN",
+    "b": "BLUE_SPAWN",
+}
+
+
+def write_png(folder, name: str, rows) -> str:
+    from PIL import Image
+
+    colors = np.array(
+        [
+            [
+                TILES[TILE_IDS[TILE_CHARACTERS[character]]].import_color
+                for character in row
+            ]
+            for row in rows
+        ],
+        dtype=np.uint8,
+    )
+    path = map_cache.get_png_path(name, str(folder) + "/")
+    Image.fromarray(colors).save(path)
+    return path
+
+
+@pytest.fixture
+def source(tmp_path):
+    write_png(tmp_path, "test", ROWS)
+    return str(tmp_path) + "/"
+
+
+def test_compiles_and_writes_the_cache(source):
+    compiled = map_cache.load_compiled_map("test", source)
+    assert os.path.exists(map_cache.get_cache_path("test", source))
+    assert compiled.dimensions == (4, 3)
+    assert compiled.spawn_positions == {
+        "RED_SPAWN": [(0, 2)],
+        "BLUE_SPAWN": [(3, 0)],
+        "ORB_SPAWN": [(2, 1)],
+    }
+    # map coordinates, y grows upwards
+    assert compiled.tile_ids[2, 3] == TILE_IDS["WALL"]
+    assert compiled.passable.tolist() == [[0, 1, 1, 1], [1, 1, 1, 1], [1, 1, 1, 0]]
+    assert compiled.distance_fields[(2, 1)][2, 0] == 3
+
+
+def test_cache_hit_reads_the_file(source, monkeypatch):
+    first = map_cache.load_compiled_map("test", source)
+    monkeypatch.setattr(
+        map_cache, "compile_image", lambda *args: pytest.fail("compiled again")
+    )
+    second = map_cache.load_compiled_map("test", source)
+    assert isinstance(second.tile_ids, np.memmap)
+    np.testing.assert_array_equal(first.tile_ids, second.tile_ids)
+    assert first.spawn_positions == second.spawn_positions
+    for target, distances in first.distance_fields.items():
+        np.testing.assert_array_equal(distances, second.distance_fields[target])
+
+
+def test_touched_source_keeps_the_cache_with_the_new_mtime(source, monkeypatch):
+    map_cache.load_compiled_map("test", source)
+    png_path = map_cache.get_png_path("test", source)
+    os.utime(png_path, ns=(0, 10**18))
+    monkeypatch.setattr(
+        map_cache, "compile_image", lambda *args: pytest.fail("compiled again")
+    )
+    map_cache.load_compiled_map("test", source)
+    header = map_cache.read_header(map_cache.get_cache_path("test", source))
+    assert header[4] == 10**18
+
+
+def test_changed_source_rebuilds_the_cache(source):
+    map_cache.load_compiled_map("test", source)
+    png_path = write_png(source, "test", ("b..#", "..o.", "#..r"))
+    os.utime(png_path, ns=(0, 10**18))
+    compiled = map_cache.load_compiled_map("test", source)
+    assert compiled.spawn_positions["RED_SPAWN"] == [(3, 0)]
+    assert compiled.spawn_positions["BLUE_SPAWN"] == [(0, 2)]
+    header = map_cache.read_header(map_cache.get_cache_path("test", source))
+    assert header[4] == 10**18
+
+
+@pytest.mark.parametrize("size", [0, 20, map_cache.HEADER.size + 4])
+def test_truncated_cache_is_compiled_again(source, size):
+    expected = np.array(map_cache.load_compiled_map("test", source).tile_ids)
+    cache_path = map_cache.get_cache_path("test", source)
+    # replaced rather than truncated in place, the old file is still mapped
+    with open(cache_path, "rb") as file:
+        data = file.read(size)
+    os.remove(cache_path)
+    with open(cache_path, "wb") as file:
+        file.write(data)
+    compiled = map_cache.load_compiled_map("test", source)
+    np.testing.assert_array_equal(compiled.tile_ids, expected)
+    assert os.path.getsize(cache_path) > size
+
+
+def test_corrupt_cache_is_compiled_again(source):
+    cache_path = map_cache.get_cache_path("test", source)
+    with open(cache_path, "wb") as file:
+        file.write(b"not a compiled map" * 10)
+    compiled = map_cache.load_compiled_map("test", source)
+    assert compiled.spawn_positions["ORB_SPAWN"] == [(2, 1)]
+    assert map_cache.read_header(cache_path) is not None
+
+
+def test_cache_without_source_image(source):
+    expected = map_cache.load_compiled_map("test", source)
+    os.remove(map_cache.get_png_path("test", source))
+    compiled = map_cache.load_compiled_map("test", source)
+    np.testing.assert_array_equal(compiled.passable, expected.passable)
+    os.remove(map_cache.get_cache_path("test", source))
+    with pytest.raises(FileNotFoundError):
+        map_cache.load_compiled_map("test", source)
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import grid_pathfinder
+import map_generator
+from game_objects.entities import TILE_PASSABLE
+from map_generator import BLUE_SPAWN, ORB_SPAWN, RED_SPAWN, WALL
+
+SIZES = [(64, 64), (65, 65), (64, 48), (33, 40), (256, 256)]
+
+
+def spawn_distances(tiles: np.ndarray, spawn: int) -> np.ndarray:
+    """Fewest steps from any cell of the spawn to every ORB_SPAWN"""
+    rows, cols = np.nonzero(tiles == spawn)
+    distances = grid_pathfinder.compute_distance_field(
+        TILE_PASSABLE[tiles].astype(np.uint8), list(zip(cols.tolist(), rows.tolist()))
+    )
+    return distances[tiles == ORB_SPAWN]
+
+
+@pytest.mark.parametrize("layout", map_generator.LAYOUTS)
+@pytest.mark.parametrize("width, height", SIZES)
+def test_symmetric_map_looks_the_same_from_both_sides(layout, width, height):
+    tiles = map_generator.generate_map(width, height, layout, seed=3)
+    assert tiles.shape == (height, width)
+    # even sizes have an extra wall row at the bottom or column at the right
+    if height % 2 == 0:
+        assert (tiles[-2:] == WALL).all()
+        tiles = tiles[:-1]
+    if width % 2 == 0:
+        assert (tiles[:, -2:] == WALL).all()
+        tiles = tiles[:, :-1]
+    swapped = tiles.copy()
+    swapped[tiles == RED_SPAWN] = BLUE_SPAWN
+    swapped[tiles == BLUE_SPAWN] = RED_SPAWN
+    np.testing.assert_array_equal(tiles, swapped[::-1, ::-1])
+
+
+@pytest.mark.parametrize("layout", map_generator.LAYOUTS)
+@pytest.mark.parametrize("width, height", SIZES)
+@pytest.mark.parametrize("symmetric", [True, False])
+def test_both_teams_reach_the_orb_in_the_same_number_of_steps(
+    layout, width, height, symmetric
+):
+    tiles = map_generator.generate_map(
+        width, height, layout, symmetric=symmetric, seed=5
+    )
+    red = spawn_distances(tiles, RED_SPAWN)
+    blue = spawn_distances(tiles, BLUE_SPAWN)
+    assert (red > 0).all() and (blue > 0).all()
+    if symmetric:
+        np.testing.assert_array_equal(red, blue)
+    else:
+        # no cell might be the same number of steps away from both spawns
+        np.testing.assert_array_less(abs(red - blue), 2)
+
+
+@pytest.mark.parametrize("width, height", SIZES)
+def test_orb_spawns_are_counted(width, height):
+    tiles = map_generator.generate_map(width, height, "rooms", orb_spawns=4, seed=1)
+    assert np.count_nonzero(tiles == ORB_SPAWN) == 4
@@ -0,0 +1,161 @@
+import os
+import numpy as np
+import pytest
+import config
+import map_cache
+import replay
+import vector_game
+from arena_state import NO_PLAYER
+from events import EventLog
+from game import Game
+from game_objects.entities import TILE_IDS
+from game_objects.player import Player
+
+TICKS = 60
+KEYFRAME_INTERVAL = 8
+
+
+@pytest.fixture
+def repo_root(monkeypatch):
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_game() -> Game:
+    game = Game(
+        "the_petting_zoo",
+        [Player(name, "RED") for name in config.PLAYERS_RED],
+        [Player(name, "BLUE") for name in config.PLAYERS_BLUE],
+        event_log=EventLog(enabled=False),
+    )
+    game.spawn_players()
+    game.spawn_meta_orb()
+    game.running = True
+    game.max_ticks = TICKS
+    return game
+
+
+def state_of(game: Game) -> tuple:
+    state = game.map.state
+    return (
+        game.tick,
+        state.player_positions.tolist(),
+        game.map.get_meta_orb_position(),
+        state.orb_carrier,
+        game.score_red,
+        game.score_blue,
+    )
+
+
+def frame_state(frame: replay.ReplayFrame) -> tuple:
+    return (
+        frame.tick,
+        frame.player_positions.tolist(),
+        frame.orb_position,
+        frame.orb_carrier,
+        frame.score_red,
+        frame.score_blue,
+    )
+
+
+def record(path, seed: int = 0, close: bool = True) -> list[tuple]:
+    """Plays a random match into path, returns the state after every tick"""
+    game = make_game()
+    game.replay_writer = replay.ReplayWriter(str(path), game, KEYFRAME_INTERVAL)
+    rng = np.random.default_rng(seed)
+    states = [state_of(game)]
+    for tick in range(1, TICKS + 1):
+        arena = game.map
+        codes = rng.integers(0, len(vector_game.ACTIONS), len(arena.players))
+        if tick == 30:
+            game.score_blue = 100_000  # wider than 16 bits
+        game.process_tick(
+            {
+                player: vector_game.decode_action(
+                    arena.get_position_of_player(player),
+                    codes[arena.get_player_index(player)],
+                )
+                for player in game.player_list
+            }
+        )
+        states.append(state_of(game))
+    if close:
+        game.stop_recording()
+    else:
+        game.replay_writer.file.flush()
+    return states
+
+
+@pytest.mark.parametrize("close", [True, False])
+def test_every_tick_reads_back(repo_root, tmp_path, close):
+    path = tmp_path / "match.orbreplay"
+    states = record(path, close=close)
+    reader = replay.ReplayReader(str(path))
+    assert reader.map_name == "the_petting_zoo"
+    assert (reader.first_tick, reader.last_tick) == (0, TICKS)
+    for tick, expected in enumerate(states):
+        assert frame_state(reader.frame_at(tick)) == expected
+
+
+def test_keyframes_are_indexed(repo_root, tmp_path):
+    path = tmp_path / "match.orbreplay"
+    record(path)
+    reader = replay.ReplayReader(str(path))
+    assert reader.keyframe_ticks == list(range(0, TICKS + 1, KEYFRAME_INTERVAL))
+    for tick, offset in zip(reader.keyframe_ticks, reader.keyframe_offsets):
+        assert reader.data[offset : offset + 1] == replay.KEYFRAME_BLOCK
+        assert reader.read_keyframe(offset).tick == tick
+
+
+def test_replay_game_steps_and_seeks(repo_root, tmp_path):
+    path = tmp_path / "match.orbreplay"
+    states = record(path, seed=1)
+    game = replay.ReplayGame(str(path))
+    for expected in states[1:]:
+        game.process_tick()
+        assert state_of(game) == expected
+    assert not game.running
+
+    for tick in (40, 3, 16, 17, 0, TICKS):
+        game.seek(tick)
+        assert state_of(game) == states[tick]
+        game.process_tick()
+        assert state_of(game) == states[min(tick + 1, TICKS)]
+
+
+def test_hundreds_of_players(tmp_path):
+    floor = np.full((32, 32), TILE_IDS["FLOOR"], dtype=np.uint8)
+    game = Game(
+        "open",
+        [Player(f"R{i}", "RED") for i in range(200)],
+        [Player(f"B{i}", "BLUE") for i in range(200)],
+        compiled_map=map_cache.compile_tile_ids("open", floor),
+        event_log=EventLog(enabled=False),
+    )
+    for i, player in enumerate(game.player_list):
+        game.map.place_player(player, (i % 32, i // 32))
+    game.running = True
+    path = str(tmp_path / "crowd.orbreplay")
+    game.record_replay(path)
+    last = game.map.players[-1]
+    game.process_tick({last: {"move": (15, 13)}})
+    game.stop_recording()
+
+    reader = replay.ReplayReader(path)
+    assert len(reader.players) == 400
+    frame = reader.frame_at(reader.last_tick)
+    assert frame.player_positions[399].tolist() == [15, 13]
+    assert frame.orb_carrier == NO_PLAYER
+
+
+def test_too_many_players_are_refused(tmp_path):
+    game = Game(
+        "open",
+        compiled_map=map_cache.compile_tile_ids(
+            "open", np.full((1, 1), TILE_IDS["FLOOR"], dtype=np.uint8)
+        ),
+    )
+    game.map.players = [Player("P", "RED")] * replay.NO_INDEX
+    path = tmp_path / "crowd.orbreplay"
+    with pytest.raises(ValueError, match="at most"):
+        replay.ReplayWriter(str(path), game)
+    assert not path.exists()
@@ -0,0 +1,257 @@
+import os
+import numpy as np
+import pytest
+import config
+import rules
+from ai.strategy import StrategyStraightOrb
+from arena import Arena
+from events import DEBUG, EventLog
+from game import Game
+from game_objects.entities import TILE_IDS
+from game_objects.meta_orb import MetaOrb
+from game_objects.player import Player, PlayerStats
+
+TILE_CHARACTERS = {".": "FLOOR", "#": "WALL", "o": "ORB_SPAWN"}
+
+
+def make_arena(*rows: str) -> Arena:
+    """Arena of rows in image order, the first row is the top of the map"""
+    tile_ids = np.array(
+        [[TILE_IDS[TILE_CHARACTERS[character]] for character in row] for row in rows]
+    )
+    return Arena.from_tile_ids("test", tile_ids)
+
+
+def place(arena: Arena, *positions: tuple[int, int]) -> list[Player]:
+    players = []
+    for i, position in enumerate(positions):
+        player = Player(f"P{i}", "RED" if i % 2 == 0 else "BLUE")
+        arena.place_player(player, position)
+        players.append(player)
+    return players
+
+
+def resolve(arena, players, targets, tick=0):
+    actions = [{"move": target} if target is not None else None for target in targets]
+    rules.resolve_actions(arena, players, actions, tick)
+    return [arena.get_position_of_player(player) for player in players]
+
+
+def test_free_moves_happen():
+    arena = make_arena("...", "...")
+    players = place(arena, (0, 0), (2, 1))
+    assert resolve(arena, players, [(0, 1), (1, 1)]) == [(0, 1), (1, 1)]
+    assert arena.get_player_stats(players[0]) == PlayerStats(moves=1)
+
+
+def test_walls_and_edges_block():
+    arena = make_arena(".#", "..")
+    players = place(arena, (0, 1), (1, 0))
+    assert resolve(arena, players, [(1, 1), (2, 0)]) == [(0, 1), (1, 0)]
+    assert arena.get_player_stats(players[0]) == PlayerStats(blocked_moves=1)
+
+
+@pytest.mark.parametrize("tick, winner", [(0, 0), (1, 1), (2, 0), (3, 1)])
+def test_contested_cell_goes_to_the_rotating_priority(tick, winner):
+    arena = make_arena("...")
+    players = place(arena, (0, 0), (2, 0))
+    positions = resolve(arena, players, [(1, 0), (1, 0)], tick)
+    assert positions[winner] == (1, 0)
+    assert positions[1 - winner] == [(0, 0), (2, 0)][1 - winner]
+
+
+def test_contested_priority_rotates_through_three_players():
+    for tick in range(6):
+        arena = make_arena("...", "...")
+        players = place(arena, (0, 1), (2, 1), (1, 0))
+        positions = resolve(arena, players, [(1, 1)] * 3, tick)
+        # lowest (index - tick) % players wins
+        assert positions.count((1, 1)) == 1
+        assert positions.index((1, 1)) == tick % 3
+
+
+def test_swaps_are_blocked():
+    arena = make_arena("..")
+    players = place(arena, (0, 0), (1, 0))
+    assert resolve(arena, players, [(1, 0), (0, 0)]) == [(0, 0), (1, 0)]
+
+
+def test_following_into_a_vacated_cell():
+    arena = make_arena("....")
+    players = place(arena, (0, 0), (1, 0), (2, 0))
+    assert resolve(arena, players, [(1, 0), (2, 0), (3, 0)]) == [
+        (1, 0),
+        (2, 0),
+        (3, 0),
+    ]
+
+
+def test_blocked_chain_blocks_everyone_behind():
+    arena = make_arena("...#")
+    players = place(arena, (0, 0), (1, 0), (2, 0))
+    assert resolve(arena, players, [(1, 0), (2, 0), (3, 0)]) == [
+        (0, 0),
+        (1, 0),
+        (2, 0),
+    ]
+    assert [arena.get_player_stats(p).blocked_moves for p in players] == [1, 1, 1]
+
+
+def test_moving_into_a_standing_player_is_blocked():
+    arena = make_arena("...")
+    players = place(arena, (0, 0), (1, 0))
+    assert resolve(arena, players, [(1, 0), None]) == [(0, 0), (1, 0)]
+
+
+def test_rotating_cycle_moves_everyone():
+    # a cycle longer than two is not a swap, every cell is left as it is entered
+    arena = make_arena("..", "..")
+    players = place(arena, (0, 0), (1, 0), (1, 1), (0, 1))
+    targets = [(1, 0), (1, 1), (0, 1), (0, 0)]
+    assert resolve(arena, players, targets) == targets
+
+
+def test_lost_contest_blocks_the_chain_behind_it():
+    arena = make_arena(".....")
+    players = place(arena, (0, 0), (1, 0), (3, 0))
+    positions = resolve(arena, players, [(1, 0), (2, 0), (2, 0)], tick=1)
+    # priorities on tick 1: P1 0, P2 1, P0 2, so P1 gets the cell and P0 follows
+    assert positions == [(1, 0), (2, 0), (3, 0)]
+    arena = make_arena(".....")
+    players = place(arena, (0, 0), (1, 0), (3, 0))
+    positions = resolve(arena, players, [(1, 0), (2, 0), (2, 0)], tick=2)
+    # priorities on tick 2: P2 0, P0 1, P1 2, P1 loses and P0 stays behind it
+    assert positions == [(0, 0), (1, 0), (2, 0)]
+
+
+def test_results_do_not_depend_on_player_order():
+    rng = np.random.default_rng(5)
+    offsets = [(0, 1), (0, -1), (-1, 0), (1, 0), (0, 0)]
+    for _ in range(50):
+        arena = make_arena(*["......"] * 6)
+        cells = rng.choice(36, size=8, replace=False)
+        positions = np.stack((cells % 6, cells // 6), axis=1)
+        moves = positions + np.array(offsets)[rng.integers(0, 5, size=8)]
+        moving = rng.random(8) < 0.8
+        priorities = rng.permutation(8)
+        occupancy = np.full((6, 6), -1, dtype=np.int16)
+        occupancy[positions[:, 1], positions[:, 0]] = np.arange(8)
+        results = rules.resolve_moves(
+            occupancy, arena.tile_ids, positions, moves, moving, priorities
+        )
+
+        order = rng.permutation(8)
+        shuffled_occupancy = np.full((6, 6), -1, dtype=np.int16)
+        shuffled_occupancy[positions[order, 1], positions[order, 0]] = np.arange(8)
+        shuffled = rules.resolve_moves(
+            shuffled_occupancy,
+            arena.tile_ids,
+            positions[order],
+            moves[order],
+            moving[order],
+            priorities[order],
+        )
+        assert (shuffled == results[order]).all()
+
+
+def test_pick_up_and_the_orb_follows_its_carrier():
+    arena = make_arena("o..")
+    players = place(arena, (0, 0), (2, 0))
+    arena.place_meta_orb(MetaOrb(), (0, 0))
+    rules.resolve_actions(arena, players, [{"pick_up": True}, {"pick_up": True}])
+    assert arena.state.orb_carrier == arena.get_player_index(players[0])
+    resolve(arena, players, [(1, 0), None])
+    assert arena.get_meta_orb_position() == (1, 0)
+
+
+def test_the_petting_zoo_match_result(monkeypatch):
+    """Pins the outcome of the default match, any change to the rules shows here"""
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    players_red = [Player(n, "RED", StrategyStraightOrb()) for n in config.PLAYERS_RED]
+    players_blue = [
+        Player(n, "BLUE", StrategyStraightOrb()) for n in config.PLAYERS_BLUE
+    ]
+    game = Game(
+        "the_petting_zoo",
+        players_red,
+        players_blue,
+        event_log=EventLog(enabled=False),
+    )
+    game.spawn_players()
+    game.spawn_meta_orb()
+    result = game.run_headless(50)
+    assert (result.score_red, result.score_blue) == (0, 0)
+    assert result.orb_holder == "Diana"
+    assert result.orb_pickups == 1
+    assert result.player_stats == {
+        "Alice": PlayerStats(moves=36, blocked_moves=14, pick_ups=0),
+        "Charlie": PlayerStats(moves=37, blocked_moves=13, pick_ups=0),
+        "Bob": PlayerStats(moves=37, blocked_moves=13, pick_ups=0),
+        "Diana": PlayerStats(moves=37, blocked_moves=12, pick_ups=1),
+        "Eve": PlayerStats(moves=35, blocked_moves=15, pick_ups=0),
+        "Frank": PlayerStats(moves=37, blocked_moves=13, pick_ups=0),
+    }
+
+
+class CountingStrategy(StrategyStraightOrb):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def get_action(self, player, arena, context=None):
+        self.calls += 1
+        return super().get_action(player, arena, context=context)
+
+
+def test_given_actions_skip_the_strategy(monkeypatch):
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    steered = Player("Alice", "RED", CountingStrategy())
+    other = Player("Bob", "BLUE", CountingStrategy())
+    game = Game(
+        "the_petting_zoo", [steered], [other], event_log=EventLog(enabled=False)
+    )
+    game.spawn_players()
+    game.running = True
+    start = game.map.get_position_of_player(steered)
+    game.process_tick({steered: None})
+    assert steered.strategy.calls == 0
+    assert other.strategy.calls == 1
+    assert game.map.get_position_of_player(steered) == start
+
+
+def state_of(arena: Arena) -> tuple:
+    state = arena.state
+    return (
+        state.occupancy.tolist(),
+        state.player_positions.tolist(),
+        state.player_stats.tolist(),
+        state.orb_position.tolist(),
+        state.orb_carrier,
+        [event[2:] for event in arena.events.events],  # without the sequence
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_single_actor_matches_the_batched_rules(seed):
+    """rules.apply_action is the fast path of resolve_actions for one player"""
+    arenas = []
+    for _ in range(2):
+        arena = make_arena("..#.", ".o..", "#...")
+        arena.events = EventLog(buffer_level=DEBUG)
+        players = place(arena, (0, 0), (1, 0), (3, 2))
+        arena.place_meta_orb(MetaOrb(), (1, 1))
+        arenas.append((arena, players))
+    (scalar, scalar_players), (batched, batched_players) = arenas
+
+    rng = np.random.default_rng(seed)
+    steps = ((0, 1), (0, -1), (-1, 0), (1, 0), (0, 0))
+    for _ in range(300):
+        chosen = int(rng.integers(0, 3))
+        x, y = scalar.get_position_of_player(scalar_players[chosen])
+        dx, dy = steps[rng.integers(0, len(steps))]
+        action = {"move": (x + dx, y + dy)} if rng.random() < 0.8 else {}
+        if rng.random() < 0.4:
+            action["pick_up"] = True
+        rules.apply_action(scalar, scalar_players[chosen], action)
+        rules.resolve_actions(batched, [batched_players[chosen]], [action])
+        assert state_of(scalar) == state_of(batched)
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from spatial_index import SpatialIndex
+
+WIDTH, HEIGHT = 37, 23
+
+
+def random_players(seed: int, count: int = 60) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    positions = np.stack(
+        (rng.integers(0, WIDTH, count), rng.integers(0, HEIGHT, count)), axis=1
+    )
+    positions[rng.random(count) < 0.1] = -1  # off the map
+    teams = rng.integers(0, 2, count)
+    return positions, teams
+
+
+def brute_force(
+    positions, teams, position, team=None, exclude=None
+) -> list[tuple[int, int]]:
+    """(player index, Manhattan distance) of everyone, nearest first"""
+    x, y = position
+    found = [
+        (index, abs(px - x) + abs(py - y))
+        for index, (px, py) in enumerate(positions.tolist())
+        if px >= 0 and (team is None or teams[index] == team) and index != exclude
+    ]
+    return sorted(found, key=lambda pair: (pair[1], pair[0]))
+
+
+@pytest.mark.parametrize("bucket_size", [1, 4, 8, 64])
+@pytest.mark.parametrize("seed", range(4))
+def test_nearest_matches_brute_force(bucket_size, seed):
+    positions, teams = random_players(seed)
+    index = SpatialIndex(positions, teams, WIDTH, HEIGHT, bucket_size)
+    rng = np.random.default_rng(seed)
+    for _ in range(30):
+        position = (int(rng.integers(WIDTH)), int(rng.integers(HEIGHT)))
+        team = [None, 0, 1][rng.integers(3)]
+        exclude = int(rng.integers(len(positions)))
+        expected = brute_force(positions, teams, position, team, exclude)
+        for count in (0, 1, 5, len(positions) + 1):
+            assert index.nearest(position, count, team, exclude) == expected[:count]
+
+
+@pytest.mark.parametrize("bucket_size", [1, 4, 8, 64])
+@pytest.mark.parametrize("seed", range(4))
+def test_within_matches_brute_force(bucket_size, seed):
+    positions, teams = random_players(seed)
+    index = SpatialIndex(positions, teams, WIDTH, HEIGHT, bucket_size)
+    rng = np.random.default_rng(seed)
+    for _ in range(30):
+        position = (int(rng.integers(WIDTH)), int(rng.integers(HEIGHT)))
+        team = [None, 0, 1][rng.integers(3)]
+        radius = int(rng.integers(0, 20))
+        expected = [
+            pair
+            for pair in brute_force(positions, teams, position, team)
+            if pair[1] <= radius
+        ]
+        assert index.within(position, radius, team) == expected
+
+
+def test_empty_index_finds_nobody():
+    positions = np.full((3, 2), -1)
+    index = SpatialIndex(positions, np.zeros(3, dtype=int), WIDTH, HEIGHT, 8)
+    assert len(index) == 0
+    assert index.nearest((5, 5), 2) == []
+    assert index.within((5, 5), 100) == []
@@ -0,0 +1,162 @@
+import base64
+import json
+import os
+import socket
+import struct
+import time
+import numpy as np
+import pytest
+import map_cache
+import spectator
+from ai.strategy import StrategyStraightOrb
+from events import EventLog
+from game import Game
+from game_objects.entities import TILE_IDS
+from game_objects.player import Player
+
+TILE_CHARACTERS = {
+    ".": "FLOOR",
+    "#": "WALL",
+    "o": "ORB_SPAWN",
+    "r": "RED_SPAWN",
+    "b": "BLUE_SPAWN",
+}
+MAP_ROWS = (
+    "rr.........b",
+    "r...#......b",
+    ".....o..#...",
+    "............",
+    "b......#....",
+)
+TICKS = 400
+
+
+def make_game() -> Game:
+    tile_ids = np.array(
+        [
+            [TILE_IDS[TILE_CHARACTERS[character]] for character in row]
+            for row in MAP_ROWS
+        ]
+    )
+    game = Game(
+        "test",
+        [Player("R0", "RED", StrategyStraightOrb())],
+        [Player("B0", "BLUE", StrategyStraightOrb())],
+        compiled_map=map_cache.compile_tile_ids("test", tile_ids),
+        event_log=EventLog(),
+    )
+    game.spawn_players()
+    game.spawn_meta_orb()
+    game.running = True
+    game.max_ticks = TICKS
+    return game
+
+
+class TcpClient:
+    def __init__(self, port: int):
+        self.socket = socket.create_connection(("127.0.0.1", port), timeout=5)
+        self.file = self.socket.makefile("rb")
+
+    def receive(self) -> dict:
+        return json.loads(self.file.readline())
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+class WebSocketClient(TcpClient):
+    def __init__(self, port: int):
+        super().__init__(port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.socket.sendall(
+            (
+                "GET / HTTP/1.1\r\n"
+                "Host: 127.0.0.1\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                "Sec-WebSocket-Version: 13\r\n\r\n"
+            ).encode()
+        )
+        response = b""
+        while not response.endswith(b"\r\n\r\n"):
+            response += self.file.read(1)
+        assert response.startswith(b"HTTP/1.1 101")
+
+    def receive(self) -> dict:
+        opcode, length = self.file.read(2)
+        assert opcode == 0x81
+        if length == 126:
+            (length,) = struct.unpack("!H", self.file.read(2))
+        elif length == 127:
+            (length,) = struct.unpack("!Q", self.file.read(8))
+        return json.loads(self.file.read(length))
+
+
+def receive_match(client: TcpClient, last_tick: int) -> tuple[list[str], dict]:
+    """Message types up to the last tick and the state they add up to"""
+    types = []
+    state: dict = {}
+    while state.get("tick") != last_tick:
+        message = client.receive()
+        types.append(message["type"])
+        if message["type"] == "snapshot":
+            state = dict(message)
+        elif message["type"] == "tick":
+            assert message["tick"] > state["tick"]
+            state["tick"] = message["tick"]
+            for index, x, y in message.get("moved", ()):
+                state["positions"][index] = [x, y]
+            for key in ("orb", "carrier", "score"):
+                if key in message:
+                    state[key] = message[key]
+    return types, state
+
+
+@pytest.mark.parametrize("client_type", [TcpClient, WebSocketClient])
+def test_clients_get_the_map_a_snapshot_and_then_every_tick(client_type):
+    game = make_game()
+    server = game.start_spectator_server(
+        0 if client_type is TcpClient else None,
+        0 if client_type is WebSocketClient else None,
+    )
+    client = client_type(server.port or server.websocket_port)
+    try:
+        deadline = time.monotonic() + 5
+        while server.spectator_count == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # uncapped, as in run_headless
+        while game.running:
+            game.process_tick()
+        types, state = receive_match(client, game.tick)
+    finally:
+        client.close()
+        game.stop_spectator_server()
+
+    assert types[:2] == ["map", "snapshot"]
+    assert set(types[2:]) == {"tick"}
+    assert state["positions"] == game.map.state.player_positions.tolist()
+    assert state["orb"] == list(game.map.get_meta_orb_position())
+    assert state["carrier"] == game.map.state.orb_carrier
+    assert state["score"] == [game.score_red, game.score_blue]
+
+
+def test_ticks_published_at_once_are_merged():
+    merged = spectator.merge_tick_messages(
+        [
+            {"type": "tick", "tick": 1, "moved": [[0, 1, 1], [1, 5, 5]]},
+            {"type": "tick", "tick": 2, "orb": [3, 3], "carrier": -1},
+            {"type": "tick", "tick": 3, "moved": [[0, 2, 1]], "messages": ["a"]},
+            {"type": "tick", "tick": 4, "score": [1, 0], "messages": ["b"]},
+        ]
+    )
+    assert merged == {
+        "type": "tick",
+        "tick": 4,
+        "moved": [[0, 2, 1], [1, 5, 5]],
+        "orb": [3, 3],
+        "carrier": -1,
+        "score": [1, 0],
+        "messages": ["a", "b"],
+    }
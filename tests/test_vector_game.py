@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+import map_cache
+import vector_game
+from arena_state import TEAMS
+from events import EventLog
+from game import Game
+from game_objects.entities import TILE_IDS
+from game_objects.player import Player
+from rules import PICK_UPS
+
+TILE_CHARACTERS = {
+    ".": "FLOOR",
+    "#": "WALL",
+    "o": "ORB_SPAWN",
+    "r": "RED_SPAWN",
+    "b": "BLUE_SPAWN",
+}
+# small enough for random walks to meet each other and the orb
+MAP_ROWS = (
+    "rr.....b",
+    "r..#...b",
+    "...#....",
+    "...o.#..",
+    "..#.....",
+    ".....#..",
+    "b.......",
+)
+MATCHES = 8
+TICKS = 150
+
+
+def compile_map():
+    tile_ids = np.array(
+        [
+            [TILE_IDS[TILE_CHARACTERS[character]] for character in row]
+            for row in MAP_ROWS
+        ]
+    )
+    return map_cache.compile_tile_ids("vector_test", tile_ids)
+
+
+def make_game(compiled_map, players_red: int, players_blue: int) -> Game:
+    game = Game(
+        compiled_map.name,
+        [Player(f"R{i}", "RED") for i in range(players_red)],
+        [Player(f"B{i}", "BLUE") for i in range(players_blue)],
+        compiled_map=compiled_map,
+        event_log=EventLog(enabled=False),
+    )
+    game.spawn_players()
+    game.spawn_meta_orb()
+    game.running = True
+    game.max_ticks = TICKS
+    return game
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("players_red, players_blue", [(1, 1), (3, 3), (3, 1)])
+def test_vector_game_matches_game_every_tick(seed, players_red, players_blue):
+    compiled_map = compile_map()
+    games = [make_game(compiled_map, players_red, players_blue) for _ in range(MATCHES)]
+    vector = vector_game.VectorGame(
+        compiled_map.name,
+        players_red,
+        players_blue,
+        MATCHES,
+        compiled_map=compiled_map,
+        max_ticks=TICKS,
+    )
+    rng = np.random.default_rng(seed)
+
+    for _ in range(TICKS):
+        codes = rng.integers(
+            0, len(vector_game.ACTIONS), (MATCHES, vector.player_count)
+        )
+        for game, match_codes in zip(games, codes):
+            arena = game.map
+            game.process_tick(
+                {
+                    player: vector_game.decode_action(
+                        arena.get_position_of_player(player),
+                        match_codes[arena.get_player_index(player)],
+                    )
+                    for player in game.player_list
+                }
+            )
+        vector.step(codes)
+
+        for match, game in enumerate(games):
+            state = game.map.state
+            assert game.tick == vector.tick
+            np.testing.assert_array_equal(
+                state.player_positions, vector.positions[match]
+            )
+            np.testing.assert_array_equal(
+                state.orb_position, vector.orb_positions[match]
+            )
+            assert state.orb_carrier == vector.orb_carriers[match]
+            scores = {"RED": game.score_red, "BLUE": game.score_blue}
+            assert [scores[team] for team in TEAMS] == vector.scores[match].tolist()
+            np.testing.assert_array_equal(
+                state.player_stats, vector.player_stats[match]
+            )
+
+    # the matches got as far as picking up the orb
+    assert vector.player_stats[..., PICK_UPS].sum() > 0
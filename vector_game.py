@@ -0,0 +1,182 @@
+import numpy as np
+import config
+from arena import Arena
+from arena_state import NO_PLAYER, PLAYER_STATS, TEAMS
+from map_cache import CompiledMap
+from rules import BLOCKED_MOVES, MOVES, PICK_UPS
+
+# action codes of VectorGame.step(), moves go to a neighbouring cell
+STAY = 0
+UP = 1
+DOWN = 2
+LEFT = 3
+RIGHT = 4
+PICK_UP = 5
+ACTIONS = ("stay", "up", "down", "left", "right", "pick_up")
+# (dx, dy) per action code, y grows upwards like the map coordinates
+ACTION_OFFSETS = np.array([(0, 0), (0, 1), (0, -1), (-1, 0), (1, 0), (0, 0)])
+
+
+def encode_action(position: tuple[int, int] | None, action: dict | None) -> int:
+    """Action code of a strategy's action dict, STAY for anything else"""
+    if not action:
+        return STAY
+    if "pick_up" in action:
+        return PICK_UP
+    if "move" in action and position is not None:
+        offset = (action["move"][0] - position[0], action["move"][1] - position[1])
+        for code in (UP, DOWN, LEFT, RIGHT):
+            if offset == tuple(ACTION_OFFSETS[code]):
+                return code
+    return STAY
+
+
+def decode_action(position: tuple[int, int] | None, code: int) -> dict:
+    """Action dict of an action code, as a Strategy would return it"""
+    if code == PICK_UP:
+        return {"pick_up": True}
+    if code == STAY or position is None:
+        return {}
+    dx, dy = ACTION_OFFSETS[code].tolist()
+    return {"move": (position[0] + dx, position[1] + dy)}
+
+
+class VectorGame:
+    """Many independent matches on one map, stepped together as arrays.
+
+    Players are indexed like in the arena of a Game: the red team first,
+    then the blue team, each on the spawn cells in the same order. A tick
+    follows rules.resolve_actions() in every match: contested cells go to
+    the player with the lowest priority, which rotates with the tick, swaps
+    and moves into the cell of a blocked player fail, and a player standing
+    on the uncarried orb picks it up. All matches share the tick counter."""
+
+    def __init__(
+        self,
+        map_name: str,
+        players_red: int,
+        players_blue: int,
+        matches: int,
+        compiled_map: CompiledMap | None = None,
+        max_ticks: int = config.MAX_TICKS,
+    ):
+        arena = Arena(map_name, compiled_map=compiled_map)
+        self.map_name = map_name
+        self.passable = np.asarray(arena.pathfinding_matrix, dtype=bool)
+        self.height, self.width = self.passable.shape
+        self.matches = matches
+        self.max_ticks = max_ticks
+        self.tick = 0
+
+        red_spawns = arena.get_positions_by_tile_name("RED_SPAWN")
+        blue_spawns = arena.get_positions_by_tile_name("BLUE_SPAWN")
+        if players_red > len(red_spawns) or players_blue > len(blue_spawns):
+            raise ValueError(f"Map '{map_name}' has too few spawn cells.")
+        self.spawn_positions = np.array(
+            red_spawns[:players_red] + blue_spawns[:players_blue], dtype=np.int32
+        ).reshape(-1, 2)
+        self.player_teams = np.array(
+            [TEAMS.index("RED")] * players_red + [TEAMS.index("BLUE")] * players_blue,
+            dtype=np.int8,
+        )
+        orb_spawns = arena.get_positions_by_tile_name("ORB_SPAWN")
+        self.has_orb = bool(orb_spawns)
+        self.orb_spawn = np.array(orb_spawns[0] if orb_spawns else (-1, -1))
+
+        player_count = len(self.player_teams)
+        # (x, y) per match and player
+        self.positions = np.zeros((matches, player_count, 2), dtype=np.int32)
+        # (x, y) of the orb per match, (-1, -1) without an orb
+        self.orb_positions = np.zeros((matches, 2), dtype=np.int32)
+        self.orb_carriers = np.zeros(matches, dtype=np.int32)
+        # points per match, one column per entry of TEAMS
+        self.scores = np.zeros((matches, len(TEAMS)), dtype=np.int32)
+        self.player_stats = np.zeros(
+            (matches, player_count, len(PLAYER_STATS)), dtype=np.int32
+        )
+        self.other_players = ~np.eye(player_count, dtype=bool)
+        self.reset()
+
+    @property
+    def player_count(self) -> int:
+        return len(self.player_teams)
+
+    @property
+    def running(self) -> bool:
+        return self.tick < self.max_ticks
+
+    def reset(self, matches: np.ndarray | None = None) -> None:
+        """Put the given matches (all if None) back to their start"""
+        if matches is None:
+            matches = slice(None)
+            self.tick = 0
+        self.positions[matches] = self.spawn_positions
+        self.orb_positions[matches] = self.orb_spawn
+        self.orb_carriers[matches] = NO_PLAYER
+        self.scores[matches] = 0
+        self.player_stats[matches] = 0
+
+    def step(self, actions: np.ndarray) -> np.ndarray:
+        """Carry out one action code per match and player, returns which
+        moves happened as a (matches, players) bool array"""
+        self.tick += 1  # like Game.process_tick, before the actions
+        actions = np.asarray(actions)
+        positions = self.positions
+        matches = np.arange(self.matches)[:, None]
+
+        moving = (actions >= UP) & (actions <= RIGHT)
+        targets = positions + ACTION_OFFSETS[actions]
+        x, y = targets[..., 0], targets[..., 1]
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        x = np.clip(x, 0, self.width - 1)
+        y = np.clip(y, 0, self.height - 1)
+        pending = moving & inside & self.passable[y, x]
+
+        # compared as cell numbers, the clipped ones are never pending
+        cells = positions[..., 1] * self.width + positions[..., 0]
+        target_cells = y * self.width + x
+
+        # a target several players want goes to the lowest priority
+        priorities = (np.arange(self.player_count) - self.tick) % self.player_count
+        same_target = target_cells[:, :, None] == target_cells[:, None, :]
+        same_target &= pending[:, :, None] & pending[:, None, :]
+        same_target &= priorities[None, :] < priorities[:, None]
+        pending &= ~same_target.any(axis=2)
+
+        # players standing on the targets at the start of the tick
+        standing = target_cells[:, :, None] == cells[:, None, :]
+        standing &= self.other_players
+        occupied = pending & standing.any(axis=2)
+        occupants = standing.argmax(axis=2)
+
+        # head-on swaps
+        swapping = occupied & pending[matches, occupants]
+        swapping &= target_cells[matches, occupants] == cells
+        pending &= ~swapping
+
+        # a blocked player blocks whoever wanted its cell, which can chain
+        while True:
+            blocked = occupied & pending & ~pending[matches, occupants]
+            if not blocked.any():
+                break
+            pending &= ~blocked
+
+        moved = pending
+        positions[moved] = targets[moved]
+        self.player_stats[..., MOVES] += moved
+        self.player_stats[..., BLOCKED_MOVES] += moving & ~moved
+
+        # the orb follows its carrier
+        carried = self.orb_carriers != NO_PLAYER
+        carriers = np.maximum(self.orb_carriers, 0)
+        self.orb_positions[carried] = positions[carried, carriers[carried]]
+
+        # pick ups, the first player standing on the uncarried orb gets it
+        if self.has_orb:
+            on_orb = (positions == self.orb_positions[:, None, :]).all(axis=2)
+            on_orb &= (actions == PICK_UP) & ~carried[:, None]
+            picking = on_orb.any(axis=1)
+            picked_by = on_orb.argmax(axis=1)[picking]
+            self.orb_carriers[picking] = picked_by
+            self.player_stats[picking, picked_by, PICK_UPS] += 1
+        return moved
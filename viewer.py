@@ -1,12 +1,23 @@
 import arcade
+import pyglet
+from arcade.shape_list import (
+    ShapeElementList,
+    create_rectangle_filled,
+    create_rectangle_outline,
+)
+import numpy as np
 import config
 import game_objects.entities as entities
+from events import LEVEL_NAMES
+from simulation import interpolate_positions
 
 
 class MapViewer(arcade.Window):
-    def __init__(self, game):
+    """Draws the frames of a Simulation, which runs the game on its own thread"""
+
+    def __init__(self, game, simulation):
         self.game = game
-        self.fields: list[entities.Field] = game.map.fields
+        self.simulation = simulation
         self.dimensions: tuple[int, int] = game.map.image_dimensions or (0, 0)
         self.tile_size: int = config.TILE_SIZE
 
@@ -30,198 +41,382 @@ class MapViewer(arcade.Window):
         super().__init__(width, height, "GAME OF ORB")
         arcade.set_background_color(arcade.color.BLACK)
 
-        # Message system
+        # Message system, fed by the game's event log
         self.messages: list[str] = []
         self.max_messages: int = config.MAX_MESSAGES  # Maximum visible messages
+        self.messages_changed: bool = False
+        game.events.subscribe(
+            self.on_game_event, LEVEL_NAMES[config.VIEWER_EVENT_LEVEL]
+        )
 
-        # Timing system (delta-time based, non-blocking)
-        self.tick_timer: float = 0.0
-        self.tick_delay: float = config.TICK_DELAY
+        # Frame shown last and where its sprites were drawn, in map cells
+        self.shown_frame = None
+        self.settled: bool = False  # the sprites reached the shown frame
+        self.drawn_positions: np.ndarray = np.empty((0, 2))
+        self.drawn_orb_position: tuple[float, float] | None = None
+
+        # Retained scene: built once, afterwards only moved or re-labelled
+        self.text_batch = pyglet.graphics.Batch()
+        self.tile_sprites: arcade.SpriteList = self.build_tile_sprites()
+        self.player_sprites = arcade.SpriteList()
+        self.player_sprite_by_player: dict = {}
+        self.player_labels: dict = {}
+        self.meta_orb_sprites = arcade.SpriteList()
+        self.meta_orb_sprite: arcade.Sprite | None = None
+        self.meta_orb_border: arcade.Sprite | None = None
+        self.board_shapes: ShapeElementList = self.build_board_shapes()
+        self.build_board_texts()
+        self.shown_messages: list[str] = []
+
+        # Profiler overlay, toggled with P while the game is profiled
+        self.show_profiler: bool = True
+        self.profiler_texts: list[arcade.Text] = self.build_profiler_texts()
+
+        self.update_scene()
 
     def start(self):
         arcade.run()
 
-    def on_update(self, delta_time):
-        self.tick_timer += delta_time
-
-        # Time for next tick?
-        if self.tick_timer >= self.tick_delay:
-            self.tick_timer = 0.0
+    def on_game_event(self, event):
+        self.messages.append(event.format())
+        del self.messages[: -self.max_messages]
+        self.messages_changed = True
 
-            # Delegate to Game for logic processing
-            if hasattr(self.game, "process_tick"):
-                self.game.process_tick()
+    def on_update(self, delta_time):
+        # the simulation ticks on its own, this only catches up with its frames
+        profiler = getattr(self.game, "profiler", None)
+        if profiler is not None and profiler.enabled:
+            new_frame = self.simulation.frames[1] is not self.shown_frame
+            with profiler.phase("render"):
+                self.update_scene()
+            if new_frame:
+                self.update_profiler_texts()
+        else:
+            self.update_scene()
+
+    def on_close(self):
+        self.simulation.stop()
+        super().on_close()
+
+    def on_key_press(self, symbol, modifiers):
+        if symbol == arcade.key.P:
+            self.show_profiler = not self.show_profiler
+            self.update_profiler_texts()
 
     def on_draw(self):
         self.clear()
-        self.draw_map()
-        self.draw_message_box()
-        self.draw_scoring_board()
-
-    def draw_map(self):
-
-        if self.fields is None:
-            return
-
-        for field in self.fields:
-            self.draw_tile(field)
-
-            if field.player is not None:
-                self.draw_player(field)
-
-            if field.meta_orb is not None:
-                self.draw_meta_orb(field)
-
-    def draw_tile(self, field: entities.Field):
-        pixel_x: int = field.x * self.tile_size
-        pixel_y: int = field.y * self.tile_size + self.message_box_height
-
-        # Draw filled rectangle directly
-        arcade.draw_lbwh_rectangle_filled(
-            pixel_x,  # Left
-            pixel_y,  # Bottom
-            self.tile_size - 1,  # Width (with 1px border)
-            self.tile_size - 1,  # Height (with 1px border)
-            field.tile.display_color,
-        )
-
-    def draw_player(self, field: entities.Field):
-        # Draw players
-        if field.player is None:
-            return
-        pixel_x: int = field.x * self.tile_size
-        pixel_y: int = field.y * self.tile_size + self.message_box_height
-        team_color = field.player.display_color
-
-        # Draw filled rectangle directly
-        arcade.draw_circle_filled(
-            pixel_x + self.tile_size // 2,  # Center X
-            pixel_y + self.tile_size // 2,  # Center Y
-            self.tile_size // 3,  # Radius
-            team_color,  # Player color
-        )
-
-        # Draw player name
-        arcade.draw_text(
-            field.player.name,
-            pixel_x + self.tile_size // 2,
-            pixel_y - 1,
-            arcade.color.WHITE,
-            font_size=config.PLAYER_TAG_SIZE,
-            anchor_x="center",
-        )
-
-    def draw_meta_orb(self, field: entities.Field):
-        """Draw the Meta Orb on the map"""
-        if field.meta_orb is None:
-            return
-
-        pixel_x: int = field.x * self.tile_size
-        pixel_y: int = field.y * self.tile_size + self.message_box_height
-
-        arcade.draw_circle_filled(
-            pixel_x + self.tile_size // 2,
-            pixel_y + self.tile_size // 2,
-            self.tile_size // 3,
-            field.meta_orb.display_color,
+        self.tile_sprites.draw(pixelated=True)
+        self.player_sprites.draw()
+        self.meta_orb_sprites.draw()
+        self.board_shapes.draw()
+        self.text_batch.draw()
+
+    def tile_center(self, position) -> tuple[float, float]:
+        """Pixel center of the map cell at position, which may lie between cells"""
+        pixel_x: int = position[0] * self.tile_size
+        pixel_y: int = position[1] * self.tile_size + self.message_box_height
+        return (pixel_x + self.tile_size // 2, pixel_y + self.tile_size // 2)
+
+    def build_tile_sprites(self) -> arcade.SpriteList:
+        """The static map as a few large sprites, their textures painted from
+        the tile ids in chunks of TILE_TEXTURE_CHUNK_SIZE pixels"""
+        tile_sprites = arcade.SpriteList()
+        tile_ids = self.game.map.tile_ids
+        if tile_ids is None:
+            return tile_sprites
+        from PIL import Image
+
+        height, width = tile_ids.shape
+        if max(height, width) * self.tile_size <= config.TILE_TEXTURE_MAX_SIZE:
+            # a tile per tile_size pixels, with the 1px border at its top and right
+            scale = self.tile_size
+        else:
+            # too large for textures, one pixel per tile stretched when drawn
+            scale = 1
+        chunk = max(config.TILE_TEXTURE_CHUNK_SIZE // scale, 1)
+
+        # image order, top row first
+        image_tile_ids = tile_ids[::-1]
+        for top in range(0, height, chunk):
+            for left in range(0, width, chunk):
+                chunk_ids = image_tile_ids[top : top + chunk, left : left + chunk]
+                rows, columns = chunk_ids.shape
+                colors = entities.TILE_DISPLAY_COLORS[chunk_ids]
+                pixels = np.dstack(
+                    (colors, np.full((rows, columns), 255, dtype=np.uint8))
+                )
+                if scale > 1:
+                    pixels = pixels.repeat(scale, axis=0).repeat(scale, axis=1)
+                    pixels[::scale, :, 3] = 0
+                    pixels[:, scale - 1 :: scale, 3] = 0
+
+                texture = arcade.Texture(
+                    Image.fromarray(pixels, "RGBA"),
+                    hash=f"tiles:{self.game.map.name}:{top}:{left}",
+                )
+                sprite = arcade.Sprite(texture, scale=self.tile_size / scale)
+                sprite.center_x = (left + columns / 2) * self.tile_size
+                sprite.center_y = (
+                    self.message_box_height + (height - top - rows / 2) * self.tile_size
+                )
+                tile_sprites.append(sprite)
+        return tile_sprites
+
+    def build_board_shapes(self) -> ShapeElementList:
+        """Backgrounds and borders of the scoring board and the message box"""
+        shapes = ShapeElementList()
+        board_bottom = self.map_height + self.message_box_height
+
+        # Scoring board background and border
+        shapes.append(
+            create_rectangle_filled(
+                self.map_width / 2,
+                board_bottom + self.scoring_board_height / 2,
+                self.map_width,
+                self.scoring_board_height,
+                (50, 50, 50),  # Darker gray background
+            )
         )
-        # Draw orb border
-        arcade.draw_circle_outline(
-            pixel_x + self.tile_size // 2,
-            pixel_y + self.tile_size // 2,
-            self.tile_size // 3,
-            arcade.color.WHITE,
-            3,  # Border thickness
+        shapes.append(
+            create_rectangle_outline(
+                self.map_width / 2,
+                board_bottom + self.scoring_board_height / 2,
+                self.map_width,
+                self.scoring_board_height,
+                arcade.color.WHITE,
+                2,
+            )
         )
 
-    def draw_scoring_board(self):
-        """Draw the scoring board at the top of the screen"""
-        # Scoring board background
-        arcade.draw_lbwh_rectangle_filled(
-            0,  # Left
-            self.map_height + self.message_box_height,  # Bottom
-            self.map_width,  # Width
-            self.scoring_board_height,  # Height
-            (50, 50, 50),  # Darker gray background
+        # Message box background and border
+        shapes.append(
+            create_rectangle_filled(
+                self.map_width / 2,
+                self.message_box_height / 2,
+                self.map_width,
+                self.message_box_height,
+                (30, 30, 30),  # Dark gray background
+            )
         )
-
-        # Scoring board border
-        arcade.draw_lbwh_rectangle_outline(
-            0,
-            self.map_height + self.message_box_height,
-            self.map_width,
-            self.scoring_board_height,
-            arcade.color.WHITE,
-            2,
+        shapes.append(
+            create_rectangle_outline(
+                self.map_width / 2,
+                self.message_box_height / 2,
+                self.map_width,
+                self.message_box_height,
+                arcade.color.WHITE,
+                2,
+            )
         )
+        return shapes
 
+    def build_board_texts(self):
+        """Text objects of the scoring board and the message lines"""
         # Calculate vertical center of scoring board
         scoring_board_y_center = (
             self.map_height + self.message_box_height + (self.scoring_board_height // 2)
         )
 
-        # Draw tick count (left side with margin)
-        arcade.draw_text(
-            f"Tick: {self.game.tick}",
+        # Tick count (left side with margin)
+        self.tick_text = arcade.Text(
+            "",
             20,  # Left margin
             scoring_board_y_center,
             arcade.color.WHITE,
             font_size=14,
             anchor_x="left",
             anchor_y="center",
+            batch=self.text_batch,
         )
 
-        # Draw team scores (centered)
-        score_red = getattr(self.game, "score_red", 0)
-        score_blue = getattr(self.game, "score_blue", 0)
-
-        arcade.draw_text(
-            f"RED {score_red} : {score_blue} BLUE",
+        # Team scores (centered)
+        self.score_text = arcade.Text(
+            "",
             self.map_width // 2,  # Horizontal center
             scoring_board_y_center,  # Vertical center
             arcade.color.WHITE,
             font_size=16,
             anchor_x="center",
             anchor_y="center",
+            batch=self.text_batch,
         )
 
-    def draw_message_box(self):
-        """Draw the message box at the bottom of the screen"""
-        # Message box background
-        arcade.draw_lbwh_rectangle_filled(
-            0,  # Left
-            0,  # Bottom
-            self.map_width,  # Width
-            self.message_box_height,  # Height
-            (30, 30, 30),  # Dark gray background
-        )
-
-        # Message box border
-        arcade.draw_lbwh_rectangle_outline(
-            0, 0, self.map_width, self.message_box_height, arcade.color.WHITE, 2
-        )
-
-        # Draw messages
+        # One line per visible message, newest on top
         font_size = 12
         line_height = 16
         start_y = self.message_box_height - self.message_box_margin - font_size
-
-        # Show last N messages
-        visible_messages = (
-            self.messages[-self.max_messages :]
-            if len(self.messages) > self.max_messages
-            else self.messages
-        )
-
-        for i, message in enumerate(reversed(visible_messages)):
+        self.message_texts: list[arcade.Text] = []
+        for i in range(self.max_messages):
             y_pos = start_y - (i * line_height)
             if y_pos < self.message_box_margin:
                 break  # Don't draw outside message box
+            self.message_texts.append(
+                arcade.Text(
+                    "",
+                    self.message_box_margin,
+                    y_pos,
+                    arcade.color.WHITE,
+                    font_size=font_size,
+                    batch=self.text_batch,
+                )
+            )
 
-            arcade.draw_text(
-                message,
-                self.message_box_margin,
-                y_pos,
-                arcade.color.WHITE,
+    def build_profiler_texts(self) -> list[arcade.Text]:
+        """Lines of the profiler overlay in the top left corner of the map"""
+        font_size = 10
+        line_height = 14
+        top = self.map_height + self.message_box_height - font_size - 4
+        return [
+            arcade.Text(
+                "",
+                4,
+                top - i * line_height,
+                arcade.color.YELLOW,
                 font_size=font_size,
+                batch=self.text_batch,
             )
+            for i in range(config.PROFILER_OVERLAY_LINES)
+        ]
+
+    def update_profiler_texts(self):
+        lines = []
+        profiler = getattr(self.game, "profiler", None)
+        if self.show_profiler and profiler is not None and profiler.enabled:
+            phases = profiler.summary()["phases_ms"]
+            slowest = sorted(phases.items(), key=lambda item: -item[1].get("p95", 0))
+            lines = [
+                f"{name}: p50 {ms['p50']:.2f} p95 {ms['p95']:.2f} "
+                f"p99 {ms['p99']:.2f} ms"
+                for name, ms in slowest
+                if ms["count"]
+            ]
+        for i, text in enumerate(self.profiler_texts):
+            line = lines[i] if i < len(lines) else ""
+            if text.text != line:
+                text.text = line
+
+    def add_player_sprite(self, player) -> arcade.Sprite:
+        sprite = arcade.SpriteCircle(self.tile_size // 3, player.display_color)
+        self.player_sprites.append(sprite)
+        self.player_sprite_by_player[player] = sprite
+
+        # Player name below the circle
+        self.player_labels[player] = arcade.Text(
+            player.name,
+            0,
+            0,
+            arcade.color.WHITE,
+            font_size=config.PLAYER_TAG_SIZE,
+            anchor_x="center",
+            batch=self.text_batch,
+        )
+        return sprite
+
+    def add_meta_orb_sprites(self, meta_orb):
+        radius = self.tile_size // 3
+        # white disc underneath forms the orb border
+        self.meta_orb_border = arcade.SpriteCircle(radius + 1, arcade.color.WHITE)
+        self.meta_orb_sprite = arcade.SpriteCircle(radius - 2, meta_orb.display_color)
+        self.meta_orb_sprites.append(self.meta_orb_border)
+        self.meta_orb_sprites.append(self.meta_orb_sprite)
+
+    def update_scene(self):
+        """Move sprites between the last two frames of the simulation and
+        update texts when a new frame arrived"""
+        previous, current = self.simulation.frames
+        progress = self.simulation.get_progress(current)
+        if current is not self.shown_frame:
+            self.shown_frame = current
+            self.settled = False
+            self.update_board_texts(current)
+        elif self.messages_changed:
+            self.update_message_texts()
+        if self.settled:
+            return
+
+        self.update_player_sprites(previous, current, progress)
+        self.update_meta_orb_sprites(previous, current, progress)
+        self.settled = progress >= 1.0
+
+    def update_player_sprites(self, previous, current, progress: float):
+        if config.VIEWER_INTERPOLATION:
+            positions = interpolate_positions(
+                previous.player_positions, current.player_positions, progress
+            )
+        else:
+            positions = current.player_positions.astype(float)
+        if self.drawn_positions.shape != positions.shape:
+            self.drawn_positions = np.full(positions.shape, np.nan)
+        # only the sprites of players that are moving or just moved
+        changed = (positions != self.drawn_positions).any(axis=1).nonzero()[0]
+        self.drawn_positions = positions
+
+        for index in changed.tolist():
+            player = current.players[index]
+            sprite = self.player_sprite_by_player.get(player)
+            if sprite is None:
+                sprite = self.add_player_sprite(player)
+            label = self.player_labels[player]
+
+            position = positions[index].tolist()
+            visible = current.player_positions[index, 0] >= 0
+            sprite.visible = visible
+            label.visible = visible
+            if not visible:
+                continue
+
+            center_x, center_y = self.tile_center(position)
+            sprite.center_x, sprite.center_y = center_x, center_y
+            label.x = center_x
+            label.y = position[1] * self.tile_size + self.message_box_height - 1
+
+    def update_meta_orb_sprites(self, previous, current, progress: float):
+        meta_orb = self.game.map.get_meta_orb_object()
+        if meta_orb is None:
+            return
+        if self.meta_orb_sprite is None:
+            self.add_meta_orb_sprites(meta_orb)
+
+        position = current.orb_position
+        if (
+            config.VIEWER_INTERPOLATION
+            and position is not None
+            and previous.orb_position is not None
+        ):
+            position = tuple(
+                interpolate_positions(
+                    np.array([previous.orb_position]), np.array([position]), progress
+                )[0].tolist()
+            )
+        if position == self.drawn_orb_position:
+            return
+        self.drawn_orb_position = position
+        for sprite in self.meta_orb_sprites:
+            sprite.visible = position is not None
+            if position is not None:
+                sprite.center_x, sprite.center_y = self.tile_center(position)
+
+    def update_board_texts(self, frame):
+        tick_text = f"Tick: {frame.tick}"
+        if self.tick_text.text != tick_text:
+            self.tick_text.text = tick_text
+
+        self.update_score_text(frame)
+        if self.messages_changed:
+            self.update_message_texts()
+
+    def update_score_text(self, frame):
+        score_text = f"RED {frame.score_red} : {frame.score_blue} BLUE"
+        if self.score_text.text != score_text:
+            self.score_text.text = score_text
+
+    def update_message_texts(self):
+        self.messages_changed = False
+        # Show last N messages
+        visible_messages = self.messages[-len(self.message_texts) :]
+        if visible_messages == self.shown_messages:
+            return
+        self.shown_messages = list(visible_messages)
+        newest_first = list(reversed(visible_messages))
+        for i, text in enumerate(self.message_texts):
+            text.text = newest_first[i] if i < len(newest_first) else ""